@@ -1,39 +1,243 @@
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
 import os
 import json
+import argparse
+import difflib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
 
-# Initialize Firebase
-try:
-    # Try to get the app if it's already initialized
-    firebase_admin.get_app()
-except ValueError:
-    # Initialize it if not already done
-    cred = credentials.Certificate("./bern-8dbc2-firebase-adminsdk-fbsvc-f2d05b268c.json")
-    firebase_admin.initialize_app(cred)
+from User_Firebase import get_firestore_client
 
-# Get a reference to the Firestore database
-db = firestore.client()
+# Firestore rejects a batch with more writes than this
+MAX_BATCH_WRITES = 500
+
+# Batches committed at the same time
+DEFAULT_SYNC_WORKERS = 8
+
+# Firestore is connected on the first call that needs it, not at import
+def get_db():
+    """Get a reference to the Firestore database, initializing Firebase on first use."""
+    return get_firestore_client()
+
+class BatchWriteError(Exception):
+    """
+    Raised by commit_writes when some of its batches failed.
+    
+    Attributes:
+        failed_ids: IDs of the documents in the failed batches, which were not written
+        written_ids: IDs of the documents in the batches that were committed
+        errors: The exceptions the failed batches raised
+    """
+    
+    def __init__(self, message, failed_ids, written_ids, errors):
+        super().__init__(message)
+        self.failed_ids = failed_ids
+        self.written_ids = written_ids
+        self.errors = errors
+
+def as_document(prompt):
+    """The document fields for a prompt given as its content or as a dictionary of fields."""
+    return dict(prompt) if isinstance(prompt, dict) else {"content": prompt}
+
+# Function to commit many writes in batches
+def commit_writes(db, writes, merge=False, batch_size=MAX_BATCH_WRITES, max_workers=DEFAULT_SYNC_WORKERS):
+    """
+    Commit document writes in batches of at most batch_size, several batches at a time.
+    
+    Batches are independent: if one fails the others are still committed, and
+    a BatchWriteError naming the documents that were and weren't written is
+    raised once they have all finished.
+    
+    Args:
+        db: The Firestore client
+        writes: (document reference, fields) pairs; fields None deletes the document
+        merge: Merge the fields into existing documents instead of replacing them
+        batch_size: Most writes per batch (at most MAX_BATCH_WRITES)
+        max_workers: Most batches committed at the same time
+        
+    Returns:
+        The number of batches committed
+        
+    Raises:
+        BatchWriteError: If any batch failed
+    """
+    if not 0 < batch_size <= MAX_BATCH_WRITES:
+        raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_WRITES}")
+    chunks = [writes[start:start + batch_size] for start in range(0, len(writes), batch_size)]
+    if not chunks:
+        return 0
+    
+    def commit(chunk):
+        batch = db.batch()
+        for doc_ref, fields in chunk:
+            if fields is None:
+                batch.delete(doc_ref)
+            else:
+                batch.set(doc_ref, fields, merge=merge)
+        batch.commit()
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        futures = [executor.submit(commit, chunk) for chunk in chunks]
+    
+    failed_ids, written_ids, errors = [], [], []
+    for chunk, future in zip(chunks, futures):
+        ids = [doc_ref.id for doc_ref, _ in chunk]
+        if future.exception() is None:
+            written_ids.extend(ids)
+        else:
+            failed_ids.extend(ids)
+            errors.append(future.exception())
+    if errors:
+        raise BatchWriteError(f"{len(errors)} of {len(chunks)} batches failed ({len(failed_ids)} documents "
+                              f"not written); the others were committed: {errors[0]}",
+                              failed_ids, written_ids, errors) from errors[0]
+    return len(chunks)
 
 # Function to upload prompts from a dictionary
-def upload_prompts(prompts_dict):
+def upload_prompts(prompts_dict, max_workers=DEFAULT_SYNC_WORKERS):
     """
-    Upload multiple prompts to Firestore.
+    Upload multiple prompts to Firestore, replacing any existing documents.
     
     Args:
-        prompts_dict: Dictionary with prompt names as keys and prompt content as values
+        prompts_dict: Dictionary with prompt names as keys and prompt content (or document fields) as values
+        max_workers: Most batches committed at the same time
     """
-    # Create a batch write
-    batch = db.batch()
+    db = get_db()
+    collection = db.collection("Prompts")
+    writes = [(collection.document(prompt_name), as_document(prompt))
+              for prompt_name, prompt in prompts_dict.items()]
     
-    for prompt_name, prompt_text in prompts_dict.items():
-        doc_ref = db.collection("Prompts").document(prompt_name)
-        batch.set(doc_ref, {"content": prompt_text})
+    # A single batch fails beyond MAX_BATCH_WRITES, so commit in batches
+    batches = commit_writes(db, writes, max_workers=max_workers)
+    print(f"Successfully uploaded {len(prompts_dict)} prompts to Firestore in {batches} batches")
+
+@dataclass
+class PromptDiff:
+    """
+    Differences between local prompts and the Prompts collection.
+    
+    Attributes:
+        added: Prompts only in the local set (prompt ID -> fields)
+        changed: Prompts whose local fields differ from Firestore (prompt ID -> (remote fields, local fields))
+        removed: IDs of prompts only in Firestore
+        unchanged: Number of prompts that are the same in both
+    """
+    added: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    changed: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    
+    def writes(self, collection, prune=False):
+        """The (document reference, fields) writes that bring the collection in line with the local prompts."""
+        writes = [(collection.document(prompt_id), fields) for prompt_id, fields in self.added.items()]
+        writes.extend((collection.document(prompt_id), local) for prompt_id, (_, local) in self.changed.items())
+        if prune:
+            writes.extend((collection.document(prompt_id), None) for prompt_id in self.removed)
+        return writes
+    
+    def summary(self, prune=False):
+        removed = f"{len(self.removed)} deleted" if prune else f"{len(self.removed)} only in Firestore (kept)"
+        return (f"{len(self.added)} added, {len(self.changed)} changed, {removed}, "
+                f"{self.unchanged} unchanged")
     
-    # Commit the batch
-    batch.commit()
-    print(f"Successfully uploaded {len(prompts_dict)} prompts to Firestore")
+    def lines(self, prune=False):
+        """The diff, one printable line at a time."""
+        for prompt_id in sorted(self.added):
+            yield f"+ {prompt_id}"
+        for prompt_id in sorted(self.changed):
+            remote, local = self.changed[prompt_id]
+            yield f"~ {prompt_id}"
+            for name in sorted(local):
+                old, new = remote.get(name), local[name]
+                if old == new:
+                    continue
+                if isinstance(old, str) and isinstance(new, str):
+                    diff = difflib.unified_diff(old.splitlines(), new.splitlines(),
+                                                f"{name} (Firestore)", f"{name} (local)", n=1, lineterm="")
+                    for line in diff:
+                        yield f"    {line}"
+                else:
+                    yield f"    {name}: {old!r} -> {new!r}"
+        for prompt_id in sorted(self.removed):
+            yield f"- {prompt_id}" + ("" if prune else " (only in Firestore; --prune deletes it)")
+
+def diff_prompts(local, remote):
+    """
+    Compare local prompts with the documents in Firestore.
+    
+    Only the fields a local prompt sets are compared, so fields that exist
+    only in Firestore don't make a prompt count as changed.
+    
+    Args:
+        local: Prompt ID -> document fields
+        remote: (prompt ID, document fields) pairs, e.g. from stream_prompts()
+        
+    Returns:
+        A PromptDiff
+    """
+    diff = PromptDiff()
+    seen = set()
+    for prompt_id, remote_fields in remote:
+        local_fields = local.get(prompt_id)
+        if local_fields is None:
+            diff.removed.append(prompt_id)
+            continue
+        seen.add(prompt_id)
+        # Both sides are in memory, so comparing the fields is cheaper than hashing them
+        if all(remote_fields.get(name) == value for name, value in local_fields.items()):
+            diff.unchanged += 1
+        else:
+            diff.changed[prompt_id] = (remote_fields, local_fields)
+    for prompt_id, local_fields in local.items():
+        if prompt_id not in seen:
+            diff.added[prompt_id] = local_fields
+    return diff
+
+# Function to sync prompts to Firestore, writing only what changed
+def sync_prompts(prompts_dict, dry_run=False, prune=False, max_workers=DEFAULT_SYNC_WORKERS):
+    """
+    Make the Prompts collection match local prompts, writing only the prompts that differ.
+    
+    The collection is read once and each remote document is compared with its
+    local version. Added and changed prompts are written with merge,
+    so fields a local prompt doesn't set are kept, in batches committed in
+    parallel.
+    
+    Args:
+        prompts_dict: Dictionary with prompt names as keys and prompt content (or document fields) as values
+        dry_run: Print the diff without writing anything
+        prune: Also delete prompts that are in Firestore but not in prompts_dict
+        max_workers: Most batches committed at the same time
+        
+    Returns:
+        The PromptDiff that was (or, on a dry run, would be) applied
+        
+    Raises:
+        BatchWriteError: If some batches failed; it lists the prompts that were and weren't written
+    """
+    local = {prompt_id: as_document(prompt) for prompt_id, prompt in prompts_dict.items()}
+    diff = diff_prompts(local, stream_prompts())
+    
+    if dry_run:
+        for line in diff.lines(prune):
+            print(line)
+        print(f"Dry run: {diff.summary(prune)}")
+        return diff
+    
+    db = get_db()
+    writes = diff.writes(db.collection("Prompts"), prune)
+    try:
+        batches = commit_writes(db, writes, merge=True, max_workers=max_workers)
+    except BatchWriteError as e:
+        print(f"Sync incomplete: {len(e.written_ids)} prompts written, {len(e.failed_ids)} not written "
+              f"(the error's failed_ids lists them all):")
+        for prompt_id in e.failed_ids[:10]:
+            print(f"- {prompt_id}")
+        if len(e.failed_ids) > 10:
+            print(f"  ... and {len(e.failed_ids) - 10} more")
+        raise
+    print(f"Synced prompts: {diff.summary(prune)} ({len(writes)} writes in {batches} batches)")
+    return diff
 
 # Function to add a single new prompt
 def add_prompt(prompt_name, prompt_content):
@@ -44,7 +248,7 @@ def add_prompt(prompt_name, prompt_content):
         prompt_name: The name/ID for the prompt document
         prompt_content: The content of the prompt
     """
-    doc_ref = db.collection("Prompts").document(prompt_name)
+    doc_ref = get_db().collection("Prompts").document(prompt_name)
     doc_ref.set({"content": prompt_content})
     print(f"Successfully added prompt: {prompt_name}")
 
@@ -59,7 +263,7 @@ def get_prompt(prompt_name):
     Returns:
         The prompt content or None if not found
     """
-    doc_ref = db.collection("Prompts").document(prompt_name)
+    doc_ref = get_db().collection("Prompts").document(prompt_name)
     doc = doc_ref.get()
     
     if doc.exists:
@@ -76,7 +280,7 @@ def update_prompt(prompt_name, new_content):
         prompt_name: The name of the prompt to update
         new_content: The new content for the prompt
     """
-    doc_ref = db.collection("Prompts").document(prompt_name)
+    doc_ref = get_db().collection("Prompts").document(prompt_name)
     doc_ref.update({"content": new_content})
     print(f"Updated {prompt_name} successfully")
 
@@ -88,10 +292,21 @@ def delete_prompt(prompt_name):
     Args:
         prompt_name: The name of the prompt to delete
     """
-    doc_ref = db.collection("Prompts").document(prompt_name)
+    doc_ref = get_db().collection("Prompts").document(prompt_name)
     doc_ref.delete()
     print(f"Deleted {prompt_name} successfully")
 
+# Function to read the whole collection once
+def stream_prompts():
+    """
+    Stream the Prompts collection.
+    
+    Yields:
+        (prompt name, document fields) for each prompt
+    """
+    for doc in get_db().collection("Prompts").stream():
+        yield doc.id, doc.to_dict() or {}
+
 # Function to list all prompts
 def list_prompts():
     """
@@ -100,32 +315,67 @@ def list_prompts():
     Returns:
         A list of prompt names
     """
-    prompts = []
-    docs = db.collection("Prompts").stream()
-    
-    for doc in docs:
-        prompts.append(doc.id)
-    
-    return prompts
+    return [prompt_name for prompt_name, _ in stream_prompts()]
 
-# Function to save prompts to a local JSON file
-def export_prompts_to_file(filename="prompts_backup.json"):
+# Function to save prompts to a local JSON or JSON lines file
+def export_prompts_to_file(filename="prompts_backup.json", file_format=None):
+    """
+    Export the Prompts collection to a local file.
     
-    prompts = {}
-    docs = db.collection("Prompts").stream()
+    The JSON format maps prompt names to their content. The JSON lines format
+    writes one document per line ({"id": ..., "content": ..., other fields})
+    as the collection streams, so the collection is never held in memory.
     
-    for doc in docs:
-        prompts[doc.id] = doc.to_dict().get("content")
+    Args:
+        filename: The name of the file to write
+        file_format: "json" or "jsonl" (default: "jsonl" if filename ends in .jsonl)
+        
+    Returns:
+        The names of the exported prompts, in the order they were streamed
+    """
+    file_format = file_format or ("jsonl" if filename.endswith(".jsonl") else "json")
+    names = []
     
     with open(filename, "w") as f:
-        json.dump(prompts, f, indent=2)
+        if file_format == "jsonl":
+            for prompt_name, fields in stream_prompts():
+                f.write(json.dumps({"id": prompt_name, **fields}, ensure_ascii=False) + "\n")
+                names.append(prompt_name)
+        else:
+            prompts = {}
+            for prompt_name, fields in stream_prompts():
+                prompts[prompt_name] = fields.get("content")
+                names.append(prompt_name)
+            json.dump(prompts, f, indent=2)
     
-    print(f"Exported {len(prompts)} prompts to {filename}")
+    print(f"Exported {len(names)} prompts to {filename}")
+    return names
+
+# Function to read prompts from a local JSON or JSON lines file
+def load_prompts_file(filename="prompts_backup.json"):
+    """
+    Read prompts written by export_prompts_to_file.
+    
+    Args:
+        filename: A .json file (name -> content) or a .jsonl file (one document per line)
+        
+    Returns:
+        Dictionary with prompt names as keys and prompt content (or document fields) as values
+    """
+    with open(filename, "r") as f:
+        if not filename.endswith(".jsonl"):
+            return json.load(f)
+        prompts = {}
+        for line in f:
+            if line.strip():
+                fields = json.loads(line)
+                prompts[fields.pop("id")] = fields
+        return prompts
 
 # Function to load prompts from a local JSON file
 def import_prompts_from_file(filename="prompts_backup.json"):
     """
-    Import prompts from a local JSON file and upload them to Firestore.
+    Import prompts from a local JSON or JSON lines file and upload them to Firestore.
     
     Args:
         filename: The name of the file to load the prompts from
@@ -134,14 +384,13 @@ def import_prompts_from_file(filename="prompts_backup.json"):
         print(f"File {filename} not found!")
         return
     
-    with open(filename, "r") as f:
-        prompts = json.load(f)
+    prompts = load_prompts_file(filename)
     
     upload_prompts(prompts)
     print(f"Imported {len(prompts)} prompts from {filename}")
 
-# Example use: Upload the standard prompts
-if __name__ == "__main__":
+# Example use: Add the zoo prompt and back up the collection
+def example():
     # Example: Add a new prompt
     new_zoo_prompt = """You are a child-friendly AI Spanish tutor named Amigo, and you are now switching into a special zoo-themed learning activity for children. The child is an English speaker learning Spanish. 
 
@@ -157,17 +406,46 @@ Start the adventure with:
     
     add_prompt("ZOO_GAME_PROMPT", new_zoo_prompt)
     
-    # Example: List all prompts
-    all_prompts = list_prompts()
-    print("\nAll available prompts:")
-    for prompt in all_prompts:
-        print(f"- {prompt}")
-    
     # Example: Retrieve a prompt
     print("\nRetrieving ZOO_GAME_PROMPT...")
     zoo_prompt = get_prompt("ZOO_GAME_PROMPT")
     if zoo_prompt:
         print(f"Successfully retrieved prompt with length: {len(zoo_prompt)} characters")
     
-    # Example: Export all prompts to a file
-    export_prompts_to_file()
\ No newline at end of file
+    # Example: Export all prompts to a file, listing them from the same read
+    all_prompts = export_prompts_to_file()
+    print("\nAll available prompts:")
+    for prompt in all_prompts:
+        print(f"- {prompt}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the Prompts collection in Firestore.")
+    commands = parser.add_subparsers(dest="command")
+    
+    sync = commands.add_parser("sync", help="Write the prompts in a file that differ from Firestore")
+    sync.add_argument("filename", nargs="?", default="prompts_backup.json", help="A .json or .jsonl prompts file")
+    sync.add_argument("--dry-run", action="store_true", help="Print the diff without writing anything")
+    sync.add_argument("--prune", action="store_true", help="Also delete prompts that aren't in the file")
+    sync.add_argument("--workers", type=int, default=DEFAULT_SYNC_WORKERS, help="Batches committed at the same time")
+    
+    export = commands.add_parser("export", help="Export the Prompts collection to a file")
+    export.add_argument("filename", nargs="?", default="prompts_backup.json")
+    export.add_argument("--format", choices=["json", "jsonl"], help="Default: from the file extension")
+    
+    commands.add_parser("list", help="List the prompt names")
+    commands.add_parser("example", help="Add the zoo prompt and export the collection (the default)")
+    args = parser.parse_args(argv)
+    
+    if args.command == "sync":
+        sync_prompts(load_prompts_file(args.filename), dry_run=args.dry_run, prune=args.prune,
+                     max_workers=args.workers)
+    elif args.command == "export":
+        export_prompts_to_file(args.filename, args.format)
+    elif args.command == "list":
+        for prompt in list_prompts():
+            print(prompt)
+    else:
+        example()
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,60 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import Dict, Any
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from write_behind import WriteBehindQueue
+
+DEFAULT_CREDENTIALS_PATH = "./bern-8dbc2-firebase-adminsdk-fbsvc-f2d05b268c.json"
+
+# Shared Firestore client, created on first use. firebase_admin (and the gRPC
+# stack under it) is only imported then, so importing this module stays cheap.
+_client = None
+_client_lock = threading.Lock()
+
+def set_firestore_client(client) -> None:
+    """
+    Use the given client for all user reads and writes (e.g. a fake for local runs).
+    
+    Args:
+        client: A Firestore client, or None to go back to the default client
+    """
+    global _client
+    _client = client
 
 # Get Firestore client
 def get_firestore_client():
-    """Get or initialize Firestore client"""
-    try:
-        # Try to get the app if it's already initialized
-        firebase_admin.get_app()
-    except ValueError:
-        # Initialize it if not already done
-        cred = credentials.Certificate("./bern-8dbc2-firebase-adminsdk-fbsvc-f2d05b268c.json")
-        firebase_admin.initialize_app(cred)
+    """
+    Get or initialize Firestore client.
     
-    return firestore.client()
+    The Firebase app is initialized on the first call, with the service account
+    file named by FIREBASE_CREDENTIALS (or DEFAULT_CREDENTIALS_PATH).
+    
+    Raises:
+        Exception: If Firebase can't be initialized or the client can't be created
+    """
+    global _client
+    if _client is not None:
+        return _client
+    
+    with _client_lock:
+        if _client is not None:
+            return _client
+        
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        
+        try:
+            # Try to get the app if it's already initialized
+            firebase_admin.get_app()
+        except ValueError:
+            # Initialize it if not already done
+            cred = credentials.Certificate(os.environ.get("FIREBASE_CREDENTIALS", DEFAULT_CREDENTIALS_PATH))
+            firebase_admin.initialize_app(cred)
+        
+        _client = firestore.client()
+    return _client
 
 def get_user_from_firestore(user_id: str) -> Dict[str, Any]:
     """
@@ -38,9 +79,9 @@ def get_user_from_firestore(user_id: str) -> Dict[str, Any]:
         }
         
         if user_doc.exists:
-            return user_doc.to_dict()
+            return _with_queued_writes(user_id, user_doc.to_dict())
         else:
-            return default_user
+            return _with_queued_writes(user_id, default_user)
     except Exception as e:
         print(f"Error retrieving user: {e}")
         return {
@@ -80,4 +121,149 @@ def add_user_to_firestore(user_id: str, name: str, age: int, language: str, prof
         return True
     except Exception as e:
         print(f"Error adding user: {e}")
-        return False
\ No newline at end of file
+        return False
+
+# Async access
+#
+# The Firestore client is synchronous, so async callers run the blocking calls
+# on a small dedicated thread pool instead of the event loop. The pool and the
+# client are shared by every session in the process.
+
+DEFAULT_TIMEOUT_S = 5.0
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# In-flight user reads per (event loop, user id), so concurrent readers share one round trip
+_pending_reads: Dict[tuple, asyncio.Future] = {}
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="firestore")
+    return _executor
+
+def _empty_user() -> Dict[str, Any]:
+    return {
+        'name': None,
+        'age': None,
+        'language': None,
+        'proficiency': None
+    }
+
+async def _run_blocking(func, *args, timeout_s: float = DEFAULT_TIMEOUT_S):
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_get_executor(), functools.partial(func, *args)), timeout_s)
+
+def _forget_read(key: tuple, future: asyncio.Future) -> None:
+    # Only drop the entry if it still belongs to this read
+    if _pending_reads.get(key) is future:
+        del _pending_reads[key]
+
+def _read_user(user_id: str) -> Optional[Dict[str, Any]]:
+    user_doc = get_firestore_client().collection('Users').document(user_id).get()
+    return user_doc.to_dict() if user_doc.exists else None
+
+async def get_user_async(user_id: str, timeout_s: float = DEFAULT_TIMEOUT_S) -> Dict[str, Any]:
+    """
+    Retrieve user details without blocking the event loop.
+    
+    Concurrent calls for the same user ID share a single Firestore read.
+    
+    Args:
+        user_id: Unique identifier for the user document
+        timeout_s: Give up on the read after this many seconds
+    
+    Returns:
+        Dict with user data or empty values if the user doesn't exist or the read failed
+    """
+    key = (id(asyncio.get_running_loop()), user_id)
+    pending = _pending_reads.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_run_blocking(_read_user, user_id, timeout_s=timeout_s))
+        _pending_reads[key] = pending
+        pending.add_done_callback(functools.partial(_forget_read, key))
+    
+    try:
+        # Shielded so one caller being cancelled doesn't cancel the read for the others
+        user_data = await asyncio.shield(pending)
+    except asyncio.TimeoutError:
+        print(f"Error retrieving user: timed out after {timeout_s}s")
+        return _empty_user()
+    except Exception as e:
+        print(f"Error retrieving user: {e}")
+        return _empty_user()
+    
+    # Every caller gets its own copy of the shared result
+    return _with_queued_writes(user_id, dict(user_data) if user_data is not None else _empty_user())
+
+# Write-behind
+#
+# Tools shouldn't wait on Firestore mid-turn, so user updates are queued and
+# written in coalesced batches by a background thread.
+
+_write_queue: Optional[WriteBehindQueue] = None
+
+def get_write_queue() -> WriteBehindQueue:
+    """Get the process-wide write-behind queue, creating it on first use."""
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = WriteBehindQueue(get_firestore_client)
+    return _write_queue
+
+def queue_user_update(user_id: str, **fields) -> None:
+    """
+    Queue a merge write of the given fields into the user's document.
+    
+    Args:
+        user_id: Unique identifier for the user document
+        **fields: User fields to update (name, age, language, proficiency, ...)
+    """
+    get_write_queue().enqueue('Users', user_id, fields)
+
+def queue_vocabulary_update(user_id: str, word_id: str, fields: Dict[str, Any]) -> None:
+    """
+    Queue a merge write into the child's Vocabulary subcollection.
+    
+    Args:
+        user_id: Unique identifier for the user document
+        word_id: Document ID of the word (its normalized spelling)
+        fields: Word fields to write (translation, count, timestamps, ...)
+    """
+    get_write_queue().enqueue(f'Users/{user_id}/Vocabulary', word_id, fields)
+
+def _read_vocabulary(user_id: str) -> Dict[str, Dict[str, Any]]:
+    docs = get_firestore_client().collection('Users').document(user_id).collection('Vocabulary').stream()
+    return {doc.id: doc.to_dict() for doc in docs}
+
+async def get_vocabulary_async(user_id: str, timeout_s: float = DEFAULT_TIMEOUT_S) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the child's Vocabulary subcollection without blocking the event loop.
+    
+    Args:
+        user_id: Unique identifier for the user document
+        timeout_s: Give up on the read after this many seconds
+    
+    Returns:
+        Dict mapping word document IDs to their fields; empty if the read failed
+    """
+    try:
+        vocabulary = await _run_blocking(_read_vocabulary, user_id, timeout_s=timeout_s)
+    except asyncio.TimeoutError:
+        print(f"Error retrieving vocabulary: timed out after {timeout_s}s")
+        vocabulary = {}
+    except Exception as e:
+        print(f"Error retrieving vocabulary: {e}")
+        vocabulary = {}
+    
+    if _write_queue is not None:
+        for word_id, queued in _write_queue.pending_in(f'Users/{user_id}/Vocabulary').items():
+            vocabulary.setdefault(word_id, {}).update(queued)
+    return vocabulary
+
+def _with_queued_writes(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    # Overlay writes that are still queued so a read never goes back in time
+    if _write_queue is not None:
+        queued = _write_queue.pending('Users', user_id)
+        if queued:
+            user_data.update(queued)
+    return user_data
@@ -0,0 +1,125 @@
+"""
+Speculative preparation of the agent a turn is handing off to.
+
+A handoff only shows up in `result.last_agent` after the whole response has
+streamed, and the work that follows (rebuilding agents whose instructions
+depend on user fields that just changed, or all agents after a prompt change)
+used to run on the critical path after the last chunk. The workflow instead
+predicts the target from the handoff tool call as soon as it appears in the
+stream (or from a low-confidence intent router match at the start of the
+turn), prepares it in a worker thread while the new agent is still answering,
+and installs the prepared result if the prediction was right and nothing it
+was computed from has changed since.
+
+HandoffPrewarm records what happened on each handoff turn, including how much
+preparation time was taken off the critical path.
+"""
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from agents import Agent, RunConfig
+from agents.handoffs import Handoff
+
+
+def _log_debug(message: str) -> None:
+    print(f"[DEBUG] {message}")
+
+
+@dataclass
+class HandoffPrewarm:
+    """
+    Attributes:
+        predicted: Agent name the turn was predicted to hand off to
+        source: What the prediction came from ("stream" or "router")
+        target: Agent name the turn actually ended on
+        prepared_ms: Time spent preparing the predicted agent off the critical path
+        connection_ms: Time spent pre-opening the model connection
+        reused: Whether the prepared agents were installed as-is
+        finish_ms: Time the end-of-turn handoff handling took on the critical path
+    """
+    predicted: Optional[str] = None
+    source: Optional[str] = None
+    target: Optional[str] = None
+    prepared_ms: float = 0.0
+    connection_ms: float = 0.0
+    reused: bool = False
+    finish_ms: float = 0.0
+
+    @property
+    def hit(self) -> bool:
+        return self.predicted is not None and self.predicted == self.target
+
+    @property
+    def saved_ms(self) -> float:
+        """Preparation time that no longer sits between the last chunk and the next turn."""
+        if not self.hit:
+            return 0.0
+        return (self.prepared_ms if self.reused else 0.0) + self.connection_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(asdict(self), hit=self.hit, saved_ms=self.saved_ms)
+
+
+def summarize_prewarms(prewarms: Iterable[HandoffPrewarm]) -> Dict[str, float]:
+    """Totals over handoff turns: how many were predicted correctly and how much time that saved."""
+    prewarms = list(prewarms)
+    hits = [prewarm for prewarm in prewarms if prewarm.hit]
+    return {
+        "handoff_turns": len(prewarms),
+        "predicted": sum(1 for prewarm in prewarms if prewarm.predicted is not None),
+        "hits": len(hits),
+        "reused": sum(1 for prewarm in prewarms if prewarm.reused),
+        "saved_ms": sum(prewarm.saved_ms for prewarm in prewarms),
+        "saved_ms_per_handoff": sum(prewarm.saved_ms for prewarm in prewarms) / len(prewarms) if prewarms else 0.0,
+        "finish_ms_per_handoff": sum(prewarm.finish_ms for prewarm in prewarms) / len(prewarms) if prewarms else 0.0,
+    }
+
+
+def handoff_tool_names(agents: Iterable[Agent]) -> Dict[str, str]:
+    """Handoff tool name ("transfer_to_ChoiceLayer") -> agent name, for spotting handoffs in the stream."""
+    names = {}
+    for agent in agents:
+        for handoff in agent.handoffs:
+            if isinstance(handoff, Handoff):
+                names[handoff.tool_name] = handoff.agent_name
+            else:
+                names[Handoff.default_tool_name(handoff)] = handoff.name
+    return names
+
+
+async def prewarm_model_connection(run_config: Optional[RunConfig], model_name: Optional[str],
+                                   client: Optional[Any] = None) -> float:
+    """
+    Open the connection the next model call will use, before it is needed.
+
+    Only meaningful with a run_config: without one every run gets a fresh
+    provider and client, so there is no connection to reuse. Models can
+    provide their own async `prewarm()`; otherwise a cheap models.retrieve
+    request on `client` leaves a kept-alive connection in its pool.
+
+    Args:
+        run_config: The run configuration the agent runs use
+        model_name: The model the next call will use
+        client: The AsyncOpenAI client run_config's model provider was built with
+            (OpenAIProvider(openai_client=client)); None skips models without prewarm()
+
+    Returns:
+        Time spent, in milliseconds
+    """
+    if run_config is None:
+        return 0.0
+    started = time.perf_counter()
+    try:
+        model = run_config.model_provider.get_model(model_name)
+        prewarm = getattr(model, "prewarm", None)
+        if prewarm is not None:
+            await prewarm()
+        elif client is not None:
+            await client.models.retrieve(model_name)
+        else:
+            return 0.0
+    except Exception as e:
+        _log_debug(f"Error pre-opening the model connection: {e}")
+        return 0.0
+    return (time.perf_counter() - started) * 1000
@@ -0,0 +1,308 @@
+"""
+Pre-synthesized audio for the workflow's fixed utterances.
+
+The greeting, the "I need to know a bit more about you" messages, the game
+switch messages and the error message are the same text turn after turn, so
+synthesizing them again every time only adds TTS latency and cost. AudioCache
+stores their PCM content-addressed by (text, TTS model, voice, speed,
+instructions):
+
+- a memory tier: an LRU of clips, bounded in bytes
+- a disk tier: one <key>.pcm file per clip, memory-mapped on first use, so a
+  cache warmed once is shared by every process and survives restarts
+
+CachedTTSModel wraps the pipeline's TTS model. A cached text is yielded from
+the cache at once, without waiting on the model; an uncached text is
+synthesized as usual and stored if the workflow registered it as fixed
+(AudioCache.register), so model-generated replies never fill the cache.
+
+Warm the cache for every game in the catalog before going live:
+
+    python audio_cache.py warmup --dir .audio_cache
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from agents.voice import OpenAIVoiceModelProvider, STTModel, TTSModel, TTSModelSettings, VoiceModelProvider
+
+from text_chunker import segment_tts_settings
+
+DEFAULT_CACHE_DIR = ".audio_cache"
+
+
+def _log_debug(message: str) -> None:
+    print(f"[DEBUG] {message}")
+
+
+def utterance_key(text: str, model_name: str, settings: TTSModelSettings) -> str:
+    """Content address of the audio for a text; anything that changes the sound changes the key."""
+    parts = [text.strip(), model_name, str(settings.voice or ""), str(settings.speed or ""), settings.instructions]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Two-tier cache of synthesized PCM clips.
+
+    Args:
+        directory: Where clips are persisted (None keeps them in memory only)
+        max_memory_bytes: Size of the in-memory LRU tier
+    """
+
+    def __init__(self, directory: Optional[str] = DEFAULT_CACHE_DIR, max_memory_bytes: int = 32 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self._clips: "OrderedDict[str, object]" = OrderedDict()
+        self._memory_bytes = 0
+        self._registered = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def register(self, texts: Iterable[str]) -> None:
+        """Mark texts as fixed utterances, whose audio is stored the first time it is synthesized."""
+        self._registered.update(text.strip() for text in texts if text.strip())
+
+    def is_registered(self, text: str) -> bool:
+        return text.strip() in self._registered
+
+    def get(self, key: str) -> Optional[memoryview]:
+        """The clip stored under key, or None."""
+        with self._lock:
+            clip = self._clips.get(key)
+            if clip is not None:
+                self._clips.move_to_end(key)
+                self.hits += 1
+                return memoryview(clip)
+        clip = self._map(key)
+        if clip is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.disk_hits += 1
+        self._remember(key, clip)
+        return memoryview(clip)
+
+    def put(self, key: str, pcm: bytes) -> None:
+        """Store a clip in memory and, with a directory, on disk."""
+        if not pcm:
+            return
+        if self.directory:
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(pcm)
+            # Atomic, so a concurrent reader never maps a half-written clip
+            os.replace(temp_path, path)
+        self._remember(key, bytes(pcm))
+        self.stores += 1
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._clips or (self.directory is not None and os.path.exists(self._path(key)))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "clips_in_memory": len(self._clips),
+            "memory_bytes": self._memory_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def _map(self, key: str):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                # The mapping stays valid after the file is closed; pages load on first read
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: an empty file can't be mapped
+            return None
+
+    def _remember(self, key: str, clip) -> None:
+        size = len(clip)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._clips.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._clips[key] = clip
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._clips.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+
+class CachedTTSModel(TTSModel):
+    """
+    TTS model that serves cached clips and stores registered utterances.
+
+    Args:
+        model: The TTS model that synthesizes cache misses
+        cache: The audio cache
+    """
+
+    def __init__(self, model: TTSModel, cache: AudioCache):
+        self.model = model
+        self.cache = cache
+
+    @property
+    def model_name(self) -> str:
+        return self.model.model_name
+
+    async def run(self, text: str, settings: TTSModelSettings) -> AsyncIterator[bytes]:
+        key = utterance_key(text, self.model.model_name, settings)
+        clip = self.cache.get(key)
+        if clip is not None:
+            yield clip
+            return
+
+        if not self.cache.is_registered(text):
+            async for chunk in self.model.run(text, settings):
+                yield chunk
+            return
+
+        chunks = []
+        async for chunk in self.model.run(text, settings):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, b"".join(chunks))
+
+
+class CachedVoiceModelProvider(VoiceModelProvider):
+    """
+    Voice model provider whose TTS models go through an audio cache.
+
+    Args:
+        provider: The provider to wrap (e.g. OpenAIVoiceModelProvider())
+        cache: The audio cache
+    """
+
+    def __init__(self, provider: VoiceModelProvider, cache: AudioCache):
+        self.provider = provider
+        self.cache = cache
+
+    def get_stt_model(self, model_name: Optional[str]) -> STTModel:
+        return self.provider.get_stt_model(model_name)
+
+    def get_tts_model(self, model_name: Optional[str]) -> TTSModel:
+        return CachedTTSModel(self.provider.get_tts_model(model_name), self.cache)
+
+
+async def warm_cache(model: TTSModel, cache: AudioCache, texts: Iterable[str],
+                     settings: Optional[TTSModelSettings] = None) -> int:
+    """
+    Synthesize and store every text that isn't cached yet.
+
+    Args:
+        model: The TTS model to synthesize with (not a CachedTTSModel)
+        cache: The audio cache to fill
+        texts: The utterances, as the pipeline will send them to TTS
+        settings: The pipeline's TTS settings; the key depends on voice, speed and instructions
+
+    Returns:
+        The number of clips synthesized
+    """
+    settings = settings or TTSModelSettings()
+    synthesized = 0
+    for text in dict.fromkeys(text.strip() for text in texts if text.strip()):
+        key = utterance_key(text, model.model_name, settings)
+        if key in cache:
+            continue
+        chunks = [chunk async for chunk in model.run(text, settings)]
+        cache.put(key, b"".join(chunks))
+        _log_debug(f"Synthesized {text!r}")
+        synthesized += 1
+    return synthesized
+
+
+def warmup_utterances(catalog, limit: Optional[int], chunking: bool = True) -> List[str]:
+    """
+    The fixed utterances of every session the catalog can produce.
+
+    Switch messages use each game's catalog name. The go back message lists
+    the offered games, so it is produced for each distinct selection over
+    the ages and proficiency levels a child can have.
+
+    Args:
+        catalog: A game_catalog.GameCatalog
+        limit: Games offered per session
+        chunking: Whether the workflow runs with tts_chunking
+
+    Returns:
+        The utterances, without duplicates
+    """
+    import my_workflow
+    from intent_router import MAX_AGE, MIN_AGE
+
+    levels = {None, "Beginner", "Intermediate", "Advanced"}
+    levels.update(level for entry in catalog.games.values() for level in entry.proficiency)
+    selections = {tuple(entry.game_id for entry in catalog.select(age, level, limit))
+                  for age in [None, *range(MIN_AGE, MAX_AGE + 1)] for level in levels}
+    texts = []
+    for game_ids in sorted(selections):
+        # Sessions list their games in game ID order
+        games = {game_id: {"name": catalog.games[game_id].name} for game_id in sorted(game_ids)}
+        texts.extend(my_workflow.canned_utterances(games, chunking=chunking))
+    if len(catalog) > (limit or 0):
+        # Switch messages for games outside every selection are still spoken after a full rebuild
+        games = {game_id: {"name": entry.name} for game_id, entry in catalog.games.items()}
+        texts.extend(my_workflow.canned_utterances(games, chunking=chunking))
+    return list(dict.fromkeys(texts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-synthesized audio for the workflow's fixed utterances")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warmup = subparsers.add_parser("warmup", help="Synthesize the fixed utterances for every game in the catalog")
+    warmup.add_argument("--dir", default=DEFAULT_CACHE_DIR, help="Cache directory")
+    warmup.add_argument("--prompts-file", help="Read prompts from a backup file instead of Firebase")
+    warmup.add_argument("--voice", help="TTS voice (must match the pipeline's)")
+    warmup.add_argument("--no-chunking", action="store_true",
+                        help="Cache whole utterances, for workflows created with tts_chunking=False")
+    warmup.add_argument("--max-games", type=int, default=None,
+                        help="Games offered per session (default: the workflow's default offer limit)")
+    args = parser.parse_args()
+
+    # Loads the prompts and agents, so only when warming up
+    import my_workflow
+    from game_catalog import DEFAULT_OFFER_LIMIT, GameCatalog, get_catalog
+
+    if args.prompts_file:
+        with open(args.prompts_file) as f:
+            prompts = json.load(f)
+        catalog = GameCatalog.from_documents({prompt_id: prompt if isinstance(prompt, dict) else {"content": prompt}
+                                              for prompt_id, prompt in prompts.items()})
+    else:
+        # The catalog sessions offer games from, with the metadata name overrides
+        catalog = get_catalog(my_workflow.get_prompt_cache())
+    texts = warmup_utterances(catalog, args.max_games or DEFAULT_OFFER_LIMIT, chunking=not args.no_chunking)
+    games = catalog.games
+    settings = segment_tts_settings(voice=args.voice) if args.voice else segment_tts_settings()
+    cache = AudioCache(args.dir)
+    model = OpenAIVoiceModelProvider().get_tts_model(None)
+    synthesized = asyncio.run(warm_cache(model, cache, texts, settings))
+    print(f"{len(games)} games, {len(set(texts))} utterances, {synthesized} synthesized into {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
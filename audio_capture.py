@@ -0,0 +1,251 @@
+"""
+Callback-driven microphone capture.
+
+The PortAudio callback copies each block into a preallocated int16 ring buffer
+and wakes the asyncio side through loop.call_soon_threadsafe. The asyncio side
+slices fixed-size frames out of the ring into a set of preallocated frame slots
+and hands them to StreamedAudioInput.add_audio, so steady-state capture does not
+allocate audio buffers and nothing polls while the child is silent.
+"""
+import asyncio
+import collections
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from audio_format import AudioConverter, AudioFormat
+
+
+class Int16RingBuffer:
+    """
+    Fixed-capacity ring buffer of int16 samples shared by one producer and one consumer.
+
+    When the producer outruns the consumer the oldest samples are overwritten
+    and counted in `overrun_samples`.
+
+    Args:
+        capacity: Capacity in samples per channel
+        channels: Number of interleaved channels
+    """
+
+    def __init__(self, capacity: int, channels: int = 1):
+        self.capacity = capacity
+        self.channels = channels
+        self.overrun_samples = 0
+        self._buffer = np.zeros((capacity, channels), dtype=np.int16)
+        self._read_pos = 0
+        self._available = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> int:
+        """Number of samples per channel ready to be read."""
+        return self._available
+
+    def write(self, block: np.ndarray) -> None:
+        """Copy a (samples, channels) block into the buffer."""
+        count = len(block)
+        if count > self.capacity:
+            # Only the newest `capacity` samples can ever be read back
+            self.overrun_samples += count - self.capacity
+            block = block[-self.capacity:]
+            count = self.capacity
+
+        with self._lock:
+            write_pos = (self._read_pos + self._available) % self.capacity
+            first = min(count, self.capacity - write_pos)
+            self._buffer[write_pos:write_pos + first] = block[:first]
+            if first < count:
+                self._buffer[:count - first] = block[first:]
+
+            overflow = self._available + count - self.capacity
+            if overflow > 0:
+                self.overrun_samples += overflow
+                self._read_pos = (self._read_pos + overflow) % self.capacity
+                self._available -= overflow
+            self._available += count
+
+    def read_into(self, out: np.ndarray) -> bool:
+        """
+        Fill `out` with the oldest len(out) samples.
+
+        Returns:
+            False (and leaves the buffer untouched) if not enough samples are available
+        """
+        count = len(out)
+        with self._lock:
+            if self._available < count:
+                return False
+            first = min(count, self.capacity - self._read_pos)
+            out[:first] = self._buffer[self._read_pos:self._read_pos + first]
+            if first < count:
+                out[first:] = self._buffer[:count - first]
+            self._read_pos = (self._read_pos + count) % self.capacity
+            self._available -= count
+        return True
+
+    def read_some(self, out: np.ndarray) -> int:
+        """
+        Copy up to len(out) of the oldest samples into `out`.
+
+        Returns:
+            The number of samples copied
+        """
+        with self._lock:
+            count = min(len(out), self._available)
+            first = min(count, self.capacity - self._read_pos)
+            out[:first] = self._buffer[self._read_pos:self._read_pos + first]
+            if first < count:
+                out[first:count] = self._buffer[:count - first]
+            self._read_pos = (self._read_pos + count) % self.capacity
+            self._available -= count
+        return count
+
+    def clear(self) -> None:
+        """Discard all buffered samples."""
+        with self._lock:
+            self._read_pos = 0
+            self._available = 0
+
+
+class CallbackCapture:
+    """
+    Capture microphone audio with an InputStream callback and feed a StreamedAudioInput.
+
+    Args:
+        audio_input: The StreamedAudioInput (or anything with an async add_audio) to feed
+        stream_factory: Callable creating the input stream, called with samplerate,
+            channels, dtype, blocksize and callback keyword arguments
+            (sounddevice.InputStream or a fake device)
+        sample_rate: Capture sample rate in Hz
+        channels: Number of channels
+        frame_ms: Size of the frames handed to add_audio
+        buffer_s: Capacity of the ring buffer in seconds
+        device_format: Format to open the device in (see audio_format.negotiate_format); blocks
+            are converted to sample_rate/channels int16 before buffering. Defaults to opening
+            the device at sample_rate/channels directly.
+        frame_slots: Number of preallocated frames rotated through add_audio. Must exceed
+            the number of frames the consumer may hold at once; beyond that frames are copied.
+            Not used when audio_input has a frame pool (frame_pool.PooledAudioInput), which
+            lends out frames and takes them back once the consumer is done with them.
+    """
+
+    def __init__(self, audio_input, stream_factory: Callable, sample_rate: int = 24000,
+                 channels: int = 1, frame_ms: float = 20.0, buffer_s: float = 2.0,
+                 device_format: Optional[AudioFormat] = None, frame_slots: int = 64):
+        self.audio_input = audio_input
+        self.stream_factory = stream_factory
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.device_format = device_format or AudioFormat(sample_rate, channels, "int16")
+        self.device_block = int(self.device_format.sample_rate * frame_ms / 1000)
+        self._converter = AudioConverter(self.device_format, AudioFormat(sample_rate, channels, "int16"))
+
+        self.ring = Int16RingBuffer(int(sample_rate * buffer_s), channels)
+        self._frames = np.zeros((frame_slots, self.frame_samples, channels), dtype=np.int16)
+        self._next_slot = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake = asyncio.Event()
+        self._wake_pending = False
+        self._gate: Optional[asyncio.Event] = None
+        self._last_write_time = 0.0
+
+        self.frames_enqueued = 0
+        self.frames_copied = 0
+        self.wakeups = 0
+        self.latencies_s = collections.deque(maxlen=2048)
+
+    def _callback(self, indata, frames, time_info, status) -> None:
+        # Runs on the PortAudio thread: no awaiting, no allocation
+        if self._gate is not None and not self._gate.is_set():
+            return
+        if not self._converter.passthrough:
+            # Native rate/channels to the pipeline's format (this one does allocate)
+            indata = self._converter.convert(indata)
+        self.ring.write(indata)
+        self._last_write_time = time.perf_counter()
+        if not self._wake_pending and self.ring.available >= self.frame_samples:
+            self._wake_pending = True
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self, should_send: Optional[asyncio.Event] = None) -> None:
+        """
+        Capture until cancelled.
+
+        Args:
+            should_send: Optional gate; audio arriving while it is clear is dropped
+        """
+        self._loop = asyncio.get_running_loop()
+        self._gate = should_send
+        stream = self.stream_factory(
+            samplerate=self.device_format.sample_rate,
+            channels=self.device_format.channels,
+            dtype=self.device_format.dtype,
+            blocksize=self.device_block,
+            callback=self._callback,
+        )
+        stream.start()
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                self._wake_pending = False
+                self.wakeups += 1
+                await self._drain()
+        finally:
+            stream.stop()
+            stream.close()
+
+    async def _drain(self) -> None:
+        pool = getattr(self.audio_input, "pool", None)
+        while self.ring.available >= self.frame_samples:
+            if pool is not None:
+                # Reference-counted frames: the input returns them to the pool once consumed
+                frame = pool.acquire()
+                if not self.ring.read_into(frame):
+                    pool.release(frame)
+                    return
+                await self.audio_input.add_audio(frame)
+                self.frames_enqueued += 1
+                self.latencies_s.append(time.perf_counter() - self._last_write_time)
+                continue
+
+            frame = self._frames[self._next_slot]
+            if not self.ring.read_into(frame):
+                return
+            self._next_slot = (self._next_slot + 1) % len(self._frames)
+
+            if self._consumer_backlog() >= len(self._frames) - 1:
+                # The consumer still holds every slot; don't let the next frame overwrite one
+                frame = frame.copy()
+                self.frames_copied += 1
+
+            await self.audio_input.add_audio(frame)
+            self.frames_enqueued += 1
+            self.latencies_s.append(time.perf_counter() - self._last_write_time)
+
+    def _consumer_backlog(self) -> int:
+        queue = getattr(self.audio_input, "queue", None)
+        return queue.qsize() if queue is not None else 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return capture counters and capture-to-enqueue latency percentiles (ms)."""
+        latencies = sorted(self.latencies_s)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            "frames_enqueued": self.frames_enqueued,
+            "frames_copied": self.frames_copied,
+            "wakeups": self.wakeups,
+            "overrun_samples": self.ring.overrun_samples,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+        }
@@ -0,0 +1,221 @@
+"""
+Audio format negotiation and streaming sample-rate conversion.
+
+The pipeline works in 24 kHz mono int16, but many devices run natively at
+44.1 or 48 kHz, and opening them at 24 kHz leaves the conversion to PortAudio
+or the OS. Instead the streams are opened in the device's native format
+(negotiate_format) and converted here:
+
+- Resampler: a vectorized polyphase FIR resampler for any rational ratio
+  (e.g. 147/80 between 24 and 44.1 kHz), streaming block by block with its
+  filter history carried over. Filter taps and the per-block gather indices
+  are computed once and cached.
+- AudioConverter: stereo-to-mono downmix (or mono-to-stereo upmix), int16 or
+  float32 in and out, and resampling, in one call per block. The downmix and
+  the int16 scaling are folded into a single matrix product before filtering.
+"""
+import functools
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """
+    Attributes:
+        sample_rate: Samples per second per channel
+        channels: Number of interleaved channels
+        dtype: "int16" or "float32"
+    """
+    sample_rate: int = 24000
+    channels: int = 1
+    dtype: str = "int16"
+
+
+PIPELINE_FORMAT = AudioFormat(24000, 1, "int16")
+
+
+@functools.lru_cache(maxsize=32)
+def polyphase_taps(up: int, down: int, zero_crossings: int = 8, beta: float = 8.6) -> np.ndarray:
+    """
+    Kaiser-windowed sinc low-pass filter split into `up` phases.
+
+    Args:
+        up: Interpolation factor
+        down: Decimation factor
+        zero_crossings: Sinc zero crossings on each side of the centre, at the lower of the two rates
+        beta: Kaiser window shape; 8.6 gives about 80 dB of stopband attenuation
+
+    Returns:
+        Array of shape (up, taps_per_phase); row p holds h[p], h[p + up], h[p + 2 * up], ...
+    """
+    factor = max(up, down)
+    taps_per_phase = int(math.ceil(2 * zero_crossings * factor / up))
+    length = taps_per_phase * up
+    # Cut off a little below the lower Nyquist frequency so the transition band stays clear of aliases
+    cutoff = 0.95 / factor
+    t = np.arange(length) - (length - 1) / 2
+    h = cutoff * np.sinc(cutoff * t) * np.kaiser(length, beta) * up
+    phases = h.reshape(taps_per_phase, up).T.astype(np.float32)
+    phases.setflags(write=False)
+    return phases
+
+
+class Resampler:
+    """
+    Streaming rational-ratio resampler for float32 (samples, channels) blocks.
+
+    Args:
+        in_rate: Input sample rate in Hz
+        out_rate: Output sample rate in Hz
+        channels: Number of channels
+        zero_crossings: Filter length (see polyphase_taps); more is sharper and slower
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1, zero_crossings: int = 8):
+        divisor = math.gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self._taps = polyphase_taps(self.up, self.down, zero_crossings)
+        self._width = self._taps.shape[1]
+        # Output n sits at upsampled position n * down; _offset is where the next output sits
+        # relative to the first sample of the next block, in upsampled units
+        self._offset = 0
+        self._history = np.zeros((self._width - 1, channels), dtype=np.float32)
+        self._plans: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, int]] = {}
+
+    @property
+    def delay(self) -> float:
+        """Filter delay in output samples."""
+        return (self._taps.size - 1) / 2 / self.down
+
+    def reset(self) -> None:
+        """Forget the filter history, e.g. after a flush."""
+        self._offset = 0
+        self._history[:] = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Resample a float32 (samples, channels) block; returns the output samples it completes."""
+        count = len(block)
+        if self.up == self.down:
+            return block
+        phases, windows, produced = self._plan(count, self._offset)
+        buffer = np.concatenate((self._history, block))
+        # (outputs, taps, channels) gather, weighted by each output's phase of the filter
+        out = np.einsum("mk,mkc->mc", self._taps[phases], buffer[windows])
+        self._history = buffer[count:]
+        self._offset += produced * self.down - count * self.up
+        return out
+
+    def _plan(self, count: int, offset: int):
+        """Phases and gather indices for a block, cached per block size and starting offset."""
+        key = (count, offset)
+        plan = self._plans.get(key)
+        if plan is None:
+            end = count * self.up
+            produced = max(0, -(-(end - offset) // self.down))
+            positions = offset + np.arange(produced) * self.down
+            phases = positions % self.up
+            # Newest input sample each output uses, as an index into history + block
+            newest = positions // self.up + self._width - 1
+            windows = newest[:, None] - np.arange(self._width)[None, :]
+            plan = (phases, windows, produced)
+            if len(self._plans) < 64:
+                self._plans[key] = plan
+        return plan
+
+
+class AudioConverter:
+    """
+    One-call conversion between two audio formats.
+
+    Args:
+        source: Format of the blocks passed to convert()
+        target: Format convert() returns
+        zero_crossings: Resampler filter length
+    """
+
+    def __init__(self, source: AudioFormat, target: AudioFormat, zero_crossings: int = 8):
+        self.source = source
+        self.target = target
+        # Downmix/upmix and int16 scaling as one (source channels, target channels) matrix
+        scale = 1.0 / 32768.0 if source.dtype == "int16" else 1.0
+        if source.channels == target.channels:
+            mix = np.eye(source.channels)
+        elif target.channels == 1:
+            mix = np.full((source.channels, 1), 1.0 / source.channels)
+        elif source.channels == 1:
+            mix = np.ones((1, target.channels))
+        else:
+            raise ValueError(f"Can't convert {source.channels} channels to {target.channels}")
+        self._mix = (mix * scale).astype(np.float32)
+        self._identity_mix = source.channels == target.channels and scale == 1.0
+        # Mix down before resampling and up after it, so the filter runs on as few channels as possible
+        self._upmix = target.channels > source.channels
+        self.resampler = None
+        if source.sample_rate != target.sample_rate:
+            self.resampler = Resampler(source.sample_rate, target.sample_rate,
+                                       min(source.channels, target.channels), zero_crossings)
+
+    @property
+    def passthrough(self) -> bool:
+        return self.source == self.target
+
+    def reset(self) -> None:
+        if self.resampler is not None:
+            self.resampler.reset()
+
+    def convert(self, block) -> np.ndarray:
+        """
+        Convert one block.
+
+        Args:
+            block: Samples in the source format, (samples, channels) or flat interleaved
+
+        Returns:
+            (samples, channels) array in the target format
+        """
+        samples = np.asarray(block).reshape(-1, self.source.channels)
+        if self.passthrough:
+            return samples
+        if self._identity_mix:
+            mixed = samples.astype(np.float32, copy=False)
+        elif self._upmix:
+            mixed = samples.astype(np.float32, copy=False)
+        else:
+            mixed = samples.astype(np.float32, copy=False) @ self._mix
+        if self.resampler is not None:
+            mixed = self.resampler.process(mixed)
+        if self._upmix:
+            mixed = mixed @ self._mix
+        if self.target.dtype == "int16":
+            return np.clip(np.rint(mixed * 32767.0), -32768, 32767).astype(np.int16)
+        return mixed.astype(np.float32, copy=False)
+
+
+def negotiate_format(device_info: Optional[dict], preferred: AudioFormat = PIPELINE_FORMAT,
+                     kind: str = "input", max_channels: int = 2) -> AudioFormat:
+    """
+    The format to open a device in: its native rate and channel count (up to max_channels).
+
+    Args:
+        device_info: sounddevice.query_devices(kind=...) for the device, or None
+        preferred: The pipeline's format, used for anything the device doesn't report
+        kind: "input" or "output"
+        max_channels: Most channels to open (the converter down- or upmixes to the pipeline's)
+
+    Returns:
+        The device format, always int16 (PortAudio converts sample formats cheaply)
+    """
+    if not device_info:
+        return preferred
+    rate = int(device_info.get("default_samplerate") or preferred.sample_rate)
+    available = int(device_info.get(f"max_{kind}_channels") or preferred.channels)
+    channels = max(1, min(available, max_channels))
+    return AudioFormat(rate, channels, "int16")
@@ -0,0 +1,223 @@
+"""
+Non-blocking audio playback.
+
+Pipeline audio is pushed into a bounded jitter buffer from the asyncio side and
+drained by the OutputStream callback on the PortAudio thread, so a slow device
+write never stalls the event loop. Playback of a turn starts once the target
+latency worth of audio is buffered, and the buffer can be flushed instantly
+when the child barges in.
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from audio_capture import Int16RingBuffer
+from audio_format import AudioConverter, AudioFormat
+
+
+class JitterBuffer:
+    """
+    Bounded buffer between the voice pipeline and the output device.
+
+    Args:
+        sample_rate: Playback sample rate in Hz
+        channels: Number of channels
+        target_latency_ms: Audio buffered before playback (re)starts
+        max_buffer_ms: Capacity; writers wait for space beyond this
+    """
+
+    def __init__(self, sample_rate: int = 24000, channels: int = 1,
+                 target_latency_ms: float = 120.0, max_buffer_ms: float = 2000.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.target_samples = int(sample_rate * target_latency_ms / 1000)
+        self._ring = Int16RingBuffer(max(int(sample_rate * max_buffer_ms / 1000), self.target_samples), channels)
+
+        self._priming = True
+        self._end_of_turn = False
+        self._discarding = False
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._space = asyncio.Event()
+        self._space_wanted = False
+
+        self.underruns = 0
+        self.overruns = 0
+        self.flushes = 0
+        self.samples_played = 0
+
+    @property
+    def buffered_ms(self) -> float:
+        return self._ring.available * 1000 / self.sample_rate
+
+    async def write(self, data) -> None:
+        """
+        Queue audio for playback, waiting for space when the buffer is full.
+
+        Args:
+            data: int16 or float32 samples, or raw int16 PCM bytes
+        """
+        if self._discarding:
+            return
+        self._loop = asyncio.get_running_loop()
+        samples = _as_int16(data).reshape(-1, self.channels)
+        self._end_of_turn = False
+
+        generation = self._generation
+        overran = False
+        while len(samples) and generation == self._generation:
+            space = self._ring.capacity - self._ring.available
+            if space == 0:
+                # Producer is ahead of the device: wait for the callback to drain
+                if not overran:
+                    self.overruns += 1
+                    overran = True
+                self._space.clear()
+                self._space_wanted = True
+                await self._space.wait()
+                continue
+            self._ring.write(samples[:space])
+            samples = samples[space:]
+
+    def start_turn(self) -> None:
+        """Accept audio again after a barge-in flush."""
+        self._discarding = False
+
+    def end_of_turn(self) -> None:
+        """Mark the end of a response so a tail shorter than the target latency still plays."""
+        self._end_of_turn = True
+
+    def flush(self, until_next_turn: bool = True) -> None:
+        """
+        Drop all buffered audio immediately (barge-in).
+
+        Args:
+            until_next_turn: Also drop audio still arriving for the interrupted
+                response, until start_turn() is called
+        """
+        with self._lock:
+            self._ring.clear()
+            self._priming = True
+            self._end_of_turn = False
+            self._discarding = until_next_turn
+            self._generation += 1
+            self.flushes += 1
+        # Release a writer blocked on a full buffer; it sees the new generation and stops
+        self._space_wanted = True
+        self._wake_writer()
+
+    def fill(self, out: np.ndarray) -> None:
+        """Fill an output block; called from the device callback."""
+        with self._lock:
+            if self._priming:
+                if self._ring.available < self.target_samples and not self._end_of_turn:
+                    out.fill(0)
+                    return
+                self._priming = False
+
+            copied = self._ring.read_some(out)
+            if copied < len(out):
+                out[copied:] = 0
+                # Running dry mid-turn is an underrun; at the end of a turn it is expected
+                if not self._end_of_turn:
+                    self.underruns += 1
+                self._priming = True
+            self.samples_played += copied
+        self._wake_writer()
+
+    def _wake_writer(self) -> None:
+        if self._space_wanted and self._loop is not None:
+            self._space_wanted = False
+            self._loop.call_soon_threadsafe(self._space.set)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "buffered_ms": self.buffered_ms,
+            "underruns": self.underruns,
+            "overruns": self.overruns,
+            "flushes": self.flushes,
+            "samples_played": self.samples_played,
+        }
+
+
+class PlaybackStage:
+    """
+    Output stream driven by a JitterBuffer.
+
+    Args:
+        stream_factory: Callable creating the output stream, called with samplerate,
+            channels, dtype, blocksize and callback keyword arguments
+            (sounddevice.OutputStream or a fake device)
+        sample_rate: Sample rate of the audio passed to write(), in Hz
+        channels: Channels of the audio passed to write()
+        target_latency_ms: Audio buffered before playback (re)starts
+        max_buffer_ms: Capacity of the jitter buffer
+        block_ms: Device period
+        device_format: Format to open the device in (see audio_format.negotiate_format); audio
+            is converted to it before buffering. Defaults to sample_rate/channels int16.
+    """
+
+    def __init__(self, stream_factory: Callable, sample_rate: int = 24000, channels: int = 1,
+                 target_latency_ms: float = 120.0, max_buffer_ms: float = 2000.0, block_ms: float = 20.0,
+                 device_format: Optional[AudioFormat] = None):
+        self.stream_factory = stream_factory
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.device_format = device_format or AudioFormat(sample_rate, channels, "int16")
+        self._converter = AudioConverter(AudioFormat(sample_rate, channels, "int16"), self.device_format)
+        self.block_samples = int(self.device_format.sample_rate * block_ms / 1000)
+        self.buffer = JitterBuffer(self.device_format.sample_rate, self.device_format.channels,
+                                   target_latency_ms, max_buffer_ms)
+        self._stream = None
+
+    def start(self) -> None:
+        self._stream = self.stream_factory(
+            samplerate=self.device_format.sample_rate,
+            channels=self.device_format.channels,
+            dtype=self.device_format.dtype,
+            blocksize=self.block_samples,
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        self.buffer.fill(outdata)
+
+    async def write(self, data) -> None:
+        if not self._converter.passthrough:
+            data = self._converter.convert(_as_int16(data))
+        await self.buffer.write(data)
+
+    def start_turn(self) -> None:
+        self.buffer.start_turn()
+
+    def end_of_turn(self) -> None:
+        self.buffer.end_of_turn()
+
+    def flush(self, until_next_turn: bool = True) -> None:
+        self.buffer.flush(until_next_turn)
+        # The flushed audio's filter tail mustn't leak into the next response
+        self._converter.reset()
+
+    def stats(self) -> Dict[str, float]:
+        return self.buffer.stats()
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+def _as_int16(data) -> np.ndarray:
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return np.frombuffer(data, dtype=np.int16)
+    data = np.asarray(data)
+    if data.dtype == np.int16:
+        return data
+    if data.dtype == np.float32:
+        return (np.clip(data, -1.0, 1.0) * 32767).astype(np.int16)
+    return data.astype(np.int16)
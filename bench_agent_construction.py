@@ -0,0 +1,116 @@
+"""
+Benchmark building the agent set (initialize_agents) for 1, 10 and 100 game prompts.
+
+Compares the explicit SessionTools registry with the stack-frame walk
+initialize_agents used before to find the session's tools: from the session's
+own call stack, and from a thread with no MyWorkflow on its stack (a worker
+thread or server task), where the walk found nothing and built placeholder tools
+on every call. Runs against FakeFirestore.
+
+    python bench_agent_construction.py --rounds 20 --games 1,10,100
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import threading
+import time
+
+from agents import function_tool
+
+import my_workflow
+from User_Firebase import set_firestore_client
+from fake_firestore import FakeFirestore
+
+USER = {"id": "ID1", "name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"}
+
+USER_INFO_PROMPT = (
+    "You are Amigo, a friendly Spanish tutor. Ask the child for their name and age, "
+    "then call save_user_info and hand off to the ChoiceLayer."
+)
+
+
+def seed_client(games: int, prompts_file: str = "prompts_backup.json") -> FakeFirestore:
+    # Game prompts are copies of the shipped ones under new IDs
+    with open(prompts_file) as f:
+        shipped = json.load(f)
+    templates = [content for prompt_id, content in sorted(shipped.items()) if prompt_id.endswith("_GAME_PROMPT")]
+    client = FakeFirestore()
+    client._write("Prompts", "USER_INFO_PROMPT", {"content": USER_INFO_PROMPT})
+    client._write("Prompts", "CHOICE_LAYER_PROMPT", {"content": shipped["CHOICE_LAYER_PROMPT"]})
+    for index in range(games):
+        client._write("Prompts", f"GAME{index:03d}_GAME_PROMPT", {"content": templates[index % len(templates)]})
+    return client
+
+
+def legacy_session_tools():
+    # The lookup initialize_agents did before SessionTools
+    from inspect import currentframe
+    frame = currentframe()
+    while frame:
+        if 'self' in frame.f_locals and isinstance(frame.f_locals['self'], my_workflow.MyWorkflow):
+            return (frame.f_locals['self']._tools.save_user_info, frame.f_locals['self']._tools.get_child_name,
+                    frame.f_locals['self']._tools.get_child_age)
+        frame = frame.f_back
+    return (function_tool(my_workflow.placeholder_save_user_info),
+            function_tool(my_workflow.placeholder_get_child_name),
+            function_tool(my_workflow.placeholder_get_child_age))
+
+
+def walk_from_session(self):
+    # A frame with the workflow as `self`, like MyWorkflow.__init__ and _prepare_refresh
+    return legacy_session_tools()
+
+
+def per_call_ms(call, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def in_thread(call):
+    # A call stack that doesn't go through MyWorkflow
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=call()))
+    thread.start()
+    thread.join()
+    return result["value"]
+
+
+def run(games: int, rounds: int):
+    client = seed_client(games)
+    set_firestore_client(client)
+    my_workflow.configure_prompt_cache(client)
+    workflow = my_workflow.MyWorkflow(on_start=lambda _: None, user_id="ID1", user_data=USER)
+    tools = workflow._tools
+
+    _, _, available = my_workflow.initialize_agents(USER, tools, max_games=None)
+    assert len(available) == games
+
+    build = per_call_ms(lambda: my_workflow.initialize_agents(USER, tools, max_games=None), rounds)
+    walk = per_call_ms(lambda: walk_from_session(workflow), rounds)
+    fallback = per_call_ms(lambda: in_thread(legacy_session_tools), rounds)
+    registry = per_call_ms(lambda: in_thread(lambda: tools), rounds)
+    return build, walk, fallback - registry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--games", default="1,10,100", help="Comma-separated game prompt counts")
+    args = parser.parse_args()
+
+    print(f"{'games':>6}{'agent set':>12}{'frame walk':>13}{'thread fallback':>17}   (median ms per build)")
+    for games in [int(count) for count in args.games.split(",")]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            build, walk, fallback = run(games, args.rounds)
+        print(f"{games:>6}{build:>12.2f}{walk:>13.3f}{fallback:>17.3f}")
+    print("\nframe walk / thread fallback: what the old tool lookup added to each build on top of the agent set")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare CPU use and capture-to-enqueue latency of the old busy-wait mic loop and CallbackCapture.
+
+Both run against FakeInputStream, so no audio hardware is needed.
+
+    python bench_audio_capture.py --seconds 5
+"""
+import argparse
+import asyncio
+import time
+
+from agents.voice import StreamedAudioInput
+
+from audio_capture import CallbackCapture
+from fake_audio import FakeInputStream
+
+SAMPLE_RATE = 24000
+FRAME_SAMPLES = int(SAMPLE_RATE * 0.02)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def drain(audio_input: StreamedAudioInput) -> None:
+    # Stand-in for the pipeline consuming frames
+    while True:
+        await audio_input.queue.get()
+
+
+async def polling_capture(seconds: float):
+    # The loop send_mic_audio used before CallbackCapture
+    audio_input = StreamedAudioInput()
+    stream = FakeInputStream(samplerate=SAMPLE_RATE, blocksize=FRAME_SAMPLES)
+    stream.start()
+    latencies = []
+    end = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < end:
+            if stream.read_available < FRAME_SAMPLES:
+                await asyncio.sleep(0)
+                continue
+            data, _ = stream.read(FRAME_SAMPLES)
+            await audio_input.add_audio(data)
+            latencies.append(time.perf_counter() - stream.block_times[-1])
+            await asyncio.sleep(0)
+    finally:
+        stream.close()
+    return latencies
+
+
+async def callback_capture(seconds: float):
+    audio_input = StreamedAudioInput()
+    capture = CallbackCapture(
+        audio_input,
+        lambda **kwargs: FakeInputStream(**kwargs),
+        sample_rate=SAMPLE_RATE,
+        frame_ms=20,
+    )
+    consumer = asyncio.create_task(drain(audio_input))
+    task = asyncio.create_task(capture.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    consumer.cancel()
+    await asyncio.gather(task, consumer, return_exceptions=True)
+    return list(capture.latencies_s)
+
+
+def measure(label, coro_factory, seconds):
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    latencies = asyncio.run(coro_factory(seconds))
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    print(f"{label:<10} cpu {cpu / wall * 100:6.1f}%   frames {len(latencies):5d}   "
+          f"latency p50 {percentile(latencies, 0.5) * 1000:6.2f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    measure("polling", polling_capture, args.seconds)
+    measure("callback", callback_capture, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
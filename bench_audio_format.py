@@ -0,0 +1,66 @@
+"""
+CPU cost of the audio format converter.
+
+For each device format it reports the CPU time per second of audio of the
+conversions capture (device -> 24 kHz mono int16) and playback (24 kHz mono
+int16 -> device) run, in 20 ms blocks. Their accuracy is checked by
+tests/test_audio_format.py.
+
+    python bench_audio_format.py --seconds 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+from audio_format import PIPELINE_FORMAT, AudioConverter, AudioFormat
+
+DEVICE_FORMATS = [
+    AudioFormat(48000, 1, "int16"),
+    AudioFormat(48000, 2, "int16"),
+    AudioFormat(44100, 2, "int16"),
+    AudioFormat(44100, 1, "float32"),
+    AudioFormat(16000, 1, "int16"),
+]
+TONES_HZ = [220, 440, 1000, 2500, 5000]
+
+
+def tones(rate, seconds, channels=1, delay=0.0):
+    """The test signal, optionally delayed by a (fractional) number of samples."""
+    t = (np.arange(int(rate * seconds)) - delay) / rate
+    signal = sum(np.sin(2 * np.pi * f * t + f) for f in TONES_HZ) * (0.8 / len(TONES_HZ))
+    return np.repeat(signal[:, None], channels, axis=1)
+
+
+def as_format(signal, fmt):
+    if fmt.dtype == "int16":
+        return np.rint(signal * 32767).astype(np.int16)
+    return signal.astype(np.float32)
+
+
+def convert_blocks(converter, samples, block_ms=20):
+    block = int(converter.source.sample_rate * block_ms / 1000)
+    started = time.process_time()
+    out = np.concatenate([converter.convert(samples[i:i + block]) for i in range(0, len(samples), block)])
+    return out, time.process_time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'device format':<22}{'capture ms/s':>14}{'playback ms/s':>15}")
+    for device in DEVICE_FORMATS:
+        capture = AudioConverter(device, PIPELINE_FORMAT)
+        _, capture_cpu = convert_blocks(capture, as_format(tones(device.sample_rate, args.seconds, device.channels),
+                                                           device))
+        playback = AudioConverter(PIPELINE_FORMAT, device)
+        _, playback_cpu = convert_blocks(playback, as_format(tones(PIPELINE_FORMAT.sample_rate, args.seconds),
+                                                             PIPELINE_FORMAT))
+        label = f"{device.sample_rate} Hz {device.channels}ch {device.dtype}"
+        print(f"{label:<22}{capture_cpu / args.seconds * 1000:>14.2f}{playback_cpu / args.seconds * 1000:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Bytes allocated per second of captured audio, measured with tracemalloc.
+
+Feeds 20 ms device blocks through three capture paths into a consumer that
+takes frames off the StreamedAudioInput queue the way the speech-to-text
+session does, and subtracts what the queue hand-off itself allocates (the
+"queue" baseline, which passes the same array every time):
+
+- read: a new array per frame, like the stream.read() loop main.py used first
+- slots: CallbackCapture rotating its preallocated frame slots
+- pool: CallbackCapture with a PooledAudioInput, frames lent out by a FramePool
+
+    python bench_frame_pool.py --seconds 10
+"""
+import argparse
+import asyncio
+import tracemalloc
+
+import numpy as np
+from agents.voice import StreamedAudioInput
+
+from audio_capture import CallbackCapture
+from frame_pool import FramePool, PooledAudioInput
+
+SAMPLE_RATE = 24000
+FRAME_SAMPLES = int(SAMPLE_RATE * 0.02)
+
+
+class _NoStream:
+    def __init__(self, **kwargs):
+        pass
+
+
+async def run(path, frames):
+    block = np.random.default_rng(1).integers(-3000, 3000, (FRAME_SAMPLES, 1)).astype(np.int16)
+    if path in ("queue", "read"):
+        audio_input = StreamedAudioInput()
+        capture = None
+    else:
+        audio_input = (PooledAudioInput(FramePool(FRAME_SAMPLES)) if path == "pool" else StreamedAudioInput())
+        capture = CallbackCapture(audio_input, _NoStream, sample_rate=SAMPLE_RATE, frame_ms=20)
+        capture._loop = asyncio.get_running_loop()
+
+    async def step():
+        if path == "queue":
+            await audio_input.add_audio(block)
+        elif capture is None:
+            await audio_input.add_audio(block.copy())
+        else:
+            capture.ring.write(block)
+            await capture._drain()
+        frame = await audio_input.queue.get()
+        # Stand-in for the consumer encoding the frame before asking for the next one
+        frame.sum()
+
+    # Warm up so one-time allocations (pool, queue internals) aren't counted
+    for _ in range(50):
+        await step()
+
+    allocated = 0
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await step()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    stats = audio_input.pool.stats() if path == "pool" else {}
+    return allocated, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Seconds of audio per path")
+    args = parser.parse_args()
+
+    frames = int(args.seconds * SAMPLE_RATE / FRAME_SAMPLES)
+    tracemalloc.start()
+    baseline, _ = asyncio.run(run("queue", frames))
+    print(f"queue hand-off baseline: {baseline / frames:.0f} bytes/frame (not included below)")
+    print(f"{'path':<8}{'bytes/s of audio':>18}{'bytes/frame':>13}")
+    for path in ("read", "slots", "pool"):
+        allocated, stats = asyncio.run(run(path, frames))
+        allocated = max(0, allocated - baseline)
+        extra = f"   (pool peak {stats['peak_in_use']} frames, {stats['fallback_allocations']} fallbacks)" \
+            if stats else ""
+        print(f"{path:<8}{allocated / args.seconds:>18.0f}{allocated / frames:>13.0f}{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark game detection and the ChoiceLayer's size at 10, 100 and 1000 game prompts.
+
+Compares the regex and line scan detect_game_prompts ran on every
+initialize_agents call before the catalog with building the GameCatalog index
+(once per prompt version) and selecting a child's games from it. Then builds
+the full agent set with every game offered and with the default top-N, and
+reports the ChoiceLayer's instruction size. Half of the generated games carry
+explicit age and proficiency metadata. Runs against FakeFirestore.
+
+    python bench_game_catalog.py --rounds 20 --games 10,100,1000
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import statistics
+import time
+
+import my_workflow
+from User_Firebase import set_firestore_client
+from fake_firestore import FakeFirestore
+from game_catalog import DEFAULT_OFFER_LIMIT, GameCatalog
+
+USER = {"id": "ID1", "name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"}
+
+USER_INFO_PROMPT = (
+    "You are Amigo, a friendly Spanish tutor. Ask the child for their name and age, "
+    "then call save_user_info and hand off to the ChoiceLayer."
+)
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+
+
+def legacy_detect_game_prompts(prompts):
+    # The metadata extraction detect_game_prompts did before the catalog (without template rendering)
+    game_prompts = {}
+    game_pattern = re.compile(r'(.+)_GAME_PROMPT$')
+    for prompt_id, content in prompts.items():
+        match = game_pattern.match(prompt_id)
+        if match:
+            game_id = match.group(1)
+            name = game_id.replace("_", " ")
+            description = f"Learn Spanish through a fun {game_id.lower()} adventure!"
+            if "game is called" in content.lower():
+                for line in content.split('\n'):
+                    if "game is called" in line.lower():
+                        name_match = re.search(r'"([^"]+)"', line)
+                        if name_match:
+                            name = name_match.group(1).rstrip(".!?, ")
+                        else:
+                            name_match = re.search(r'called\s+(.+?)[\.\s]', line)
+                            if name_match:
+                                name = name_match.group(1).strip('" ')
+            game_prompts[prompt_id] = {"game_id": game_id, "name": name, "description": description}
+    return game_prompts
+
+
+def make_documents(games: int, prompts_file: str = "prompts_backup.json"):
+    with open(prompts_file) as f:
+        shipped = json.load(f)
+    templates = [content for prompt_id, content in sorted(shipped.items()) if prompt_id.endswith("_GAME_PROMPT")]
+    documents = {
+        "USER_INFO_PROMPT": {"content": USER_INFO_PROMPT},
+        "CHOICE_LAYER_PROMPT": {"content": shipped["CHOICE_LAYER_PROMPT"]},
+    }
+    for index in range(games):
+        document = {"content": templates[index % len(templates)].replace(
+            "game is called", f"game (number {index}) is called")}
+        if index % 2:
+            # Explicit metadata on every other game
+            document.update(name=f"Game {index}", description=f"Spanish game number {index}.",
+                            min_age=3 + index % 5, max_age=8 + index % 5,
+                            proficiency=LEVELS[index % 3], priority=index % 7)
+        documents[f"GAME{index:04d}_GAME_PROMPT"] = document
+    return documents
+
+
+def median_ms(call, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run(games: int, rounds: int):
+    documents = make_documents(games)
+    prompts = {prompt_id: document["content"] for prompt_id, document in documents.items()}
+    assert ({info["game_id"] for info in legacy_detect_game_prompts(prompts).values()}
+            == set(GameCatalog.from_prompts(prompts).games))
+
+    legacy = median_ms(lambda: legacy_detect_game_prompts(prompts), rounds)
+    build = median_ms(lambda: GameCatalog.from_documents(documents, version=1), rounds)
+    catalog = GameCatalog.from_documents(documents, version=1)
+
+    def cold_select():
+        catalog._selections.clear()
+        catalog.select(USER["age"], USER["proficiency"])
+
+    select_cold = median_ms(cold_select, rounds)
+    select = median_ms(lambda: catalog.select(USER["age"], USER["proficiency"]), rounds)
+
+    client = FakeFirestore()
+    for prompt_id, document in documents.items():
+        client._write("Prompts", prompt_id, document)
+    set_firestore_client(client)
+    my_workflow.configure_prompt_cache(client)
+    agent_sets = {}
+    for label, limit in (("all", None), ("top", DEFAULT_OFFER_LIMIT)):
+        elapsed = median_ms(lambda: my_workflow.initialize_agents(USER, max_games=limit), max(1, rounds // 4))
+        _, choice_layer, available = my_workflow.initialize_agents(USER, max_games=limit)
+        agent_sets[label] = (elapsed, len(available), len(choice_layer.instructions))
+    return legacy, build, select_cold, select, agent_sets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--games", default="10,100,1000", help="Comma-separated game prompt counts")
+    args = parser.parse_args()
+
+    print(f"{'games':>6}{'legacy scan':>13}{'index build':>13}{'select':>9}{'memoized':>10}   (median ms)")
+    agent_rows = []
+    for games in [int(count) for count in args.games.split(",")]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy, build, select_cold, select, agent_sets = run(games, args.rounds)
+        print(f"{games:>6}{legacy:>13.3f}{build:>13.3f}{select_cold:>9.3f}{select:>10.4f}")
+        agent_rows.append((games, agent_sets))
+
+    print(f"\n{'games':>6}{'offered':>9}{'agent set ms':>14}{'ChoiceLayer chars':>19}")
+    for games, agent_sets in agent_rows:
+        for label in ("all", "top"):
+            elapsed, offered, chars = agent_sets[label]
+            print(f"{games:>6}{offered:>9}{elapsed:>14.2f}{chars:>19}")
+
+
+if __name__ == "__main__":
+    main()
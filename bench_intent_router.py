@@ -0,0 +1,114 @@
+"""
+Checks the intent router against the transcription corpus in intent_corpus.json
+and benchmarks routing time against the number of games.
+
+The corpus uses the games in prompts_backup.json; the scaling runs add
+synthetic games and compare the router with the substring loop MyWorkflow.run
+used before.
+
+    python bench_intent_router.py --rounds 2000 --games 3,30,300,3000
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+
+from intent_router import IntentRouter
+
+GAMES = {
+    "CAR": {"name": "Spanish Road Trip"},
+    "ISLAND": {"name": "Pirate Island Adventure"},
+    "ZOO": {"name": "Spanish Zoo Adventure"},
+}
+
+ADJECTIVES = ["magic", "sunny", "rainy", "secret", "tiny", "giant", "happy", "snowy", "spooky", "royal",
+              "silly", "sleepy", "windy", "golden", "purple", "noisy", "quiet", "speedy", "frozen", "hidden"]
+NOUNS = ["garden", "castle", "jungle", "market", "kitchen", "rocket", "circus", "forest", "bakery", "train",
+         "farm", "river", "desert", "museum", "school", "beach", "volcano", "library", "harbor", "park"]
+PLACES = ["trip", "quest", "party", "hunt", "race", "tour", "show", "mystery"]
+
+TRANSCRIPTS = [
+    "Can we play the pirate island now please?",
+    "the red car is going very fast on the road",
+    "I want a different game",
+    "elefante",
+]
+
+
+def check_corpus(path):
+    with open(path) as f:
+        corpus = json.load(f)
+    router = IntentRouter(GAMES)
+    failures = 0
+    for case in corpus:
+        decision = router.route(case["text"], case.get("current_game"), case.get("missing", ()))
+        expected_fields = case.get("fields", {})
+        if case["intent"] == "none":
+            # Anything the router isn't sure about goes to the model, which is what "none" expects
+            ok = not decision.confident
+        else:
+            ok = (decision.intent == case["intent"]
+                  and decision.game_id == case.get("game_id")
+                  and all(decision.fields.get(key) == value for key, value in expected_fields.items())
+                  and decision.confident == case.get("confident", True))
+        if not ok:
+            failures += 1
+            print(f"  MISMATCH {case['text']!r}: expected {case['intent']} {case.get('game_id') or ''}"
+                  f"{expected_fields or ''}, got {decision.intent} {decision.game_id or ''}{decision.fields or ''}"
+                  f" ({decision.confidence:.2f})")
+    print(f"corpus: {len(corpus) - failures}/{len(corpus)} transcriptions routed as expected")
+    return failures
+
+
+def synthetic_games(count):
+    games = dict(GAMES)
+    for adjective, noun, place in itertools.islice(itertools.product(ADJECTIVES, NOUNS, PLACES), count - len(GAMES)):
+        games[f"{adjective}_{noun}_{place}".upper()] = {"name": f"{adjective.title()} {noun.title()} {place.title()}"}
+    return games
+
+
+def legacy_route(games, transcription):
+    # The substring loop MyWorkflow.run used before the intent router
+    lowercase_input = transcription.lower()
+    for game_id, game_info in games.items():
+        game_name = game_info["name"].lower()
+        if (f"play {game_id.lower()}" in lowercase_input or
+                f"play {game_name}" in lowercase_input or
+                game_name in lowercase_input):
+            return game_id
+    return None
+
+
+def per_route_us(route, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in TRANSCRIPTS:
+            route(text)
+    return (time.perf_counter() - start) / (rounds * len(TRANSCRIPTS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--games", default="3,30,300,3000", help="Comma-separated game counts")
+    parser.add_argument("--corpus", default="intent_corpus.json")
+    args = parser.parse_args()
+
+    failures = check_corpus(args.corpus)
+
+    print(f"\n{'games':>6}{'build ms':>10}{'router us':>11}{'substring us':>14}")
+    for count in (int(value) for value in args.games.split(",")):
+        games = synthetic_games(count)
+        start = time.perf_counter()
+        router = IntentRouter(games)
+        build_ms = (time.perf_counter() - start) * 1000
+        routed = per_route_us(lambda text: router.route(text, "ZOO"), args.rounds)
+        legacy = per_route_us(lambda text: legacy_route(games, text), args.rounds)
+        print(f"{len(games):>6}{build_ms:>10.1f}{routed:>11.1f}{legacy:>14.1f}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
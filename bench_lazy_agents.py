@@ -0,0 +1,102 @@
+"""
+Benchmark session construction with lazily built game agents at 10, 100 and 1000 games.
+
+Every game is offered (max_offered_games=None), so the catalog size is what
+grows. For each size it reports the median MyWorkflow construction time and
+the memory one session keeps, first as constructed (game agents are LazyAgents,
+built on the first handoff) and then with every game agent built, which is what
+construction cost when all agents were created up front. It also reports the
+cost of the first handoff to a game, when its agent is built. What is left in
+the lazy column still grows with the number of offered games: one LazyAgent
+and one Handoff per game, and the ChoiceLayer's instructions. Runs against
+FakeFirestore.
+
+    python bench_lazy_agents.py --sessions 10 --games 10,100,1000
+"""
+import argparse
+import contextlib
+import gc
+import io
+import statistics
+import time
+import tracemalloc
+
+import my_workflow
+from User_Firebase import set_firestore_client
+from bench_game_catalog import make_documents
+from fake_firestore import FakeFirestore
+
+USER = {"name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"}
+
+
+def new_session():
+    return my_workflow.MyWorkflow(on_start=lambda _: None, user_id="ID1", user_data=USER, max_offered_games=None)
+
+
+def build_all(workflow) -> None:
+    for game_info in workflow._available_agents.values():
+        game_info["agent"].get()
+
+
+def construction_ms(sessions: int, eager: bool) -> float:
+    timings = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        workflow = new_session()
+        if eager:
+            build_all(workflow)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def retained_kb(eager: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    workflow = new_session()
+    if eager:
+        build_all(workflow)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del workflow
+    return retained / 1024
+
+
+def run(games: int, sessions: int):
+    client = FakeFirestore()
+    for prompt_id, document in make_documents(games).items():
+        client._write("Prompts", prompt_id, document)
+    set_firestore_client(client)
+    my_workflow.configure_prompt_cache(client)
+    # Warm the prompt cache, the game catalog and the template caches
+    build_all(new_session())
+
+    lazy_ms, eager_ms = construction_ms(sessions, False), construction_ms(sessions, True)
+    lazy_kb, eager_kb = retained_kb(False), retained_kb(True)
+
+    handoffs = []
+    for _ in range(sessions):
+        workflow = new_session()
+        game = next(iter(workflow._available_agents.values()))["agent"]
+        game.get()
+        handoffs.append(game.build_ms)
+    return lazy_ms, eager_ms, lazy_kb, eager_kb, statistics.median(handoffs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--games", default="10,100,1000", help="Comma-separated game prompt counts")
+    args = parser.parse_args()
+
+    print(f"{'games':>6}{'lazy ms':>10}{'all built ms':>14}{'lazy KB':>10}{'all built KB':>14}"
+          f"{'first handoff ms':>18}")
+    for games in [int(count) for count in args.games.split(",")]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            lazy_ms, eager_ms, lazy_kb, eager_kb, handoff_ms = run(games, args.sessions)
+        print(f"{games:>6}{lazy_ms:>10.2f}{eager_ms:>14.2f}{lazy_kb:>10.0f}{eager_kb:>14.0f}{handoff_ms:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
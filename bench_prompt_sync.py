@@ -0,0 +1,116 @@
+"""
+Benchmark PromptUpload's sync against a collection of thousands of prompts.
+
+Seeds a fake Firestore with generated prompts, then syncs a local copy in
+which a small share of prompts were edited and a few were added. Compares
+that with uploading every prompt in one batch (what upload_prompts did, which
+the service rejects beyond 500 writes) and in limit-sized batches committed
+one at a time and in parallel. Each round trip to the fake client sleeps
+--latency-ms. Also times the streaming JSON lines export against the JSON one.
+Checks that the collection matches the local prompts after the sync and that
+a second sync writes nothing.
+
+    python bench_prompt_sync.py --prompts 1000,5000 --latency-ms 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import PromptUpload
+from User_Firebase import set_firestore_client
+from bench_game_catalog import make_documents
+from fake_firestore import FakeFirestore
+
+
+def make_prompts(count: int):
+    documents = make_documents(count - 2)
+    return {prompt_id: document["content"] for prompt_id, document in documents.items()}
+
+
+def seeded_client(prompts, latency_s: float) -> FakeFirestore:
+    client = FakeFirestore(latency_s=latency_s)
+    for prompt_id, content in prompts.items():
+        client._write("Prompts", prompt_id, {"content": content})
+    set_firestore_client(client)
+    return client
+
+
+def timed(call):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = call()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def legacy_upload(prompts):
+    # upload_prompts before batching: every prompt in a single batch
+    db = PromptUpload.get_db()
+    batch = db.batch()
+    for prompt_name, prompt_text in prompts.items():
+        batch.set(db.collection("Prompts").document(prompt_name), {"content": prompt_text})
+    batch.commit()
+
+
+def run(count: int, latency_s: float, edited_share: float):
+    remote = make_prompts(count)
+    local = dict(remote)
+    edited = list(local)[::max(1, int(1 / edited_share))]
+    for prompt_id in edited:
+        local[prompt_id] += "\nRemember to smile!"
+    for index in range(len(edited) // 2):
+        local[f"NEW{index:04d}_GAME_PROMPT"] = f"This game is called \"New game {index}\"."
+    rows = {}
+
+    client = seeded_client(remote, latency_s)
+    try:
+        _, elapsed = timed(lambda: legacy_upload(local))
+        rows["single batch"] = (f"{elapsed:.0f}", str(len(local)), str(client.round_trips))
+    except ValueError:
+        rows["single batch"] = ("rejected", str(len(local)), "-")
+
+    for label, workers in (("batches, 1 at a time", 1), ("batches, parallel", PromptUpload.DEFAULT_SYNC_WORKERS)):
+        client = seeded_client(remote, latency_s)
+        _, elapsed = timed(lambda: PromptUpload.upload_prompts(local, max_workers=workers))
+        rows[label] = (f"{elapsed:.0f}", str(len(local)), str(client.round_trips))
+
+    client = seeded_client(remote, latency_s)
+    _, elapsed = timed(lambda: PromptUpload.sync_prompts(local, dry_run=True))
+    rows["sync --dry-run"] = (f"{elapsed:.0f}", "0", str(client.round_trips))
+    diff, elapsed = timed(lambda: PromptUpload.sync_prompts(local))
+    writes = len(diff.added) + len(diff.changed)
+    rows["sync"] = (f"{elapsed:.0f}", str(writes), str(client.round_trips - 1))
+
+    synced = {prompt_id: fields["content"] for prompt_id, fields in client._snapshot("Prompts")}
+    assert synced == local, "collection differs from the local prompts after sync"
+    again, elapsed = timed(lambda: PromptUpload.sync_prompts(local))
+    assert not again.added and not again.changed
+    rows["sync again"] = (f"{elapsed:.0f}", "0", "1")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ("json", "jsonl"):
+            path = os.path.join(directory, f"prompts.{file_format}")
+            _, elapsed = timed(lambda: PromptUpload.export_prompts_to_file(path))
+            assert PromptUpload.load_prompts_file(path).keys() == local.keys()
+            rows[f"export {file_format}"] = (f"{elapsed:.0f}", "0", "1")
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts", default="1000,5000", help="Comma-separated collection sizes")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--edited", type=float, default=0.02, help="Share of prompts edited locally")
+    args = parser.parse_args()
+
+    for count in [int(value) for value in args.prompts.split(",")]:
+        print(f"\n{count} prompts, {args.latency_ms:.0f} ms round trips")
+        print(f"{'':<22}{'ms':>10}{'writes':>8}{'round trips':>13}")
+        for label, (elapsed, writes, round_trips) in run(count, args.latency_ms / 1000, args.edited).items():
+            print(f"{label:<22}{elapsed:>10}{writes:>8}{round_trips:>13}")
+
+
+if __name__ == "__main__":
+    main()
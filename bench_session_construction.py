@@ -0,0 +1,81 @@
+"""
+Benchmark MyWorkflow construction with and without the shared prompt cache.
+
+Runs entirely against FakeFirestore seeded from prompts_backup.json, with a
+simulated round-trip latency per Firestore call. In the uncached run each
+session gets a fresh prompt cache without a listener, so everything that reads
+prompts (agents, game catalog, intent router) reads the collection again.
+
+    python bench_session_construction.py --sessions 50 --latency-ms 20
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+from typing import Optional
+
+import my_workflow
+from User_Firebase import set_firestore_client
+from fake_firestore import FakeFirestore, load_prompts_into
+
+# prompts_backup.json doesn't contain the user info prompt, but the workflow requires it
+USER_INFO_PROMPT = (
+    "You are Amigo, a friendly Spanish tutor. Ask the child for their name and age, "
+    "then call save_user_info and hand off to the ChoiceLayer."
+)
+
+
+def make_fake_client(latency_s: float) -> FakeFirestore:
+    client = FakeFirestore(latency_s=latency_s)
+    load_prompts_into(client, extra_prompts={"USER_INFO_PROMPT": USER_INFO_PROMPT})
+    client._write("Users", "ID1", {"name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"})
+    return client
+
+
+def time_sessions(sessions: int, client: Optional[FakeFirestore] = None) -> list:
+    # With a client, every session starts from a fresh, non-listening prompt cache on it
+    timings = []
+    for _ in range(sessions):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if client is not None:
+                my_workflow.configure_prompt_cache(client, use_listener=False, poll_interval_s=None)
+            start = time.perf_counter()
+            my_workflow.MyWorkflow(on_start=lambda _: None, user_id="ID1")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list, round_trips: int) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"{label:<14} mean {statistics.mean(timings) * 1000:8.2f} ms   "
+          f"p95 {p95 * 1000:8.2f} ms   firestore calls {round_trips} ({round_trips / len(timings):.1f} per session)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    client = make_fake_client(args.latency_ms / 1000)
+    set_firestore_client(client)
+
+    # Without the shared cache: every session streams the whole Prompts collection
+    client.round_trips = 0
+    report("uncached", time_sessions(args.sessions, client), client.round_trips)
+    uncached_round_trips = client.round_trips
+
+    # With the cache: the collection is loaded once and kept fresh by the listener
+    with contextlib.redirect_stdout(io.StringIO()):
+        my_workflow.configure_prompt_cache(client)
+    client.round_trips = 0
+    report("cached", time_sessions(args.sessions), client.round_trips)
+
+    # Each uncached session reads the Prompts collection exactly once more than a cached one
+    assert uncached_round_trips - client.round_trips == args.sessions, "uncached sessions didn't bypass the cache"
+
+
+if __name__ == "__main__":
+    main()
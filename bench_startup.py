@@ -0,0 +1,158 @@
+"""
+Measure startup: where import time goes, and how long until the first mic frame is queued.
+
+The import profile runs `python -X importtime` on the modules the app loads and
+lists the slowest imports by cumulative time. The first-frame check starts fresh
+processes that go through main.py's startup without the UI: import the workflow
+and audio modules, build MyWorkflow and the VoicePipeline against FakeFirestore
+and stub models, start CallbackCapture on a FakeInputStream, and stop at the
+first frame queued for speech to text. It exits non-zero when the median time
+is over --max-ms, or when Firebase was initialized before it was needed.
+
+    python bench_startup.py --runs 5 --max-ms 5000
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+STARTUP_MODULES = "my_workflow, audio_cache, audio_capture, audio_format, audio_playback, frame_pool, vad"
+
+
+def import_profile(modules: str, top: int):
+    """Run -X importtime in a fresh interpreter; returns (total_us, [(cumulative_us, module), ...])."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modules}"],
+                            capture_output=True, text=True, check=True)
+    rows, total = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level under their parent
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            total += int(cumulative)
+        if depth <= 1:
+            rows.append((int(cumulative), name.strip()))
+    return total, sorted(rows, reverse=True)[:top]
+
+
+async def first_frame(started: float) -> dict:
+    # Everything main.py imports at startup, except Textual and sounddevice
+    import asyncio
+
+    from agents import RunConfig, set_tracing_disabled
+    from agents.voice import VoicePipeline, VoicePipelineConfig
+
+    import my_workflow
+    from audio_cache import AudioCache, CachedVoiceModelProvider
+    from audio_capture import CallbackCapture
+    from frame_pool import FramePool, PooledAudioInput
+    from text_chunker import segment_tts_settings
+    from vad import GatedAudioInput, VoiceGate
+    imported = time.perf_counter()
+
+    from fake_audio import FakeInputStream
+    from stub_models import ScriptedSTTModel, StubModelProvider, StubTTSModel, StubVoiceModelProvider
+    from voice_harness import make_fake_firestore
+    from User_Firebase import set_firestore_client
+
+    set_tracing_disabled(True)
+    client = make_fake_firestore()
+    set_firestore_client(client)
+    my_workflow.configure_prompt_cache(client)
+
+    audio_cache = AudioCache(directory=None)
+    workflow = my_workflow.MyWorkflow(on_start=lambda _: None, user_id="ID1",
+                                      run_config=RunConfig(model_provider=StubModelProvider(), tracing_disabled=True),
+                                      audio_cache=audio_cache)
+    pipeline = VoicePipeline(workflow=workflow, config=VoicePipelineConfig(
+        model_provider=CachedVoiceModelProvider(StubVoiceModelProvider(ScriptedSTTModel(), StubTTSModel()),
+                                                audio_cache),
+        tts_settings=segment_tts_settings(),
+        tracing_disabled=True,
+        trace_include_sensitive_audio_data=False,
+    ))
+    audio_input = PooledAudioInput(FramePool(480))
+    await pipeline.run(audio_input)
+    ready = time.perf_counter()
+
+    capture = CallbackCapture(GatedAudioInput(audio_input, VoiceGate()),
+                              lambda **kwargs: FakeInputStream(**kwargs), frame_ms=20)
+    task = asyncio.create_task(capture.run())
+    while not capture.frames_enqueued:
+        await asyncio.sleep(0.001)
+    frame = time.perf_counter()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    return {
+        "import_ms": (imported - started) * 1000,
+        "setup_ms": (ready - imported) * 1000,
+        "first_frame_ms": (frame - started) * 1000,
+        # Firebase must stay unloaded until something actually needs Firestore
+        "firebase_loaded": "firebase_admin" in sys.modules,
+    }
+
+
+def run_child() -> None:
+    started = time.perf_counter()
+    import asyncio
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(first_frame(started))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start")
+    parser.add_argument("--max-ms", type=float, default=5000.0,
+                        help="Fail if the median import-to-first-frame time is above this")
+    parser.add_argument("--top", type=int, default=12, help="Imports to list in the profile")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    total, rows = import_profile(STARTUP_MODULES, args.top)
+    print(f"import profile ({total / 1000:.0f} ms total, slowest imports, top two levels):")
+    for cumulative, name in rows:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    results, process_ms = [], []
+    for _ in range(args.runs):
+        spawned = time.perf_counter()
+        output = subprocess.run([sys.executable, __file__, "--child"], capture_output=True, text=True, check=True)
+        process_ms.append((time.perf_counter() - spawned) * 1000)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    def median(key):
+        return statistics.median(result[key] for result in results)
+
+    first_frame_ms = median("first_frame_ms")
+    print(f"\n{args.runs} runs (medians): imports {median('import_ms'):.0f} ms, "
+          f"workflow and pipeline {median('setup_ms'):.0f} ms, "
+          f"import to first frame {first_frame_ms:.0f} ms, "
+          f"whole process {statistics.median(process_ms):.0f} ms")
+
+    failed = False
+    if any(result["firebase_loaded"] for result in results):
+        print("FAIL: firebase_admin was imported during startup")
+        failed = True
+    if first_frame_ms > args.max_ms:
+        print(f"FAIL: import to first frame {first_frame_ms:.0f} ms is over {args.max_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: under {args.max_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
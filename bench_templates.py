@@ -0,0 +1,82 @@
+"""
+Microbenchmark of ${user.field} template rendering over the prompts in prompts_backup.json.
+
+Compares the previous uncompiled re.sub implementation with the compiled
+template engine, parsing each prompt on every render and once.
+
+    python bench_templates.py --rounds 2000
+"""
+import argparse
+import json
+import re
+import time
+
+from prompt_templates import CompiledTemplate, clear_caches, render_template, template_fields
+
+USER = {"id": "ID1", "name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"}
+
+
+def legacy_replace_user_templates(text, user_data):
+    # The implementation replace_user_templates used before the template engine
+    if not text:
+        return text
+    pattern = r'\${user\.([a-zA-Z]+)}'
+
+    def replace_match(match):
+        field = match.group(1)
+        value = user_data.get(field)
+        return str(value) if value is not None else f"[unknown {field}]"
+
+    return re.sub(pattern, replace_match, text)
+
+
+def with_templates(prompts):
+    # The shipped prompts don't use templates yet, so also measure a templated variant
+    return {prompt_id: f"The child is ${{user.name}}, age ${{user.age}}.\n\n{content}\n\n"
+                       f"Remember ${{user.name}} is a ${{user.proficiency}} speaker."
+            for prompt_id, content in prompts.items()}
+
+
+def per_render_us(render, prompts, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in prompts.values():
+            render(text, USER)
+    return (time.perf_counter() - start) / (rounds * len(prompts)) * 1e6
+
+
+def run(label, prompts, rounds):
+    for text in prompts.values():
+        assert render_template(text, USER) == legacy_replace_user_templates(text, USER)
+
+    legacy = per_render_us(legacy_replace_user_templates, prompts, rounds)
+
+    def parse_and_render(text, user_data):
+        return CompiledTemplate(text).render(user_data)
+
+    parsed = per_render_us(parse_and_render, prompts, rounds)
+    clear_caches()
+    compiled = per_render_us(render_template, prompts, rounds)
+
+    fields = sorted({field for text in prompts.values() for field in template_fields(text)})
+    print(f"{label}: {len(prompts)} prompts, {sum(map(len, prompts.values()))} chars, fields {fields}")
+    print(f"  re.sub        {legacy:8.2f} us/render")
+    print(f"  parse+render  {parsed:8.2f} us/render  ({legacy / parsed:5.1f}x)")
+    print(f"  compiled      {compiled:8.2f} us/render  ({legacy / compiled:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--prompts-file", default="prompts_backup.json")
+    args = parser.parse_args()
+
+    with open(args.prompts_file) as f:
+        prompts = json.load(f)
+
+    run("prompts_backup.json", prompts, args.rounds)
+    run("with user templates", with_templates(prompts), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
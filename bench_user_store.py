@@ -0,0 +1,81 @@
+"""
+Benchmark starting many sessions concurrently on one event loop.
+
+Compares the synchronous MyWorkflow constructor, which blocks the loop for a
+Firestore round trip per session, with `await MyWorkflow.create(...)`, which
+reads the user through the async data layer (thread pool, shared client and
+coalesced reads for the same user). Reports the wall time, the longest event
+loop stall and the number of Firestore round trips. Runs against FakeFirestore.
+
+    python bench_user_store.py --sessions 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import my_workflow
+from User_Firebase import set_firestore_client
+from fake_firestore import FakeFirestore, load_prompts_into
+from voice_harness import USER_INFO_PROMPT
+
+
+def make_fake_client(latency_s: float, users: int) -> FakeFirestore:
+    client = FakeFirestore(latency_s=latency_s)
+    load_prompts_into(client, extra_prompts={"USER_INFO_PROMPT": USER_INFO_PROMPT})
+    for i in range(users):
+        client._write("Users", f"ID{i + 1}", {"name": f"Child{i + 1}", "age": 6,
+                                             "language": "Spanish", "proficiency": "Beginner"})
+    return client
+
+
+async def _watch_loop(stalls: list, stop: asyncio.Event, interval_s: float = 0.001) -> None:
+    # Measures how late the loop wakes us up; a blocked loop shows up as a long stall
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        stalls.append(time.perf_counter() - before - interval_s)
+
+
+async def start_sessions(sessions: int, users: int, use_async: bool) -> tuple:
+    stalls, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop(stalls, stop))
+    await asyncio.sleep(0)
+
+    async def start(i: int):
+        user_id = f"ID{i % users + 1}"
+        if use_async:
+            return await my_workflow.MyWorkflow.create(on_start=lambda _: None, user_id=user_id)
+        return my_workflow.MyWorkflow(on_start=lambda _: None, user_id=user_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(start(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    return elapsed, max(stalls, default=0.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10, help="Distinct user IDs across the sessions")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    client = make_fake_client(args.latency_ms / 1000, args.users)
+    set_firestore_client(client)
+    with contextlib.redirect_stdout(io.StringIO()):
+        my_workflow.configure_prompt_cache(client)
+
+    for label, use_async in (("sync", False), ("async", True)):
+        client.round_trips = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, stall = asyncio.run(start_sessions(args.sessions, args.users, use_async))
+        print(f"{label:<6} total {elapsed * 1000:8.1f} ms   longest loop stall {stall * 1000:8.1f} ms   "
+              f"firestore calls {client.round_trips}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Measure the client-side voice gate on WAV recordings or a synthetic session.
+
+For every input it reports the share of frames kept from being sent upstream,
+and for the synthetic session (whose speech segments are known) how much
+speech got through, whether any onset was clipped and how soon after each
+utterance end of speech was reported. Exits non-zero if speech was lost.
+
+    python bench_vad.py                              # synthetic session with background noise
+    python bench_vad.py --write-fixture session.wav  # save it, e.g. for voice_harness scripts
+    python bench_vad.py --wav recording.wav other.wav
+"""
+import argparse
+import sys
+import time
+import wave
+
+import numpy as np
+
+from vad import VoiceGate
+
+SAMPLE_RATE = 24000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def synthetic_session(seconds=30.0, noise_db=-55.0, seed=7):
+    """
+    Speech-like bursts (harmonics with a syllable envelope) between pauses, over background noise.
+
+    Returns:
+        Tuple of (int16 samples, list of (start, end) sample ranges that contain speech)
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0.0, 10 ** (noise_db / 20), total)
+    segments = []
+    position = int(rng.uniform(1.0, 2.0) * SAMPLE_RATE)
+    while position < total - 2 * SAMPLE_RATE:
+        length = int(rng.uniform(0.6, 2.5) * SAMPLE_RATE)
+        t = np.arange(length) / SAMPLE_RATE
+        f0 = rng.uniform(180, 300)
+        voiced = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        syllables = 0.55 + 0.45 * np.sin(2 * np.pi * rng.uniform(3, 5) * t) ** 2
+        fade = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.03)
+        audio[position:position + length] += 0.15 * voiced * syllables * fade
+        segments.append((position, position + length))
+        position += length + int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16), segments
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        if wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz, got {wav.getframerate()}")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        channels = wav.getnchannels()
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples
+
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+
+
+def run_gate(samples):
+    """Feed samples through a VoiceGate frame by frame; returns the gate, sent frame indexes and timings."""
+    end_events = []
+    gate = VoiceGate(frame_ms=FRAME_MS, on_end_of_speech=lambda: end_events.append(gate.frames_in - 1))
+    sent = []
+    started = time.process_time()
+    for index in range(len(samples) // FRAME_SAMPLES):
+        frame = samples[index * FRAME_SAMPLES:(index + 1) * FRAME_SAMPLES]
+        before = gate.frames_sent
+        gate.process(frame)
+        # Pre-roll frames are sent along with the frame that confirms the speech start
+        sent.extend(range(index - (gate.frames_sent - before) + 1, index + 1))
+    cpu = time.process_time() - started
+    return gate, set(sent), end_events, cpu
+
+
+def check_segments(segments, sent, end_events):
+    speech_frames = set()
+    clipped = 0
+    for start, end in segments:
+        frames = range(start // FRAME_SAMPLES, (end - 1) // FRAME_SAMPLES + 1)
+        speech_frames.update(frames)
+        # The first 40ms of an utterance must go upstream, or the word onset is lost
+        if not all(frame in sent for frame in frames[:2]):
+            clipped += 1
+    recall = len(speech_frames & sent) / len(speech_frames) if speech_frames else 1.0
+
+    delays = []
+    for _, end in segments:
+        last_frame = (end - 1) // FRAME_SAMPLES
+        after = [event for event in end_events if event >= last_frame]
+        if after:
+            delays.append((after[0] - last_frame) * FRAME_MS)
+    return recall, clipped, delays
+
+
+def report(label, samples, segments=None):
+    gate, sent, end_events, cpu = run_gate(samples)
+    seconds = len(samples) / SAMPLE_RATE
+    stats = gate.stats()
+    print(f"{label}: {seconds:.1f}s, {stats['frames_in']} frames, {stats['suppressed_fraction'] * 100:.1f}% "
+          f"suppressed, {stats['utterances']} utterances, cpu {cpu / seconds * 1000:.2f} ms per second of audio")
+    if segments is None:
+        return True
+    recall, clipped, delays = check_segments(segments, sent, end_events)
+    delay = f"{np.median(delays):.0f}ms median, {max(delays):.0f}ms max" if delays else "never"
+    print(f"  speech sent {recall * 100:.1f}%, clipped onsets {clipped}/{len(segments)}, "
+          f"end of speech reported {len(delays)}/{len(segments)} ({delay} after the last speech frame)")
+    return recall >= 0.99 and clipped == 0 and len(delays) == len(segments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wav", nargs="*", default=[], help="16-bit 24 kHz WAV recordings to gate")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of the synthetic session")
+    parser.add_argument("--noise-db", type=float, default=-55.0, help="Background noise level of the synthetic session")
+    parser.add_argument("--write-fixture", help="Write the synthetic session to this WAV file")
+    args = parser.parse_args()
+
+    ok = True
+    if not args.wav:
+        samples, segments = synthetic_session(args.seconds, args.noise_db)
+        if args.write_fixture:
+            write_wav(args.write_fixture, samples)
+        ok = report("synthetic", samples, segments)
+    for path in args.wav:
+        report(path, read_wav(path))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Token-budgeted conversation history.
+
+Items are appended as they happen (the user's transcription, the new items of
+each agent run) instead of replacing the whole list after every turn, and each
+item's token estimate is computed once when it is appended. When the total goes
+over the budget the oldest whole turns are evicted, so a function call is never
+separated from its output, and the evicted turns can optionally be folded into
+one compact summary item.
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+# Rough per-item overhead of the message framing
+ITEM_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def estimate_item_tokens(item: Dict[str, Any]) -> int:
+    """Approximate token count of an input item (about four characters per token)."""
+    content = item.get("content")
+    if isinstance(content, str):
+        text = content
+    elif isinstance(content, list):
+        text = " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+    elif content is None:
+        # Function calls, their outputs and other non-message items
+        text = (item.get("arguments") or "") + str(item.get("output") or "")
+        if not text:
+            text = json.dumps(item, default=str)
+    else:
+        text = str(content)
+    return ITEM_OVERHEAD_TOKENS + len(text) // 4
+
+
+def summarize_items(items: List[Dict[str, Any]], max_chars_per_item: int = 120) -> str:
+    """Default summarizer: one short line per message, tool traffic left out."""
+    lines = []
+    for item in items:
+        role, content = item.get("role"), item.get("content")
+        if role not in ("user", "assistant") or not content:
+            continue
+        if isinstance(content, list):
+            content = " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        speaker = "Child" if role == "user" else "Tutor"
+        text = " ".join(str(content).split())
+        if len(text) > max_chars_per_item:
+            text = text[:max_chars_per_item - 3] + "..."
+        lines.append(f"{speaker}: {text}")
+    return "\n".join(lines)
+
+
+class ConversationHistory:
+    """
+    Conversation items kept within a token budget.
+
+    Args:
+        token_budget: Maximum estimated tokens of history sent per turn
+            (the current turn is always kept, even when it alone is larger)
+        pin_first: Never evict the first item (the greeting)
+        summarize: Replace evicted turns with a compact summary item
+        summarizer: Turns a list of evicted items into summary text
+        max_summary_tokens: The summary keeps only its most recent lines beyond this
+            (and never more than a quarter of the token budget)
+    """
+
+    def __init__(self, token_budget: int = 3000, pin_first: bool = True, summarize: bool = False,
+                 summarizer: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+                 max_summary_tokens: int = 300):
+        self.token_budget = token_budget
+        self.pin_first = pin_first
+        self.summarize = summarize
+        self.summarizer = summarizer or summarize_items
+        self.max_summary_tokens = max_summary_tokens
+
+        self._items: List[Dict[str, Any]] = []
+        self._tokens: List[int] = []
+        self._summary_text = ""
+        self.total_tokens = 0
+        self.evicted_items = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def append(self, item: Dict[str, Any]) -> None:
+        self._items.append(item)
+        tokens = estimate_item_tokens(item)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        self._enforce_budget()
+
+    def extend(self, items) -> None:
+        for item in items:
+            self._items.append(item)
+            tokens = estimate_item_tokens(item)
+            self._tokens.append(tokens)
+            self.total_tokens += tokens
+        self._enforce_budget()
+
+    def as_input(self) -> List[Dict[str, Any]]:
+        """The items to send with the next run (a shallow copy; the items themselves are shared)."""
+        return list(self._items)
+
+    def stats(self) -> Dict[str, int]:
+        return {"items": len(self._items), "tokens": self.total_tokens, "evicted_items": self.evicted_items}
+
+    def _first_evictable(self) -> int:
+        start = 1 if self.pin_first and self._items else 0
+        if self._summary_text and start < len(self._items) and self._is_summary(self._items[start]):
+            start += 1
+        return start
+
+    def _enforce_budget(self) -> None:
+        while True:
+            evicted = self._evict_oldest_turns()
+            if not evicted or not self.summarize:
+                return
+            self._fold_into_summary(evicted)
+            # A longer summary can tip the history over again; evict more if so
+            if self.total_tokens <= self.token_budget:
+                return
+
+    def _evict_oldest_turns(self) -> List[Dict[str, Any]]:
+        evicted: List[Dict[str, Any]] = []
+        while self.total_tokens > self.token_budget:
+            start = self._first_evictable()
+            # The oldest turn runs up to the next user message; tool calls and their
+            # outputs always sit inside one turn, so they are evicted together
+            end = next((i for i in range(start + 1, len(self._items)) if self._items[i].get("role") == "user"), None)
+            if end is None:
+                break  # Only the current turn is left
+            evicted.extend(self._items[start:end])
+            self.total_tokens -= sum(self._tokens[start:end])
+            del self._items[start:end]
+            del self._tokens[start:end]
+            self.evicted_items += end - start
+        return evicted
+
+    def _fold_into_summary(self, evicted: List[Dict[str, Any]]) -> None:
+        text = self.summarizer(evicted)
+        if not text:
+            return
+        summary = "\n".join(filter(None, [self._summary_text, text]))
+        # Keep the most recent lines; the summary may use at most a quarter of the budget
+        limit = min(self.max_summary_tokens, self.token_budget // 4)
+        lines = summary.split("\n")
+        while len(lines) > 1 and len("\n".join(lines)) // 4 > limit:
+            lines.pop(0)
+        had_summary = bool(self._summary_text)
+        self._summary_text = "\n".join(lines)
+
+        item = {"role": "developer", "content": SUMMARY_PREFIX + self._summary_text}
+        tokens = estimate_item_tokens(item)
+        position = 1 if self.pin_first and self._items else 0
+        if had_summary and position < len(self._items) and self._is_summary(self._items[position]):
+            self.total_tokens += tokens - self._tokens[position]
+            self._items[position] = item
+            self._tokens[position] = tokens
+        else:
+            self._items.insert(position, item)
+            self._tokens.insert(position, tokens)
+            self.total_tokens += tokens
+
+    @staticmethod
+    def _is_summary(item: Dict[str, Any]) -> bool:
+        content = item.get("content")
+        return item.get("role") == "developer" and isinstance(content, str) and content.startswith(SUMMARY_PREFIX)
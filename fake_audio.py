@@ -0,0 +1,158 @@
+"""
+Fake sounddevice streams for running audio code without hardware.
+
+FakeInputStream plays a NumPy array (or silence) in real time from a background
+thread, either through a callback like sounddevice.InputStream(callback=...) or
+through the blocking read()/read_available interface. FakeOutputStream pulls
+blocks from an output callback at the same pace and can record what was played.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class FakeInputStream:
+    """
+    Real-time paced stand-in for sounddevice.InputStream.
+
+    Args:
+        samplerate: Sample rate in Hz
+        channels: Number of channels
+        dtype: Sample format (only "int16" is supported)
+        blocksize: Samples delivered per device period
+        callback: Called as callback(indata, frames, time_info, status) on the device thread
+        source: int16 samples to play; loops when exhausted. Defaults to silence.
+    """
+
+    def __init__(self, samplerate: int = 24000, channels: int = 1, dtype="int16",
+                 blocksize: int = 0, callback: Optional[Callable] = None,
+                 source: Optional[np.ndarray] = None):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize or int(samplerate * 0.01)
+        self.callback = callback
+
+        if source is None:
+            source = np.zeros((samplerate, channels), dtype=np.int16)
+        self._source = source.reshape(-1, channels).astype(np.int16, copy=False)
+        self._source_pos = 0
+
+        # Blocking-mode buffer, filled by the device thread
+        self._pending = np.zeros((0, channels), dtype=np.int16)
+        self._pending_lock = threading.Lock()
+        self.block_times = []  # perf_counter() at which each block was delivered
+
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def read_available(self) -> int:
+        return len(self._pending)
+
+    def read(self, frames: int):
+        """Blocking read of `frames` samples; returns (data, overflowed)."""
+        while self.read_available < frames:
+            time.sleep(0.001)
+        with self._pending_lock:
+            data, self._pending = self._pending[:frames].copy(), self._pending[frames:]
+        return data, False
+
+    def start(self) -> None:
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="fake-input-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+
+    def _next_block(self) -> np.ndarray:
+        end = self._source_pos + self.blocksize
+        if end <= len(self._source):
+            block = self._source[self._source_pos:end]
+        else:
+            block = np.concatenate([self._source[self._source_pos:], self._source[:end - len(self._source)]])
+        self._source_pos = end % len(self._source)
+        return block
+
+    def _run(self) -> None:
+        period = self.blocksize / self.samplerate
+        deadline = time.perf_counter()
+        while self._running.is_set():
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            block = self._next_block()
+            self.block_times.append(time.perf_counter())
+            if self.callback is not None:
+                self.callback(block, len(block), None, None)
+            else:
+                with self._pending_lock:
+                    self._pending = np.concatenate([self._pending, block])
+
+
+class FakeOutputStream:
+    """
+    Real-time paced stand-in for sounddevice.OutputStream in callback mode.
+
+    Args:
+        samplerate: Sample rate in Hz
+        channels: Number of channels
+        dtype: Sample format (only "int16" is supported)
+        blocksize: Samples requested per device period
+        callback: Called as callback(outdata, frames, time_info, status) on the device thread
+        record: Keep every block written to the "speaker" in `played`
+    """
+
+    def __init__(self, samplerate: int = 24000, channels: int = 1, dtype="int16",
+                 blocksize: int = 0, callback: Optional[Callable] = None, record: bool = False):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize or int(samplerate * 0.01)
+        self.callback = callback
+        self.record = record
+        self.played = []
+        self.block_times = []
+
+        self._block = np.zeros((self.blocksize, channels), dtype=np.int16)
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="fake-output-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        period = self.blocksize / self.samplerate
+        deadline = time.perf_counter()
+        while self._running.is_set():
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            self.callback(self._block, self.blocksize, None, None)
+            self.block_times.append(time.perf_counter())
+            if self.record:
+                self.played.append(self._block.copy())
@@ -0,0 +1,257 @@
+"""
+In-memory stand-in for the subset of the Firestore client used by this project.
+
+It is meant for benchmarks and local runs without credentials or network access.
+Only the calls the workflow and tools actually make are implemented:
+collection/document references, get/set/update/delete, stream, batches and
+collection snapshot listeners.
+"""
+import copy
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class FakeDocumentSnapshot:
+    """Snapshot of a single document at the time it was read."""
+
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = copy.deepcopy(data) if data is not None else None
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentChange:
+    """A single change delivered to a snapshot listener."""
+
+    def __init__(self, change_type: str, document: FakeDocumentSnapshot):
+        self.type = change_type  # "ADDED", "MODIFIED" or "REMOVED"
+        self.document = document
+
+
+class FakeWatch:
+    """Handle returned by on_snapshot; mirrors google.cloud.firestore Watch."""
+
+    def __init__(self, collection: "FakeCollectionReference", callback: Callable):
+        self._collection = collection
+        self._callback = callback
+        self._active = True
+
+    @property
+    def is_active(self) -> bool:
+        """False once the watch stopped delivering snapshots."""
+        return self._active
+
+    def close(self) -> None:
+        """Stop delivering snapshots, like a Watch whose stream failed for good."""
+        self._active = False
+        self._collection._remove_listener(self)
+
+    def unsubscribe(self) -> None:
+        self.close()
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeFirestore", path: str, doc_id: str):
+        self._client = client
+        self._path = path
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._path}/{self.id}"
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return self._client.collection(f"{self.path}/{name}")
+
+    def get(self) -> FakeDocumentSnapshot:
+        self._client._round_trip()
+        return FakeDocumentSnapshot(self, self._client._read(self._path, self.id))
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._client._round_trip()
+        self._client._write(self._path, self.id, data, merge=merge)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self._client._round_trip()
+        if self._client._read(self._path, self.id) is None:
+            raise KeyError(f"No document to update: {self.path}")
+        self._client._write(self._path, self.id, data, merge=True)
+
+    def delete(self) -> None:
+        self._client._round_trip()
+        self._client._delete(self._path, self.id)
+
+
+class FakeCollectionReference:
+    def __init__(self, client: "FakeFirestore", path: str):
+        self._client = client
+        self._path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._path, doc_id)
+
+    def stream(self):
+        self._client._round_trip()
+        for doc_id, data in self._client._snapshot(self._path):
+            yield FakeDocumentSnapshot(self.document(doc_id), data)
+
+    def get(self) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+    def on_snapshot(self, callback: Callable) -> FakeWatch:
+        """
+        Register a listener called as callback(docs, changes, read_time).
+
+        Like the real client, the first call delivers the full collection with
+        every document reported as ADDED.
+        """
+        watch = FakeWatch(self, callback)
+        self._client._add_listener(self._path, watch)
+        docs = [FakeDocumentSnapshot(self.document(doc_id), data)
+                for doc_id, data in self._client._snapshot(self._path)]
+        callback(docs, [FakeDocumentChange("ADDED", doc) for doc in docs], time.time())
+        return watch
+
+    def _remove_listener(self, watch: FakeWatch) -> None:
+        self._client._remove_listener(self._path, watch)
+
+
+class FakeWriteBatch:
+    """Write batch that applies all queued operations on commit()."""
+
+    # Same limit the real service enforces per batch/transaction
+    MAX_WRITES = 500
+
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._ops: List[Callable[[], None]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._ops.append(lambda: self._client._write(reference._path, reference.id, data, merge=merge))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any]) -> None:
+        self._ops.append(lambda: self._client._write(reference._path, reference.id, data, merge=True))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._ops.append(lambda: self._client._delete(reference._path, reference.id))
+
+    def commit(self) -> None:
+        if len(self._ops) > self.MAX_WRITES:
+            raise ValueError(f"Batch has {len(self._ops)} writes; maximum is {self.MAX_WRITES}")
+        self._client._round_trip()
+        for op in self._ops:
+            op()
+        self._ops = []
+
+
+class FakeFirestore:
+    """
+    Minimal in-memory Firestore client.
+
+    Args:
+        latency_s: Simulated network round trip added to every read and write call
+        supports_listeners: When False, on_snapshot raises like a client without watch support
+    """
+
+    def __init__(self, latency_s: float = 0.0, supports_listeners: bool = True):
+        self.latency_s = latency_s
+        self.supports_listeners = supports_listeners
+        self.round_trips = 0
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._listeners: Dict[str, List[FakeWatch]] = {}
+        self._lock = threading.RLock()
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        if not self.supports_listeners:
+            return _NoWatchCollectionReference(self, name)
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def _round_trip(self) -> None:
+        with self._lock:
+            self.round_trips += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _read(self, path: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(self._collections.get(path, {}).get(doc_id))
+
+    def _snapshot(self, path: str) -> List[tuple]:
+        with self._lock:
+            return [(doc_id, copy.deepcopy(data)) for doc_id, data in self._collections.get(path, {}).items()]
+
+    def _write(self, path: str, doc_id: str, data: Dict[str, Any], merge: bool = False) -> None:
+        with self._lock:
+            docs = self._collections.setdefault(path, {})
+            existed = doc_id in docs
+            if merge and existed:
+                docs[doc_id].update(copy.deepcopy(data))
+            else:
+                docs[doc_id] = copy.deepcopy(data)
+            self._notify(path, doc_id, "MODIFIED" if existed else "ADDED")
+
+    def _delete(self, path: str, doc_id: str) -> None:
+        with self._lock:
+            docs = self._collections.get(path, {})
+            if doc_id in docs:
+                docs.pop(doc_id)
+                self._notify(path, doc_id, "REMOVED")
+
+    def _add_listener(self, path: str, watch: FakeWatch) -> None:
+        with self._lock:
+            self._listeners.setdefault(path, []).append(watch)
+
+    def _remove_listener(self, path: str, watch: FakeWatch) -> None:
+        with self._lock:
+            if watch in self._listeners.get(path, []):
+                self._listeners[path].remove(watch)
+
+    def _notify(self, path: str, doc_id: str, change_type: str) -> None:
+        listeners = self._listeners.get(path)
+        if not listeners:
+            return
+        collection = FakeCollectionReference(self, path)
+        docs = [FakeDocumentSnapshot(collection.document(d), data) for d, data in self._snapshot(path)]
+        changed = FakeDocumentSnapshot(collection.document(doc_id), self._read(path, doc_id))
+        for watch in list(listeners):
+            watch._callback(docs, [FakeDocumentChange(change_type, changed)], time.time())
+
+
+class _NoWatchCollectionReference(FakeCollectionReference):
+    def on_snapshot(self, callback: Callable) -> FakeWatch:
+        raise NotImplementedError("Snapshot listeners are not supported by this client")
+
+
+def load_prompts_into(client: FakeFirestore, filename: str = "prompts_backup.json",
+                      extra_prompts: Optional[Dict[str, str]] = None) -> int:
+    """
+    Seed the Prompts collection of a fake client from a prompts backup file.
+
+    Args:
+        client: The fake Firestore client to populate
+        filename: JSON file mapping prompt names to prompt content
+        extra_prompts: Additional prompts to add on top of the file contents
+
+    Returns:
+        The number of prompts written
+    """
+    with open(filename, "r") as f:
+        prompts = json.load(f)
+    prompts.update(extra_prompts or {})
+
+    for prompt_name, prompt_text in prompts.items():
+        client._write("Prompts", prompt_name, {"content": prompt_text})
+    return len(prompts)
@@ -0,0 +1,155 @@
+"""
+Preallocated, reference-counted audio frames.
+
+Every frame a capture loop hands to StreamedAudioInput used to be either a
+fresh NumPy array or a slot in a fixed rotation that had to be copied when the
+consumer fell behind. FramePool instead lends out views into one preallocated
+int16 block and takes each one back when its last holder releases it:
+
+- the producer acquires a frame (reference count 1), fills it in place and
+  passes it on, handing its reference over with it
+- PooledAudioInput's queue releases a frame when the consumer asks for the
+  next one, i.e. once the consumer is done with it; the speech-to-text session
+  encodes each frame before reading the next
+- anyone keeping a frame longer retains it and releases it later
+
+When every frame is in use the pool allocates a plain array instead (counted
+in `fallback_allocations`), so a stalled consumer costs memory, not audio.
+
+Consumers must not keep frames past the next get() without retaining them.
+The voice pipeline keeps every input frame for the trace when
+trace_include_sensitive_audio_data is on, so pipelines fed from a pool turn it
+off.
+"""
+import asyncio
+import collections
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+from agents.voice import StreamedAudioInput
+
+
+class FramePool:
+    """
+    Pool of fixed-size int16 frames.
+
+    Args:
+        frame_samples: Samples per channel in each frame
+        channels: Number of channels
+        capacity: Number of preallocated frames
+    """
+
+    def __init__(self, frame_samples: int, channels: int = 1, capacity: int = 64):
+        self.frame_samples = frame_samples
+        self.channels = channels
+        self.capacity = capacity
+        self._block = np.zeros((capacity, frame_samples, channels), dtype=np.int16)
+        self._base = self._block.ctypes.data
+        self._frame_bytes = self._block[0].nbytes
+        self._refcounts = [0] * capacity
+        self._free = collections.deque(range(capacity))
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.fallback_allocations = 0
+        self.peak_in_use = 0
+
+    @property
+    def in_use(self) -> int:
+        return self.capacity - len(self._free)
+
+    def acquire(self) -> np.ndarray:
+        """A (frame_samples, channels) frame with a reference count of 1; contents are stale."""
+        with self._lock:
+            self.acquired += 1
+            if not self._free:
+                self.fallback_allocations += 1
+                return np.zeros((self.frame_samples, self.channels), dtype=np.int16)
+            slot = self._free.popleft()
+            self._refcounts[slot] = 1
+            self.peak_in_use = max(self.peak_in_use, self.capacity - len(self._free))
+        return self._block[slot]
+
+    def retain(self, frame: np.ndarray) -> None:
+        """Take another reference to a frame (no-op for frames not from this pool)."""
+        slot = self._slot(frame)
+        if slot is not None:
+            with self._lock:
+                self._refcounts[slot] += 1
+
+    def release(self, frame: np.ndarray) -> None:
+        """Drop a reference; the frame goes back to the pool with the last one."""
+        slot = self._slot(frame)
+        if slot is None:
+            return
+        with self._lock:
+            if self._refcounts[slot] == 0:
+                raise ValueError("Frame released more often than it was acquired or retained")
+            self._refcounts[slot] -= 1
+            if self._refcounts[slot] == 0:
+                self._free.append(slot)
+
+    def owns(self, frame: np.ndarray) -> bool:
+        return self._slot(frame) is not None
+
+    def _slot(self, frame) -> Optional[int]:
+        if not isinstance(frame, np.ndarray) or frame.base is not self._block:
+            return None
+        offset = frame.ctypes.data - self._base
+        if offset % self._frame_bytes:
+            # A view that doesn't start at a frame boundary isn't a frame we lent out
+            return None
+        return offset // self._frame_bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "acquired": self.acquired,
+            "fallback_allocations": self.fallback_allocations,
+        }
+
+
+class _ReleasingQueue(asyncio.Queue):
+    """Queue that releases the frame it handed out last when the next one is requested."""
+
+    def __init__(self, pool: FramePool):
+        super().__init__()
+        self._pool = pool
+        self._taken = None
+
+    def _release_taken(self) -> None:
+        if self._taken is not None:
+            self._pool.release(self._taken)
+            self._taken = None
+
+    async def get(self):
+        self._release_taken()
+        item = await super().get()
+        self._taken = item
+        return item
+
+    def get_nowait(self):
+        self._release_taken()
+        item = super().get_nowait()
+        self._taken = item
+        return item
+
+
+class PooledAudioInput(StreamedAudioInput):
+    """
+    StreamedAudioInput whose frames come from, and go back to, a FramePool.
+
+    add_audio takes over the caller's reference to a pool frame; frames from
+    elsewhere are queued as they are.
+
+    Args:
+        pool: The frame pool capture acquires from
+    """
+
+    def __init__(self, pool: FramePool):
+        super().__init__()
+        self.pool = pool
+        self.queue = _ReleasingQueue(pool)
@@ -0,0 +1,231 @@
+"""
+Indexed catalog of the games in the Prompts collection.
+
+Every document whose ID ends in _GAME_PROMPT is a game. Its metadata comes from
+optional fields on the document, falling back to what can be read from the
+prompt text:
+
+    game_id      agent name (default: the ID without _GAME_PROMPT)
+    name         spoken name (default: the quoted name on the "game is called" line)
+    description  one line for the ChoiceLayer
+    min_age      youngest age the game is for
+    max_age      oldest age the game is for
+    proficiency  level or list of levels ("Beginner", ...) the game is for
+    priority     higher is offered first (default 0)
+
+The catalog is built once per prompt cache version (get_catalog) and answers
+"which games suit this child" with select(), which ranks the matching games and
+returns only the top few. That keeps the ChoiceLayer's instructions and the
+number of game agents bounded however many games the collection holds.
+"""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Number of games offered to the ChoiceLayer when the caller doesn't say
+DEFAULT_OFFER_LIMIT = 10
+
+_GAME_PATTERN = re.compile(r'(.+)_GAME_PROMPT$')
+
+
+@dataclass(frozen=True)
+class GameEntry:
+    """
+    Attributes:
+        prompt_id: ID of the game's prompt document
+        game_id: Agent name of the game
+        name: Spoken name of the game
+        description: One-line description for the ChoiceLayer
+        min_age: Youngest age the game is for (None: no lower bound)
+        max_age: Oldest age the game is for (None: no upper bound)
+        proficiency: Lowercased levels the game is for (empty: any level)
+        priority: Higher is offered first
+    """
+    prompt_id: str
+    game_id: str
+    name: str
+    description: str
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    proficiency: Tuple[str, ...] = ()
+    priority: float = 0.0
+
+    def suits(self, age: Optional[int], proficiency: Optional[str]) -> bool:
+        """Whether the game is for a child of this age and level (unknown values match anything)."""
+        if age is not None:
+            if self.min_age is not None and age < self.min_age:
+                return False
+            if self.max_age is not None and age > self.max_age:
+                return False
+        if proficiency and self.proficiency and proficiency.strip().lower() not in self.proficiency:
+            return False
+        return True
+
+
+def name_from_content(content: str) -> Optional[str]:
+    """The game name from a line like 'This game is called "Spanish Road Trip."', if there is one."""
+    name = None
+    if not content or "game is called" not in content.lower():
+        return name
+    # The last such line wins
+    for line in content.split("\n"):
+        if "game is called" not in line.lower():
+            continue
+        # Extract the name within quotes if present
+        name_match = re.search(r'"([^"]+)"', line)
+        if name_match:
+            # 'called "Spanish Road Trip."' puts the period inside the quotes
+            name = name_match.group(1).rstrip(".!?, ")
+        else:
+            # Try extracting text after "called" without quotes
+            name_match = re.search(r'called\s+(.+?)[\.\s]', line)
+            if name_match:
+                name = name_match.group(1).strip('" ')
+    return name
+
+
+def game_entry(prompt_id: str, document: Dict[str, Any]) -> Optional[GameEntry]:
+    """
+    The catalog entry for a prompt document.
+
+    Args:
+        prompt_id: The document ID
+        document: The document's fields ("content" plus any metadata fields)
+
+    Returns:
+        The entry, or None if the document isn't a game prompt
+    """
+    match = _GAME_PATTERN.match(prompt_id)
+    if not match:
+        return None
+    game_id = str(document.get("game_id") or match.group(1))
+    name = document.get("name") or name_from_content(document.get("content", "")) or game_id.replace("_", " ")
+    description = document.get("description") or f"Learn Spanish through a fun {game_id.lower()} adventure!"
+    levels = document.get("proficiency") or ()
+    if isinstance(levels, str):
+        levels = [levels]
+    return GameEntry(
+        prompt_id=prompt_id,
+        game_id=game_id,
+        name=str(name),
+        description=str(description),
+        min_age=_optional_int(document.get("min_age")),
+        max_age=_optional_int(document.get("max_age")),
+        proficiency=tuple(sorted({str(level).strip().lower() for level in levels})),
+        priority=float(document.get("priority") or 0),
+    )
+
+
+def _optional_int(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+class GameCatalog:
+    """
+    The games of one version of the Prompts collection.
+
+    Args:
+        entries: The games; if two share a game ID the first one wins
+        version: Prompt cache version the entries were read from
+    """
+
+    def __init__(self, entries: Iterable[GameEntry], version: Optional[int] = None):
+        self.version = version
+        by_id: Dict[str, GameEntry] = {}
+        for entry in entries:
+            by_id.setdefault(entry.game_id, entry)
+        self.games = dict(sorted(by_id.items()))
+        # Best first: higher priority, then games aimed at a level or age range (more specific),
+        # then game ID so the order is stable
+        self._ranked = sorted(self.games.values(), key=lambda entry: (
+            -entry.priority,
+            -(bool(entry.proficiency) + (entry.min_age is not None or entry.max_age is not None)),
+            entry.game_id))
+        self._selections: Dict[tuple, List[GameEntry]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_documents(cls, documents: Dict[str, Dict[str, Any]], version: Optional[int] = None) -> "GameCatalog":
+        """Build the catalog from prompt documents (prompt ID -> fields)."""
+        entries = []
+        for prompt_id, document in documents.items():
+            entry = game_entry(prompt_id, document)
+            if entry is not None:
+                entries.append(entry)
+        return cls(entries, version)
+
+    @classmethod
+    def from_prompts(cls, prompts: Dict[str, str]) -> "GameCatalog":
+        """Build the catalog from prompt texts alone (prompt ID -> content)."""
+        return cls.from_documents({prompt_id: {"content": content} for prompt_id, content in prompts.items()})
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def select(self, age: Optional[int] = None, proficiency: Optional[str] = None,
+               limit: Optional[int] = DEFAULT_OFFER_LIMIT) -> List[GameEntry]:
+        """
+        The best games for a child, best first.
+
+        If no game suits the child, the best games overall are returned instead,
+        so there is always something to offer.
+
+        Args:
+            age: The child's age (None matches every game)
+            proficiency: The child's level (None matches every game)
+            limit: Most games to return (None for all)
+
+        Returns:
+            The selected entries
+        """
+        age = _optional_int(age)
+        key = (age, (proficiency or "").strip().lower(), limit)
+        selection = self._selections.get(key)
+        if selection is not None:
+            return selection
+
+        selection = []
+        for entry in self._ranked:
+            if limit is not None and len(selection) >= limit:
+                break
+            if entry.suits(age, proficiency):
+                selection.append(entry)
+        if not selection:
+            selection = self._ranked[:limit]
+
+        with self._lock:
+            # Ages and levels are few, so this stays small
+            self._selections[key] = selection
+        return selection
+
+
+# The catalog of the latest prompt version seen, and the prompt cache it came from
+_catalog: Optional[Tuple[Any, GameCatalog]] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(prompt_cache) -> GameCatalog:
+    """
+    Get the catalog for the prompt cache's current version, building it on first use.
+
+    Args:
+        prompt_cache: A prompt_cache.PromptCache
+
+    Returns:
+        The catalog
+    """
+    global _catalog
+    current = _catalog
+    if current is not None and current[0] is prompt_cache and current[1].version == prompt_cache.version:
+        return current[1]
+    with _catalog_lock:
+        current = _catalog
+        if current is None or current[0] is not prompt_cache or current[1].version != prompt_cache.version:
+            version, documents = prompt_cache.snapshot()
+            current = (prompt_cache, GameCatalog.from_documents(documents, version))
+            _catalog = current
+    return current[1]
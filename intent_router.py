@@ -0,0 +1,429 @@
+"""
+Local intent routing for transcriptions.
+
+Handles the turns that don't need a model: switching games, going back to the
+game menu and answering the "what's your name / how old are you" questions.
+Game IDs, game names and synonyms are compiled into an Aho-Corasick automaton
+over accent- and punctuation-normalized text, so a transcription is matched
+against every phrase in one pass. Words that don't match anything get one
+round of edit-distance-1 correction against the phrase vocabulary to absorb
+small speech-to-text mistakes.
+
+Every decision carries a confidence; callers only skip the model when it is at
+least HIGH_CONFIDENCE, so a bare mention of "car" in the middle of a game
+still goes to the agent.
+"""
+import re
+import threading
+import unicodedata
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INTENT_NONE = "none"
+INTENT_SWITCH_GAME = "switch_game"
+INTENT_GO_BACK = "go_back"
+INTENT_USER_INFO = "user_info"
+
+HIGH_CONFIDENCE = 0.85
+
+# Phrases that turn a game mention into a request to play it
+SWITCH_PHRASES = [
+    "play", "lets play", "can we play", "i want to play", "i wanna play", "switch to", "go to",
+    "lets go to", "lets do", "start", "i want", "jugar", "quiero jugar", "vamos a",
+]
+
+# The switch phrases that still ask for another game in the middle of one ("go to the treasure"
+# and "I want a red car" are gameplay)
+EXPLICIT_SWITCH_PHRASES = [
+    "play", "lets play", "can we play", "i want to play", "i wanna play", "switch to", "change to",
+    "jugar", "quiero jugar", "cambiar a",
+]
+
+# Phrases asking to leave the current game
+BACK_PHRASES = [
+    "go back", "back to the menu", "main menu", "another game", "different game", "other game",
+    "something else", "change the game", "change game", "stop the game", "stop playing",
+    "new game", "otro juego", "volver", "quiero otro",
+]
+
+# Back phrases that are also ordinary gameplay ("I want something else to eat"): left to the agent
+SOFT_BACK_PHRASES = ["something else"]
+
+# Words that negate what follows ("I don't want to play the zoo", "not the zoo", "no car")
+NEGATIONS = {"dont", "not", "no", "never", "nope", "doesnt", "cant", "wont", "nunca", "nah"}
+
+# Words allowed between "play"/"switch to" and the game in the middle of a game
+# ("can we play the island now"); anything else ("play with the zoo animals") is gameplay
+SWITCH_FILLERS = {"the", "a", "an", "to", "in", "on", "game", "el", "la", "al", "en", "juego", "de"}
+
+# Synonyms for the bundled games; more can be added per game in Firestore
+DEFAULT_SYNONYMS = {
+    "CAR": ["car", "car game", "road trip", "drive", "driving", "coche", "carro"],
+    "CarGame": ["car", "car game", "road trip", "drive", "driving", "coche", "carro"],
+    "ISLAND": ["island", "island game", "pirate", "pirates", "treasure", "isla", "pirata"],
+    "IslandGame": ["island", "island game", "pirate", "pirates", "treasure", "isla", "pirata"],
+    "ZOO": ["zoo", "zoo game", "animals", "animal", "zoologico", "animales"],
+}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7, "ocho": 8,
+    "nueve": 9, "diez": 10, "once": 11, "doce": 12, "trece": 13, "catorce": 14,
+}
+
+MIN_AGE, MAX_AGE = 2, 14
+
+# Words that follow "I'm" without being a name
+NOT_NAMES = {
+    "a", "an", "the", "not", "so", "very", "really", "just", "here", "ready", "fine", "good", "ok", "okay",
+    "happy", "sad", "tired", "hungry", "bored", "done", "going", "playing", "years", "old", "sorry", "yes",
+    "no", "bien", "listo", "lista", "aqui", "and", "y", "feeling", "excited",
+}
+
+# Words that follow "I'm" or "it's" in answers that aren't names ("I'm from Mexico", "it's raining")
+NOT_WEAK_NAMES = NOT_NAMES | {
+    "from", "in", "at", "on", "to", "with", "home", "back", "still", "also", "too", "all", "it", "that",
+    "this", "what", "my", "your", "gonna", "trying", "learning", "thinking", "raining", "snowing", "sunny",
+    "cold", "hot", "big", "little", "small", "tall", "scared", "sleepy", "sick", "funny", "silly", "nice",
+    "spanish", "english", "mexican", "american", "french", "boy", "girl", "de", "en", "un", "una",
+    "muy", "nino", "nina", "espanol", "ingles", "mexicano", "mexicana", "cansado", "cansada",
+}
+
+_NAME_PATTERN = re.compile(r"\b(?:my name is|my names|name is|im called|call me|me llamo|mi nombre es)\s+([a-z]+)")
+_WEAK_NAME_PATTERN = re.compile(r"\b(?:im|i am|soy|its|it is)\s+([a-z]+)")
+# Only the speaker's own age: "I'm six", "tengo cinco años", "my age is 6" or just "6 years old",
+# not "my sister is 5 years old", "two years ago" or "two years older"
+_AGE_PATTERN = re.compile(
+    r"\b(?:im|i am|tengo|my age is)\s+([a-z0-9]+)(?!\s+(?:(?:years?|anos)\s+)?(?:ago|older|younger|mas))"
+    r"|^([a-z0-9]+)\s+(?:years?|anos)(?:\s+old)?$")
+# Words that may accompany a bare number answering "how old are you?"
+_BARE_AGE_WORDS = {"im", "i", "am", "um", "uh", "just", "tengo", "years", "year", "old", "anos"}
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace ("¡Vámonos!" -> "vamonos")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_NON_WORD.sub(" ", without_accents.replace("'", "")).split())
+
+
+class AhoCorasick:
+    """Multi-pattern matcher; finds every occurrence of every phrase in one pass over the text."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, phrase: str, payload: Any) -> None:
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(phrase), payload))
+        self._built = False
+
+    def build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                # Depth-1 states fail back to the root, not to themselves
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+
+    def search(self, text: str) -> List[Tuple[int, int, Any]]:
+        """Return (start, end, payload) for every match."""
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in output[state]:
+                matches.append((position + 1 - length, position + 1, payload))
+        return matches
+
+
+@dataclass
+class RouteDecision:
+    """
+    Attributes:
+        intent: One of the INTENT_* constants
+        confidence: 0..1; act locally only at HIGH_CONFIDENCE or above
+        game_id: Target game for INTENT_SWITCH_GAME
+        fields: Extracted user fields for INTENT_USER_INFO (name, age)
+        matched: The phrases that produced the decision
+    """
+    intent: str = INTENT_NONE
+    confidence: float = 0.0
+    game_id: Optional[str] = None
+    fields: Dict[str, Any] = field(default_factory=dict)
+    matched: List[str] = field(default_factory=list)
+
+    @property
+    def confident(self) -> bool:
+        return self.intent != INTENT_NONE and self.confidence >= HIGH_CONFIDENCE
+
+
+class IntentRouter:
+    """
+    Compiled router for one set of games.
+
+    Args:
+        games: Game ID -> {"name": display name, "synonyms": [extra phrases]}
+        switch_phrases: Phrases that mark a request to play a game
+        back_phrases: Phrases that ask to leave the current game
+    """
+
+    def __init__(self, games: Dict[str, Dict[str, Any]], switch_phrases: Iterable[str] = SWITCH_PHRASES,
+                 back_phrases: Iterable[str] = BACK_PHRASES):
+        self.games = games
+        self._matcher = AhoCorasick()
+        vocabulary = set()
+
+        def add(phrase: str, payload: tuple) -> None:
+            phrase = normalize(phrase)
+            if phrase:
+                # Padded with spaces so phrases only match whole words
+                self._matcher.add(f" {phrase} ", payload)
+                vocabulary.update(phrase.split())
+
+        for game_id, info in games.items():
+            add(game_id.replace("_", " "), ("game", game_id, "id"))
+            add(info.get("name") or "", ("game", game_id, "name"))
+            for synonym in list(DEFAULT_SYNONYMS.get(game_id, [])) + list(info.get("synonyms") or []):
+                add(synonym, ("game", game_id, "synonym"))
+        explicit = {normalize(phrase) for phrase in EXPLICIT_SWITCH_PHRASES}
+        for phrase in set(switch_phrases) | set(EXPLICIT_SWITCH_PHRASES):
+            add(phrase, ("switch", None, "explicit" if normalize(phrase) in explicit else "verb"))
+        soft = {normalize(phrase) for phrase in SOFT_BACK_PHRASES}
+        for phrase in back_phrases:
+            add(phrase, ("back", None, "soft" if normalize(phrase) in soft else "phrase"))
+        self._matcher.build()
+
+        # Single-deletion index of the phrase vocabulary for edit distance 1 corrections
+        self._vocabulary = vocabulary
+        self._deletions: Dict[str, set] = {}
+        for word in vocabulary:
+            if len(word) >= 4:
+                for variant in _deletions(word) | {word}:
+                    self._deletions.setdefault(variant, set()).add(word)
+
+    def route(self, text: str, current_game: Optional[str] = None,
+              missing_fields: Iterable[str] = ()) -> RouteDecision:
+        """
+        Decide whether a transcription can be handled without the model.
+
+        Args:
+            text: The transcription
+            current_game: The game being played, or None at the game menu
+            missing_fields: User fields still being collected ("name", "age");
+                when set, only user info answers are recognized
+
+        Returns:
+            The routing decision
+        """
+        normalized = normalize(text)
+        missing = set(missing_fields)
+        if missing:
+            return extract_user_info(text, normalized, missing)
+
+        decision = self._route_games(normalized, current_game)
+        if decision.intent == INTENT_NONE:
+            corrected = self._correct(normalized)
+            if corrected != normalized:
+                decision = self._route_games(corrected, current_game)
+                decision.confidence = min(decision.confidence, 0.9)
+        return decision
+
+    def _route_games(self, normalized: str, current_game: Optional[str]) -> RouteDecision:
+        matches = self._matcher.search(f" {normalized} ")
+        if not matches:
+            return RouteDecision()
+
+        # In the middle of a game only an explicit "play"/"switch to" counts; "go to" and "I want" are gameplay
+        verbs = [(start, end) for start, end, (kind, _, source) in matches
+                 if kind == "switch" and (current_game is None or source == "explicit")]
+        verb_at = min((start for start, _ in verbs), default=None)
+        backs = [(start, source) for start, _, (kind, _, source) in matches if kind == "back"]
+        targets: Dict[str, Tuple[int, str]] = {}
+        for start, end, (kind, game_id, source) in matches:
+            if kind == "game" and game_id != current_game:
+                # Keep the strongest evidence per game
+                rank = {"name": 2, "id": 1, "synonym": 0}[source]
+                if game_id not in targets or rank > targets[game_id][0]:
+                    targets[game_id] = (rank, normalized[max(0, start):max(0, end - 2)])
+
+        if len(targets) > 1:
+            # Two different games mentioned: let the agent sort it out
+            return RouteDecision(matched=[phrase for _, phrase in targets.values()])
+        if targets:
+            game_id, (rank, phrase) = next(iter(targets.items()))
+            game_start = min(start for start, _, (kind, target, _) in matches if kind == "game" and target == game_id)
+            if _negated(normalized, game_start):
+                # "I don't want to play the zoo", "not the zoo": let the agent answer
+                confidence = 0.5
+            elif current_game is not None:
+                # In a game, synonyms ("drive", "animal", "treasure") are gameplay vocabulary:
+                # only "play"/"switch to" right before the game's ID or name switches without the model
+                adjacent = any(end <= game_start + 1 and
+                               all(word in SWITCH_FILLERS for word in normalized[end - 1:game_start].split())
+                               for _, end in verbs)
+                confidence = 0.95 if adjacent and rank >= 1 else 0.5
+            elif verb_at is not None and verb_at <= game_start:
+                confidence = 0.95
+            elif rank == 2 and len(phrase.split()) > 1:
+                confidence = 0.9  # A full multi-word game name is unambiguous
+            elif len(normalized.split()) <= 3:
+                confidence = 0.9  # A short answer at the menu ("the zoo!")
+            else:
+                confidence = 0.5
+            return RouteDecision(INTENT_SWITCH_GAME, confidence, game_id=game_id, matched=[phrase])
+        if backs and current_game is not None:
+            back_at = min(start for start, _ in backs)
+            if _negated(normalized, back_at) or all(source == "soft" for _, source in backs):
+                # "I don't want to go back", "let's look at something else"
+                return RouteDecision(INTENT_GO_BACK, 0.5)
+            return RouteDecision(INTENT_GO_BACK, 0.95)
+        return RouteDecision()
+
+    def _correct(self, normalized: str) -> str:
+        words = normalized.split()
+        changed = False
+        for i, word in enumerate(words):
+            if len(word) < 4 or word in self._vocabulary:
+                continue
+            candidates = set()
+            for variant in _deletions(word) | {word}:
+                candidates |= self._deletions.get(variant, set())
+            candidates = {candidate for candidate in candidates if _within_one_edit(word, candidate)}
+            if len(candidates) == 1:
+                words[i] = candidates.pop()
+                changed = True
+        return " ".join(words) if changed else normalized
+
+
+def extract_user_info(text: str, normalized: str, missing: set) -> RouteDecision:
+    """
+    Pull a name and/or age out of an answer to the user info questions.
+
+    Returns:
+        INTENT_USER_INFO with the fields found; confident only if every field
+        found was stated explicitly ("my name is Leo", "I'm six", "6 years old").
+        A name after "I'm" or "it's" is left for the agent to confirm
+    """
+    fields: Dict[str, Any] = {}
+    confidences = []
+    words = normalized.split()
+
+    if "age" in missing:
+        age = None
+        for match in _AGE_PATTERN.finditer(normalized):
+            age = _parse_number(match.group(1) or match.group(2))
+            if age is not None:
+                break
+        if age is None and len(words) <= 3:
+            # A bare number answering "how old are you?" ("she is 5" has another subject)
+            numbers = [_parse_number(word) for word in words]
+            numbers = [number for number in numbers if number is not None]
+            others = [word for word in words if _parse_number(word) is None]
+            age = numbers[0] if len(numbers) == 1 and all(word in _BARE_AGE_WORDS for word in others) else None
+        if age is not None and MIN_AGE <= age <= MAX_AGE:
+            fields["age"] = age
+            confidences.append(0.95)
+
+    if "name" in missing:
+        name, confidence = None, 0.0
+        match = _NAME_PATTERN.search(normalized)
+        if match and match.group(1) not in NOT_NAMES:
+            name, confidence = match.group(1), 0.95
+        else:
+            for match in _WEAK_NAME_PATTERN.finditer(normalized):
+                candidate = match.group(1)
+                if candidate not in NOT_WEAK_NAMES and _parse_number(candidate) is None:
+                    # "I'm Sofía" is usually a name, but "I'm Spanish" isn't
+                    name, confidence = candidate, 0.7
+                    break
+        if name is None and missing == {"name"} and len(words) == 1 and words[0] not in NOT_NAMES \
+                and _parse_number(words[0]) is None:
+            name, confidence = words[0], 0.7  # Probably a bare name, but let the agent confirm
+        if name is not None:
+            fields["name"] = _original_spelling(text, name)
+            confidences.append(confidence)
+
+    if not fields:
+        return RouteDecision()
+    return RouteDecision(INTENT_USER_INFO, min(confidences), fields=fields)
+
+
+# Routers are cached per set of games, so sessions with the same games share one automaton
+_routers: Dict[tuple, IntentRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(games: Dict[str, Dict[str, Any]]) -> IntentRouter:
+    """Get the compiled router for a set of games, compiling it on first use."""
+    key = tuple(sorted((game_id, info.get("name") or "", tuple(info.get("synonyms") or ()))
+                       for game_id, info in games.items()))
+    router = _routers.get(key)
+    if router is None:
+        with _routers_lock:
+            router = _routers.get(key)
+            if router is None:
+                router = IntentRouter(games)
+                _routers[key] = router
+    return router
+
+
+def _parse_number(word: str) -> Optional[int]:
+    if word.isdigit():
+        return int(word)
+    return NUMBER_WORDS.get(word)
+
+
+def _original_spelling(text: str, normalized_word: str) -> str:
+    # Recover accents and capitalization ("josé" -> "José") from the raw transcription
+    for word in re.findall(r"[^\W\d_]+", text):
+        if normalize(word) == normalized_word:
+            return word[:1].upper() + word[1:]
+    return normalized_word.capitalize()
+
+
+def _negated(normalized: str, position: int) -> bool:
+    # Match positions are in the space-padded text, one character ahead of normalized
+    return any(word in NEGATIONS for word in normalized[:max(0, position - 1)].split())
+
+
+def _deletions(word: str) -> set:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) == 1
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return any(longer[:i] + longer[i + 1:] == shorter for i in range(len(longer)))
@@ -0,0 +1,104 @@
+"""
+Game agents that are built on first use.
+
+A session usually plays one or two of the games on offer, but every game used
+to get a full Agent (rendered instructions, tools, handoffs) when the session
+started. LazyAgent stands in for a game agent until it is needed:
+
+- the ChoiceLayer hands off to it through as_handoff(), a Handoff with the same
+  tool name and description handoff(agent) would give, whose invocation builds
+  the agent and returns it
+- code that needs the agent itself (a locally routed game switch) calls get()
+- the agent is built once and memoized; peek() returns it without building it
+
+Until the agent is built, `handoffs` holds the handoffs it will be created
+with, so rewiring a session's handoffs works the same on built and unbuilt
+agents.
+"""
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from agents import Agent, RunContextWrapper
+from agents.handoffs import Handoff
+from agents.strict_schema import ensure_strict_json_schema
+
+
+class LazyAgent:
+    """
+    An agent built by `build` the first time it is needed.
+
+    Args:
+        name: The agent's name (known without building it)
+        handoff_description: The agent's handoff description
+        build: Creates the agent; its handoffs are replaced with this object's `handoffs`
+        model: The model the agent will use, for connection pre-warming
+        handoffs: Handoffs the agent gets when it is built
+    """
+
+    def __init__(self, name: str, handoff_description: str, build: Callable[[], Agent],
+                 model: Optional[str] = None, handoffs: Optional[List[Any]] = None):
+        self.name = name
+        self.handoff_description = handoff_description
+        self.model = model
+        self._build = build
+        self._handoffs = list(handoffs or [])
+        self._agent: Optional[Agent] = None
+        self._handoff: Optional[Handoff] = None
+        self._lock = threading.Lock()
+        self.build_ms: Optional[float] = None
+
+    @classmethod
+    def of(cls, agent: Agent, build: Optional[Callable[[], Agent]] = None) -> "LazyAgent":
+        """A LazyAgent holding an agent that is already built."""
+        lazy = cls(agent.name, agent.handoff_description, build or (lambda: agent), agent.model, agent.handoffs)
+        lazy._agent = agent
+        return lazy
+
+    @property
+    def built(self) -> bool:
+        return self._agent is not None
+
+    @property
+    def handoffs(self) -> List[Any]:
+        """The agent's handoff list once built, the handoffs it will get before that."""
+        agent = self._agent
+        return agent.handoffs if agent is not None else self._handoffs
+
+    def peek(self) -> Optional[Agent]:
+        """The agent if it has been built, without building it."""
+        return self._agent
+
+    def get(self) -> Agent:
+        """The agent, built on the first call."""
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    started = time.perf_counter()
+                    agent = self._build()
+                    agent.handoffs = list(self._handoffs)
+                    self.build_ms = (time.perf_counter() - started) * 1000
+                    self._agent = agent
+        return self._agent
+
+    def rebuilt(self, agent: Agent) -> "LazyAgent":
+        """A new LazyAgent holding a rebuilt version of this agent (this one is left as it is)."""
+        return LazyAgent.of(agent, self._build)
+
+    def as_handoff(self) -> Handoff:
+        """The Handoff to put in another agent's handoffs; invoking it builds the agent."""
+        if self._handoff is None:
+            async def invoke(context: RunContextWrapper[Any], arguments: str) -> Agent:
+                return self.get()
+
+            self._handoff = Handoff(
+                tool_name=Handoff.default_tool_name(self),
+                tool_description=Handoff.default_tool_description(self),
+                input_json_schema=ensure_strict_json_schema({}),
+                on_invoke_handoff=invoke,
+                agent_name=self.name,
+            )
+        return self._handoff
+
+    def __repr__(self) -> str:
+        return f"LazyAgent({self.name!r}, built={self.built})"
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import asyncio
+import time
 from typing import TYPE_CHECKING
 
 import numpy as np
-import sounddevice as sd
 from textual import events
 from textual.app import App, ComposeResult
 from textual.containers import Container
@@ -12,20 +12,41 @@ from textual.reactive import reactive
 from textual.widgets import Button, RichLog, Static
 from typing_extensions import override
 
-from agents.voice import StreamedAudioInput, VoicePipeline
+from agents.voice import OpenAIVoiceModelProvider, STTModelSettings, VoicePipeline, VoicePipelineConfig
 
 # Import MyWorkflow class - handle both module and package use cases
 if TYPE_CHECKING:
     # For type checking, use the relative import
+    from .audio_cache import AudioCache, CachedVoiceModelProvider
+    from .audio_capture import CallbackCapture
+    from .audio_format import negotiate_format
+    from .audio_playback import PlaybackStage
+    from .frame_pool import FramePool, PooledAudioInput
     from .my_workflow import MyWorkflow
+    from .text_chunker import segment_tts_settings
+    from .vad import GatedAudioInput, VoiceGate
 else:
     # At runtime, try both import styles
     try:
         # Try relative import first (when used as a package)
+        from .audio_cache import AudioCache, CachedVoiceModelProvider
+        from .audio_capture import CallbackCapture
+        from .audio_format import negotiate_format
+        from .audio_playback import PlaybackStage
+        from .frame_pool import FramePool, PooledAudioInput
         from .my_workflow import MyWorkflow
+        from .text_chunker import segment_tts_settings
+        from .vad import GatedAudioInput, VoiceGate
     except ImportError:
         # Fall back to direct import (when run as a script)
+        from audio_cache import AudioCache, CachedVoiceModelProvider
+        from audio_capture import CallbackCapture
+        from audio_format import negotiate_format
+        from audio_playback import PlaybackStage
+        from frame_pool import FramePool, PooledAudioInput
         from my_workflow import MyWorkflow
+        from text_chunker import segment_tts_settings
+        from vad import GatedAudioInput, VoiceGate
 
 CHUNK_LENGTH_S = 0.05  # 100ms
 SAMPLE_RATE = 24000
@@ -33,6 +54,20 @@ FORMAT = np.int16
 CHANNELS = 1
 
 
+def _sounddevice():
+    # PortAudio is loaded when the first stream is opened, after the UI is up
+    import sounddevice
+
+    return sounddevice
+
+
+def _default_device(kind: str) -> dict | None:
+    try:
+        return dict(_sounddevice().query_devices(kind=kind))
+    except Exception:
+        return None
+
+
 class Header(Static):
     """A header widget."""
 
@@ -58,6 +93,45 @@ class AudioStatusIndicator(Static):
         return status
 
 
+class AudioStreamStats:
+    """Aggregates per-chunk audio events into a periodic stats line."""
+
+    def __init__(self) -> None:
+        self.turn_started_at: float | None = None
+        self.time_to_first_audio: float | None = None
+        self.window_started_at = time.perf_counter()
+        self.window_bytes = 0
+        self.window_chunks = 0
+
+    def start_turn(self) -> None:
+        self.turn_started_at = time.perf_counter()
+        self.time_to_first_audio = None
+
+    def add_chunk(self, nbytes: int) -> None:
+        if self.turn_started_at is not None and self.time_to_first_audio is None:
+            self.time_to_first_audio = time.perf_counter() - self.turn_started_at
+        self.window_bytes += nbytes
+        self.window_chunks += 1
+
+    def take_line(self) -> str | None:
+        """Return a stats line for the audio received since the last call, if any."""
+        if not self.window_chunks:
+            return None
+        now = time.perf_counter()
+        elapsed = max(now - self.window_started_at, 1e-6)
+        first_audio = (
+            f"{self.time_to_first_audio * 1000:.0f} ms" if self.time_to_first_audio is not None else "n/a"
+        )
+        line = (
+            f"Audio: {self.window_bytes / elapsed / 1024:.1f} KiB/s, "
+            f"{self.window_chunks} chunks, first audio {first_audio}"
+        )
+        self.window_started_at = now
+        self.window_bytes = 0
+        self.window_chunks = 0
+        return line
+
+
 class RealtimeApp(App[None]):
     CSS = """
         Screen {
@@ -117,30 +191,88 @@ class RealtimeApp(App[None]):
     """
 
     should_send_audio: asyncio.Event
-    audio_player: sd.OutputStream
+    playback: PlaybackStage | None
     last_audio_item_id: str | None
     connected: asyncio.Event
 
-    def __init__(self, user_id: str = 'ID1') -> None:
+    def __init__(
+        self,
+        user_id: str = 'ID1',
+        playback_latency_ms: float = 120.0,
+        stats_refresh_s: float = 1.0,
+        end_of_turn_silence_ms: float | None = None,
+    ) -> None:
         super().__init__()
+        # None keeps the SDK's semantic turn detection. A value switches to server VAD with that
+        # silence_duration_ms, and the voice gate sends that much silence at once when it detects
+        # end of speech, so the server commits the turn without waiting for it in real time.
+        self.end_of_turn_silence_ms = end_of_turn_silence_ms
+        self.stats_refresh_s = stats_refresh_s
+        self.playback_latency_ms = playback_latency_ms
+        self.audio_stats = AudioStreamStats()
+        self._log: RichLog | None = None
         self.last_audio_item_id = None
         self.should_send_audio = asyncio.Event()
         self.connected = asyncio.Event()
+        # Fixed replies (greeting, game switches, error message) are spoken from pre-synthesized audio
+        self.audio_cache = AudioCache()
         self.pipeline = VoicePipeline(
-            workflow=MyWorkflow(on_start=self._on_transcription, user_id=user_id)
+            workflow=MyWorkflow(on_start=self._on_transcription, user_id=user_id, audio_cache=self.audio_cache),
+            # The workflow yields complete clauses and sentences; speak each one right away
+            config=VoicePipelineConfig(
+                model_provider=CachedVoiceModelProvider(OpenAIVoiceModelProvider(), self.audio_cache),
+                tts_settings=segment_tts_settings(),
+                stt_settings=STTModelSettings(
+                    turn_detection=None
+                    if end_of_turn_silence_ms is None
+                    else {"type": "server_vad", "silence_duration_ms": end_of_turn_silence_ms}
+                ),
+                # Mic frames are lent out by a frame pool and reused once consumed,
+                # so the pipeline must not keep them around for the trace
+                trace_include_sensitive_audio_data=False,
+            ),
         )
-        self._audio_input = StreamedAudioInput()
-        self.audio_player = sd.OutputStream(
-            samplerate=SAMPLE_RATE,
+        self._audio_input = PooledAudioInput(FramePool(int(SAMPLE_RATE * 0.02), CHANNELS))
+        # Only speech goes upstream: silence between utterances is dropped on the client
+        self.voice_gate = VoiceGate(on_end_of_speech=self._on_end_of_speech, on_speech_start=self._on_speech_start)
+        # Created with the output stream once the pipeline starts (see _create_playback)
+        self.playback = None
+
+    def _create_playback(self) -> PlaybackStage:
+        # Pipeline audio goes through a jitter buffer drained by the OutputStream callback,
+        # so playback never blocks the event loop
+        # Devices are opened at their native rate and converted to and from the pipeline's
+        # 24 kHz mono by our own resampler instead of PortAudio's or the OS's
+        return PlaybackStage(
+            _sounddevice().OutputStream,
+            sample_rate=SAMPLE_RATE,
             channels=CHANNELS,
-            dtype=FORMAT,
+            target_latency_ms=self.playback_latency_ms,
+            device_format=negotiate_format(_default_device("output"), kind="output"),
         )
 
     def _on_transcription(self, transcription: str) -> None:
-        try:
-            self.query_one("#bottom-pane", RichLog).write(f"Transcription: {transcription}")
-        except Exception:
-            pass
+        if self._log is not None:
+            self._log.write(f"Transcription: {transcription}")
+
+    def _on_speech_start(self) -> None:
+        # Barge-in: the child talks over the response, so stop playing it right away
+        if self.playback is not None:
+            self.playback.flush()
+
+    def _on_end_of_speech(self) -> None:
+        if self._log is None:
+            return
+        if self.end_of_turn_silence_ms is not None:
+            # GatedAudioInput has already sent the end-of-turn silence upstream
+            self._log.write("End of speech detected, turn closed upstream")
+        else:
+            self._log.write("End of speech detected")
+
+    def _write_audio_stats(self) -> None:
+        line = self.audio_stats.take_line()
+        if line is not None and self._log is not None:
+            self._log.write(line)
 
     @override
     def compose(self) -> ComposeResult:
@@ -151,62 +283,64 @@ class RealtimeApp(App[None]):
             yield RichLog(id="bottom-pane", wrap=True, highlight=True, markup=True)
 
     async def on_mount(self) -> None:
+        # Look the log widget up once; per-chunk audio stats are written on a timer
+        self._log = self.query_one("#bottom-pane", RichLog)
+        self.set_interval(self.stats_refresh_s, self._write_audio_stats)
         self.run_worker(self.start_voice_pipeline())
         self.run_worker(self.send_mic_audio())
 
     async def start_voice_pipeline(self) -> None:
         try:
-            self.audio_player.start()
+            self.playback = self._create_playback()
+            self.playback.start()
             self.result = await self.pipeline.run(self._audio_input)
 
+            bottom_pane = self._log
             async for event in self.result.stream():
-                bottom_pane = self.query_one("#bottom-pane", RichLog)
                 if event.type == "voice_stream_event_audio":
-                    self.audio_player.write(event.data)
-                    bottom_pane.write(
-                        f"Received audio: {len(event.data) if event.data is not None else '0'} bytes"
-                    )
+                    if event.data is not None:
+                        await self.playback.write(event.data)
+                        self.audio_stats.add_chunk(event.data.nbytes)
                 elif event.type == "voice_stream_event_lifecycle":
+                    if event.event == "turn_started":
+                        self.playback.start_turn()
+                        self.audio_stats.start_turn()
+                    elif event.event == "turn_ended":
+                        self.playback.end_of_turn()
+                        self._write_audio_stats()
+                        stats = self.playback.stats()
+                        bottom_pane.write(
+                            f"Playback: {stats['underruns']} underruns, {stats['overruns']} overruns"
+                        )
                     bottom_pane.write(f"Lifecycle event: {event.event}")
         except Exception as e:
-            bottom_pane = self.query_one("#bottom-pane", RichLog)
-            bottom_pane.write(f"Error: {e}")
+            self._log.write(f"Error: {e}")
         finally:
-            self.audio_player.close()
+            if self.playback is not None:
+                self.playback.close()
 
     async def send_mic_audio(self) -> None:
+        sd = _sounddevice()
         device_info = sd.query_devices()
         print(device_info)
 
-        read_size = int(SAMPLE_RATE * 0.02)
-
-        stream = sd.InputStream(
+        # The InputStream callback fills a ring buffer and wakes us once a 20ms frame
+        # is ready, so nothing spins while waiting for audio
+        self.capture = CallbackCapture(
+            GatedAudioInput(
+                self._audio_input, self.voice_gate, end_of_speech_silence_ms=self.end_of_turn_silence_ms or 0.0
+            ),
+            sd.InputStream,
+            sample_rate=SAMPLE_RATE,
             channels=CHANNELS,
-            samplerate=SAMPLE_RATE,
-            dtype="int16",
+            frame_ms=20,
+            device_format=negotiate_format(_default_device("input"), kind="input"),
         )
-        stream.start()
-
-        status_indicator = self.query_one(AudioStatusIndicator)
 
         try:
-            while True:
-                if stream.read_available < read_size:
-                    await asyncio.sleep(0)
-                    continue
-
-                await self.should_send_audio.wait()
-                status_indicator.is_recording = True
-
-                data, _ = stream.read(read_size)
-
-                await self._audio_input.add_audio(data)
-                await asyncio.sleep(0)
+            await self.capture.run(self.should_send_audio)
         except KeyboardInterrupt:
             pass
-        finally:
-            stream.stop()
-            stream.close()
 
     async def on_key(self, event: events.Key) -> None:
         """Handle key press events."""
@@ -223,7 +357,15 @@ class RealtimeApp(App[None]):
             if status_indicator.is_recording:
                 self.should_send_audio.clear()
                 status_indicator.is_recording = False
+                if self._log is not None:
+                    stats = self.voice_gate.stats()
+                    self._log.write(f"VAD: {stats['suppressed_fraction'] * 100:.0f}% of "
+                                    f"{stats['frames_in']} frames not sent")
             else:
+                self.voice_gate.reset()
+                # Pressing record also interrupts the current response
+                if self.playback is not None:
+                    self.playback.flush()
                 self.should_send_audio.set()
                 status_indicator.is_recording = True
 
@@ -1,42 +1,49 @@
-import random
-import re
-import os
-import string
+import asyncio
+import time
 from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from typing import Callable, Dict, Optional, List, Any
-from agents import Agent, Runner, TResponseInputItem, function_tool
-from agents.extensions.handoff_prompt import prompt_with_handoff_instructions
-from agents.voice import VoiceWorkflowBase, VoiceWorkflowHelper
-import firebase_admin
-from firebase_admin import credentials, firestore
+from agents import Agent, FunctionTool, RunConfig, RunContextWrapper, Runner, function_tool
+from agents.voice import VoiceWorkflowBase
 
 # Import our Firebase user functions
-from User_Firebase import get_user_from_firestore, add_user_to_firestore
+from User_Firebase import (get_firestore_client, get_user_from_firestore, get_user_async, get_vocabulary_async,
+                           get_write_queue, queue_user_update, queue_vocabulary_update)
+from prompt_cache import PromptCache
+from conversation_history import ConversationHistory
+from prompt_assembly import assemble_instructions, format_available_agents
+from prompt_templates import render_template, template_fields
+from game_catalog import DEFAULT_OFFER_LIMIT, GameCatalog, GameEntry, get_catalog
+from lazy_agents import LazyAgent
+from agent_prewarm import HandoffPrewarm, handoff_tool_names, prewarm_model_connection, summarize_prewarms
+from text_chunker import TextChunker
+from intent_router import INTENT_GO_BACK, INTENT_SWITCH_GAME, INTENT_USER_INFO, RouteDecision, get_router
+from vocabulary_store import VocabularyIndex
 
 # Helper function for logging
 def log_debug(message: str) -> None:
     """Helper function to print debug messages"""
     print(f"[DEBUG] {message}")
 
-# Initialize Firebase
-try:
-    # Try to get the app if it's already initialized
-    firebase_admin.get_app()
-except ValueError:
-    # Initialize it if not already done
-    cred_path = os.environ.get("FIREBASE_CREDENTIALS", "./bern-8dbc2-firebase-adminsdk-fbsvc-f2d05b268c.json")
+# Firebase is initialized on first use (see User_Firebase.get_firestore_client), not at import
+def get_db():
+    """
+    Get the shared Firestore client, initializing Firebase if needed.
+    
+    Returns:
+        The Firestore client, or None if Firebase isn't available
+    """
     try:
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
+        return get_firestore_client()
     except Exception as e:
-        log_debug(f"Error initializing Firebase: {e}. Some functionality may be limited.")
+        log_debug(f"Error getting Firestore client: {e}. Using fallback options.")
+        return None
 
-# Get Firestore client
-try:
-    db = firestore.client()
-except Exception as e:
-    log_debug(f"Error getting Firestore client: {e}. Using fallback options.")
-    db = None
+# Fixed replies; their audio can be cached (see audio_cache.py)
+GREETING_NEW_USER = "¡Hola! I'm Amigo, your Spanish language friend! Before we start, could you tell me your name and how old you are?"
+GREETING_RETURNING_USER = "¡Hola {name}! I'm Amigo, your Spanish language friend! I'm here to help you learn some fun Spanish words. What would you like to play today?"
+MISSING_INFO_LEAD = "Before we can play a game, I need to know a bit more about you. "
+HANDOFF_MISSING_INFO_LEAD = "I need to know a bit more about you before we continue. "
 
 # User context will be populated from the database
 # This is just a default empty template
@@ -63,9 +70,61 @@ def placeholder_get_child_age() -> int:
     # Return None to indicate we need to collect this information
     return None
 
+@dataclass(frozen=True)
+class SessionTools:
+    """
+    The tools bound to one session's user, passed to initialize_agents.
+    
+    Attributes:
+        save_user_info: Saves the child's name and age
+        get_child_name: Returns the child's name, or None if it isn't known yet
+        get_child_age: Returns the child's age, or None if it isn't known yet
+    """
+    save_user_info: FunctionTool
+    get_child_name: FunctionTool
+    get_child_age: FunctionTool
+
+# Used when agents are built outside a session (e.g. by scripts and benchmarks)
+PLACEHOLDER_TOOLS = SessionTools(
+    save_user_info=function_tool(placeholder_save_user_info),
+    get_child_name=function_tool(placeholder_get_child_name),
+    get_child_age=function_tool(placeholder_get_child_age),
+)
+
+class LanguageTutorContext:
+    """Context for tracking state in the language tutor workflow."""
+    def __init__(self, user_id: Optional[str] = None):
+        self.child_age: Optional[int] = None
+        self.child_name: Optional[str] = None
+        self.learned_words: Dict[str, str] = {}  # Spanish word -> English translation
+        self.current_game: Optional[str] = None
+        self.engagement_score: int = 3  # Start with neutral engagement
+        
+        # The child's vocabulary; stored words are read on first use
+        self.vocabulary: Optional[VocabularyIndex] = None
+        self._learned_words_synced = False
+        if user_id is not None:
+            self.vocabulary = VocabularyIndex(user_id, loader=get_vocabulary_async, writer=queue_vocabulary_update)
+    
+    async def load_vocabulary(self) -> Optional[VocabularyIndex]:
+        """
+        The child's vocabulary with its stored words read, or None outside a session.
+        
+        Every vocabulary tool goes through here, so learned_words picks up the
+        stored words whichever tool reads them first.
+        """
+        if self.vocabulary is None:
+            return None
+        if not self._learned_words_synced:
+            await self.vocabulary.ensure_loaded()
+            self.learned_words.update(self.vocabulary.words())
+            self._learned_words_synced = True
+        return self.vocabulary
+
 # Define a vocabulary tracking tool
 @function_tool
-def track_vocabulary(word: str, translation: str, context: str) -> str:
+async def track_vocabulary(ctx: RunContextWrapper[LanguageTutorContext], word: str, translation: str,
+                           context: str) -> str:
     """Track a Spanish vocabulary word that was taught to the child.
     
     Args:
@@ -74,26 +133,119 @@ def track_vocabulary(word: str, translation: str, context: str) -> str:
         context: Additional context about how the word was taught (can be empty string)
     """
     log_debug(f"Tracking vocabulary: {word} = {translation} ({context})")
-    return f"Added '{word}' ({translation}) to the child's vocabulary list."
+    tutor_context = ctx.context
+    vocabulary = await tutor_context.load_vocabulary() if tutor_context is not None else None
+    if vocabulary is None:
+        return f"Added '{word}' ({translation}) to the child's vocabulary list."
+    
+    entry = await vocabulary.track(word, translation, context)
+    tutor_context.learned_words[entry.word] = entry.translation
+    
+    if entry.count == 1:
+        return f"Added '{word}' ({translation}) to the child's vocabulary list."
+    return f"'{word}' ({translation}) is already on the child's vocabulary list; practiced {entry.count} times."
+
+@function_tool
+async def has_seen_word(ctx: RunContextWrapper[LanguageTutorContext], word: str) -> str:
+    """Check whether the child has already been taught a Spanish word.
+    
+    Args:
+        word: The Spanish word to look up
+    """
+    vocabulary = await ctx.context.load_vocabulary() if ctx.context is not None else None
+    if vocabulary is None:
+        return f"No vocabulary is available, so treat '{word}' as new."
+    entry = vocabulary.get(word)
+    if entry is None:
+        return f"'{word}' is a new word for the child."
+    return f"The child has seen '{entry.word}' ({entry.translation}) {entry.count} times."
+
+@function_tool
+async def words_due_for_review(ctx: RunContextWrapper[LanguageTutorContext], limit: int) -> str:
+    """List Spanish words the child learned earlier that are due for review.
+    
+    Args:
+        limit: Maximum number of words to return
+    """
+    vocabulary = await ctx.context.load_vocabulary() if ctx.context is not None else None
+    if vocabulary is None:
+        return "No words are due for review."
+    due = vocabulary.due_for_review(limit=max(1, limit))
+    if not due:
+        return "No words are due for review."
+    return "Words due for review: " + ", ".join(f"{entry.word} ({entry.translation})" for entry in due)
+
+# The vocabulary tools read the session from the run context, so one set of
+# tool schemas is built per process and shared by every session's agents
+VOCABULARY_TOOLS = (track_vocabulary, has_seen_word, words_due_for_review)
+
+# Shared prompt cache so sessions in the same process don't re-read the collection
+_prompt_cache: Optional[PromptCache] = None
+
+def get_prompt_cache() -> PromptCache:
+    """Get the process-wide prompt cache, creating it on first use."""
+    global _prompt_cache
+    if _prompt_cache is None:
+        _prompt_cache = PromptCache(get_db())
+    return _prompt_cache
+
+def configure_prompt_cache(client=None, **cache_options) -> PromptCache:
+    """
+    Replace the process-wide prompt cache, e.g. to point it at another client.
+    
+    Args:
+        client: Firestore client to read prompts from (defaults to the shared client)
+        **cache_options: Extra options passed to PromptCache (ttl_s, poll_interval_s, ...)
+    
+    Returns:
+        The new prompt cache
+    """
+    global _prompt_cache
+    if _prompt_cache is not None:
+        _prompt_cache.close()
+    _prompt_cache = PromptCache(client if client is not None else get_db(), **cache_options)
+    return _prompt_cache
 
 # Function to retrieve all prompts from Firebase
-def get_all_prompts() -> Dict[str, str]:
+def get_all_prompts(use_cache: bool = True) -> Dict[str, str]:
     """
     Retrieve all prompt documents from the Prompts collection.
     
+    Args:
+        use_cache: Serve the prompts from the shared prompt cache instead of
+            streaming the whole collection from Firestore
+    
+    Returns:
+        Dictionary with prompt names as keys and their content as values.
+    """
+    if use_cache:
+        prompts = get_prompt_cache().get_prompts()
+        if not prompts:
+            log_debug("No prompts found in Firebase. The workflow cannot function without prompts.")
+        return prompts
+    
+    return fetch_all_prompts(get_db())
+
+def fetch_all_prompts(client) -> Dict[str, str]:
+    """
+    Stream the Prompts collection directly from Firestore, bypassing the cache.
+    
+    Args:
+        client: Firestore client to read from
+    
     Returns:
         Dictionary with prompt names as keys and their content as values.
     """
     log_debug("Retrieving prompts from Firebase...")
     prompts = {}
     
-    if db is None:
+    if client is None:
         log_debug("Firebase not available. Workflow cannot function without prompts.")
         return {}
     
     try:
         # Get all documents from the Prompts collection
-        prompt_docs = db.collection("Prompts").stream()
+        prompt_docs = client.collection("Prompts").stream()
         
         for doc in prompt_docs:
             prompt_name = doc.id
@@ -124,25 +276,17 @@ def replace_user_templates(text: str, user_data: Dict[str, Any]) -> str:
     Returns:
         Text with templates replaced by user values
     """
-    if not text:
-        return text
-        
-    # Define a regex pattern for ${user.field} templates
-    pattern = r'\${user\.([a-zA-Z]+)}'
-    
-    def replace_match(match):
-        field = match.group(1)
-        value = user_data.get(field)
-        return str(value) if value is not None else f"[unknown {field}]"
-    
-    # Replace all matches
-    return re.sub(pattern, replace_match, text)
+    # Templates are compiled once per prompt text; rendering joins their segments
+    return render_template(text, user_data)
 
 # Function to detect game prompts and extract metadata
 def detect_game_prompts(prompts: Dict[str, str], user_data: Dict[str, Any]) -> Dict[str, Dict]:
     """
     Detect game prompts from the full set of prompts and extract metadata.
     
+    Sessions use the indexed catalog instead (see offered_games); this reads
+    metadata from the prompt texts only, for tools that have nothing else.
+    
     Args:
         prompts: Dictionary of all prompts
         user_data: Dictionary with user data for template replacement
@@ -151,111 +295,87 @@ def detect_game_prompts(prompts: Dict[str, str], user_data: Dict[str, Any]) -> D
         Dictionary mapping prompt_id to metadata about that game
     """
     game_prompts = {}
+    for entry in GameCatalog.from_prompts(prompts).games.values():
+        game_prompts[entry.prompt_id] = {
+            "game_id": entry.game_id,
+            "name": entry.name,
+            "description": entry.description,
+            "content": replace_user_templates(prompts[entry.prompt_id], user_data)  # Replace templates with user_data
+        }
     
-    # Pattern for detecting game prompt IDs (looking for *_GAME_PROMPT pattern)
-    game_pattern = re.compile(r'(.+)_GAME_PROMPT$')
+    return game_prompts
+
+def offered_games(user_context: Dict[str, Any], limit: Optional[int] = DEFAULT_OFFER_LIMIT) -> List[GameEntry]:
+    """
+    The games to offer a child: those suiting their age and proficiency, best first.
     
-    # Look for standard game prompts
-    for prompt_id, content in prompts.items():
-        match = game_pattern.match(prompt_id)
-        
-        if match:
-            game_id = match.group(1)  # Extract the game name part
-            
-            # Extract game name from prompt content (first line often has it)
-            name = game_id.replace("_", " ")  # Default name
-            description = f"Learn Spanish through a fun {game_id.lower()} adventure!"  # Default description
-            
-            # Try to extract better name/description from the prompt content
-            if "game is called" in content.lower():
-                # Look for a line like "This game is called 'Spanish Road Trip.'"
-                for line in content.split('\n'):
-                    if "game is called" in line.lower():
-                        # Extract the name within quotes if present
-                        name_match = re.search(r'"([^"]+)"', line)
-                        if name_match:
-                            name = name_match.group(1)
-                        else:
-                            # Try extracting text after "called" without quotes
-                            name_match = re.search(r'called\s+(.+?)[\.\s]', line)
-                            if name_match:
-                                name = name_match.group(1).strip('" ')
-            
-            # Store the metadata
-            game_prompts[prompt_id] = {
-                "game_id": game_id,
-                "name": name,
-                "description": description,
-                "content": replace_user_templates(content, user_data)  # Replace templates with user_data
-            }
-    
-    # Manually handle special cases for backward compatibility
-    if "CAR_GAME_PROMPT" in prompts and "CAR_GAME_PROMPT" not in game_prompts:
-        game_prompts["CAR_GAME_PROMPT"] = {
-            "game_id": "CarGame",
-            "name": "Spanish Road Trip",
-            "description": "Take a magical car journey and learn Spanish words for colors, animals, and objects!",
-            "content": replace_user_templates(prompts["CAR_GAME_PROMPT"], user_data)  # Replace templates with user_data
-        }
+    The catalog is indexed once per prompt version, so this is cheap to call.
     
-    if "ISLAND_GAME_PROMPT" in prompts and "ISLAND_GAME_PROMPT" not in game_prompts:
-        game_prompts["ISLAND_GAME_PROMPT"] = {
-            "game_id": "IslandGame",
-            "name": "Pirate Island Adventure",
-            "description": "Sail between islands as a pirate and discover Spanish treasure words!",
-            "content": replace_user_templates(prompts["ISLAND_GAME_PROMPT"], user_data)  # Replace templates with user_data
-        }
+    Args:
+        user_context: Dictionary containing user data (age and proficiency are used)
+        limit: Most games to offer
     
-    return game_prompts
+    Returns:
+        The catalog entries of the offered games
+    """
+    return get_catalog(get_prompt_cache()).select(user_context.get("age"), user_context.get("proficiency"), limit)
+
+def build_intent_router(available_agents: Dict[str, Dict]):
+    """
+    Get the compiled intent router for a set of game agents.
+    
+    Extra phrases for a game come from the optional `synonyms` list field of its
+    prompt document, so they can be changed in Firestore. Routers are shared
+    between sessions with the same games and synonyms.
+    
+    Args:
+        available_agents: The game agents as returned by initialize_agents
+    
+    Returns:
+        The IntentRouter
+    """
+    documents = get_prompt_cache().get_documents()
+    games = {}
+    for game_id, game_info in available_agents.items():
+        synonyms = documents.get(game_info["prompt_id"], {}).get("synonyms") or []
+        games[game_id] = {"name": game_info["name"], "synonyms": list(synonyms)}
+    return get_router(games)
 
 # Initialize agents and functions
-def initialize_agents(user_context):
+def initialize_agents(user_context, tools: Optional[SessionTools] = None,
+                      max_games: Optional[int] = DEFAULT_OFFER_LIMIT,
+                      current_user: Optional[Callable[[], Dict[str, Any]]] = None):
     """
     Initialize all agents with the provided user context.
     This allows reinitialization when user data changes.
     
     Args:
         user_context: Dictionary containing user data (id, name, age, etc.)
+        tools: The session's user tools (MyWorkflow passes its own); placeholder
+            tools that don't save anything are used when omitted
+        max_games: Most game agents to create and offer to the ChoiceLayer (None for all);
+            the games are picked by offered_games
+        current_user: Returns the user a game agent's instructions are rendered with when
+            it is built (defaults to user_context)
     
     Returns:
-        Tuple of (user_info_agent, choice_layer_agent, available_agents)
+        Tuple of (user_info_agent, choice_layer_agent, available_agents). Game agents are
+        LazyAgents, built on the first handoff to them.
     """
     log_debug(f"Initializing agents with user context: {user_context}")
     
     # Load all prompts from Firebase
-    all_prompts = get_all_prompts()
+    # (user templates are filled in by assemble_instructions, after the static content)
+    raw_prompts = get_all_prompts()
     
-    # Apply template substitutions to all prompts
-    for prompt_id in all_prompts:
-        all_prompts[prompt_id] = replace_user_templates(all_prompts[prompt_id], user_context)
-    
-    # Try to get the save_user_info tool from the MyWorkflow instance if available
-    try:
-        # Check if we're being called from a MyWorkflow instance
-        from inspect import currentframe
-        frame = currentframe()
-        while frame:
-            if 'self' in frame.f_locals and isinstance(frame.f_locals['self'], MyWorkflow):
-                # Use the instance methods if available
-                save_user_info_tool = frame.f_locals['self']._save_user_info
-                child_name_tool = frame.f_locals['self']._get_child_name
-                child_age_tool = frame.f_locals['self']._get_child_age
-                break
-            frame = frame.f_back
-        else:
-            # Fallback to placeholder functions if not available
-            save_user_info_tool = function_tool(placeholder_save_user_info)
-            child_name_tool = function_tool(placeholder_get_child_name)
-            child_age_tool = function_tool(placeholder_get_child_age)
-    except Exception as e:
-        log_debug(f"Error accessing instance methods: {e}. Using placeholder functions.")
-        # Safety fallback
-        save_user_info_tool = function_tool(placeholder_save_user_info)
-        child_name_tool = function_tool(placeholder_get_child_name)
-        child_age_tool = function_tool(placeholder_get_child_age)
+    if tools is None:
+        log_debug("No session tools given. Using placeholder functions.")
+        tools = PLACEHOLDER_TOOLS
+    if current_user is None:
+        current_user = lambda: user_context
     
     # Get the user info prompt from Firebase
-    user_info_prompt = all_prompts.get("USER_INFO_PROMPT", "")
+    user_info_prompt = raw_prompts.get("USER_INFO_PROMPT", "")
     if not user_info_prompt:
         log_debug("USER_INFO_PROMPT not found in Firebase. Cannot initialize user info agent.")
         return None, None, {}  # Return empty values if required prompt is missing
@@ -264,30 +384,33 @@ def initialize_agents(user_context):
     user_info_agent = Agent(
         name="UserInfoCollector",
         handoff_description="An assistant that collects the child's name and age.",
-        instructions=prompt_with_handoff_instructions(user_info_prompt),
+        instructions=assemble_instructions(user_info_prompt, user_context, agent_name="UserInfoCollector").text,
         model="gpt-4o",
-        tools=[save_user_info_tool, child_name_tool, child_age_tool]
+        tools=[tools.save_user_info, tools.get_child_name, tools.get_child_age]
     )
     
-    # Detect game prompts and extract metadata
-    game_prompts = detect_game_prompts(all_prompts, user_context)
+    # Only the games that suit this child, so the ChoiceLayer's instructions stay bounded
+    # however many games there are
+    games = offered_games(user_context, max_games)
     
-    # Create agents for each detected game
+    # Create agents for each offered game, in game ID order so that the ChoiceLayer's
+    # handoff tools don't depend on the ranking or the order Firestore streamed the prompts in
     available_agents = {}
     
-    for prompt_id, game_info in game_prompts.items():
-        game_id = game_info["game_id"]
-        name = game_info["name"]
-        description = game_info["description"]
-        content = game_info["content"]
+    for entry in sorted(games, key=lambda entry: entry.game_id):
+        prompt_id = entry.prompt_id
+        if prompt_id not in raw_prompts:
+            continue
+        game_id = entry.game_id
+        name = entry.name
+        description = entry.description
         
-        # Create the agent
-        game_agent = Agent(
+        # The agent itself is only built when the ChoiceLayer first hands off to it
+        game_agent = LazyAgent(
             name=game_id,
             handoff_description=f"A {name} Spanish learning adventure for children.",
-            instructions=prompt_with_handoff_instructions(content),
+            build=_game_agent_builder(game_id, name, raw_prompts[prompt_id], current_user, tools),
             model="gpt-4o",
-            tools=[track_vocabulary, child_name_tool, child_age_tool]
         )
         
         # Add to available agents
@@ -298,10 +421,10 @@ def initialize_agents(user_context):
             "prompt_id": prompt_id
         }
         
-        log_debug(f"Created agent for game: {game_id} ({name})")
+        log_debug(f"Offering game: {game_id} ({name})")
     
     # Access the choice layer prompt
-    choice_layer_prompt = all_prompts.get("CHOICE_LAYER_PROMPT", "")
+    choice_layer_prompt = raw_prompts.get("CHOICE_LAYER_PROMPT", "")
     if not choice_layer_prompt:
         log_debug("CHOICE_LAYER_PROMPT not found in Firebase. Cannot initialize choice layer agent.")
         return None, None, {}  # Return empty values if required prompt is missing
@@ -310,13 +433,12 @@ def initialize_agents(user_context):
     choice_layer_agent = Agent(
         name="ChoiceLayer",
         handoff_description="A Spanish language tutor that helps children choose learning activities.",
-        instructions=prompt_with_handoff_instructions(
-            choice_layer_prompt + "\n\nAVAILABLE_AGENTS: " + 
-            ", ".join([f"{key}: {value['name']} - {value['description']}" for key, value in available_agents.items()])
-        ),
+        instructions=assemble_instructions(choice_layer_prompt, user_context,
+                                           sections=[format_available_agents(available_agents)],
+                                           agent_name="ChoiceLayer").text,
         model="gpt-4o",
-        handoffs=[agent_info["agent"] for agent_info in available_agents.values()],
-        tools=[child_name_tool, child_age_tool, track_vocabulary]
+        handoffs=[agent_info["agent"].as_handoff() for agent_info in available_agents.values()],
+        tools=[tools.get_child_name, tools.get_child_age, *VOCABULARY_TOOLS]
     )
     
     # Add handoffs between agents
@@ -328,27 +450,221 @@ def initialize_agents(user_context):
     
     return user_info_agent, choice_layer_agent, available_agents
 
-class LanguageTutorContext:
-    """Context for tracking state in the language tutor workflow."""
-    def __init__(self):
-        self.child_age: Optional[int] = None
-        self.child_name: Optional[str] = None
-        self.learned_words: Dict[str, str] = {}  # Spanish word -> English translation
-        self.current_game: Optional[str] = None
-        self.engagement_score: int = 3  # Start with neutral engagement
+def _game_agent_builder(game_id: str, name: str, prompt: str, current_user: Callable[[], Dict[str, Any]],
+                        tools: SessionTools) -> Callable[[], Agent]:
+    """The build function of a game's LazyAgent; renders the prompt for the user at build time."""
+    def build() -> Agent:
+        log_debug(f"Building agent for game: {game_id} ({name})")
+        return Agent(
+            name=game_id,
+            handoff_description=f"A {name} Spanish learning adventure for children.",
+            instructions=assemble_instructions(prompt, current_user(), agent_name=game_id).text,
+            model="gpt-4o",
+            tools=[*VOCABULARY_TOOLS, tools.get_child_name, tools.get_child_age]
+        )
+    return build
+
+def replacement_pairs(old, new) -> List[tuple]:
+    """
+    The (old, new) pairs to rewire when an agent is replaced.
+    
+    A replaced LazyAgent also replaces its handoff and, if it was built, its agent.
+    """
+    if old is new:
+        return []
+    pairs = [(old, new)]
+    if isinstance(old, LazyAgent):
+        pairs.append((old.as_handoff(), new.as_handoff()))
+        if old.peek() is not None and new.peek() is not None:
+            pairs.append((old.peek(), new.peek()))
+    return pairs
+
+def rebuild_changed_agents(user_info_agent, choice_layer_agent, available_agents, previous_user, user_context,
+                           rewire: bool = True):
+    """
+    Rebuild only the agents whose rendered instructions depend on changed user fields.
+    
+    Prompts are re-rendered only if their templates reference a field that differs
+    between previous_user and user_context, and an agent is only recreated if its
+    instructions actually changed. Game agents that haven't been built yet are left
+    alone, since they render the current user when they are built. Handoff
+    references between the agents are updated to point at the rebuilt agents.
+    
+    Args:
+        user_info_agent: The current UserInfoCollector agent
+        choice_layer_agent: The current ChoiceLayer agent
+        available_agents: The current game agents as returned by initialize_agents
+        previous_user: User context the agents were last built with
+        user_context: The updated user context
+        rewire: Update the handoff lists right away; pass False to leave the current
+            agents untouched (e.g. when the result may be thrown away) and call
+            rewire_handoffs when installing it
+    
+    Returns:
+        Tuple of (user_info_agent, choice_layer_agent, available_agents, rebuilt_count)
+    """
+    changed_fields = {key for key in set(previous_user) | set(user_context)
+                      if previous_user.get(key) != user_context.get(key)}
+    if not changed_fields:
+        return user_info_agent, choice_layer_agent, available_agents, 0
+    
+    all_prompts = get_all_prompts()
+    replaced = {}  # id(old agent) -> rebuilt agent (agents are unhashable dataclasses)
+    rebuilt_count = 0
+    
+    def rebuild(agent, prompt_id, sections=()):
+        raw_prompt = all_prompts.get(prompt_id, "")
+        if not changed_fields.intersection(template_fields(raw_prompt)):
+            return agent
+        instructions = assemble_instructions(raw_prompt, user_context, sections, agent_name=agent.name).text
+        if instructions == agent.instructions:
+            return agent
+        nonlocal rebuilt_count
+        rebuilt_agent = agent.clone(instructions=instructions, handoffs=list(agent.handoffs))
+        replaced[id(agent)] = rebuilt_agent
+        rebuilt_count += 1
+        log_debug(f"Rebuilt agent {agent.name} for changed fields {sorted(changed_fields)}")
+        return rebuilt_agent
+    
+    user_info_agent = rebuild(user_info_agent, "USER_INFO_PROMPT")
+    
+    new_available_agents = {}
+    for game_id, agent_info in available_agents.items():
+        lazy = agent_info["agent"]
+        agent = lazy.peek()
+        if agent is not None:
+            rebuilt_agent = rebuild(agent, agent_info["prompt_id"])
+            if rebuilt_agent is not agent:
+                rebuilt_lazy = lazy.rebuilt(rebuilt_agent)
+                for old, new in replacement_pairs(lazy, rebuilt_lazy):
+                    replaced[id(old)] = new
+                lazy = rebuilt_lazy
+        new_available_agents[game_id] = dict(agent_info, agent=lazy)
+    
+    # The AVAILABLE_AGENTS list doesn't depend on the user, so it is reused as-is
+    choice_layer_agent = rebuild(choice_layer_agent, "CHOICE_LAYER_PROMPT", [format_available_agents(available_agents)])
+    
+    # Point every handoff list at the rebuilt agents
+    if replaced and rewire:
+        rewire_handoffs(user_info_agent, choice_layer_agent, new_available_agents, replaced)
+    
+    return user_info_agent, choice_layer_agent, new_available_agents, rebuilt_count
+
+def rewire_handoffs(user_info_agent, choice_layer_agent, available_agents, replaced) -> None:
+    """
+    Point the agents' handoff lists at rebuilt agents.
+    
+    Args:
+        user_info_agent: The UserInfoCollector agent
+        choice_layer_agent: The ChoiceLayer agent
+        available_agents: The game agents as returned by initialize_agents
+        replaced: id(old agent) -> rebuilt agent (see replacement_pairs)
+    """
+    for agent in [user_info_agent, choice_layer_agent] + [info["agent"] for info in available_agents.values()]:
+        agent.handoffs[:] = [replaced.get(id(handoff), handoff) for handoff in agent.handoffs]
+
+ERROR_MESSAGE = "I'm sorry, I had a problem understanding. Could you try again?"
+
+def missing_info_message(lead: str, name_missing: bool, age_missing: bool) -> str:
+    """The request for whichever of the name and age is still missing."""
+    if name_missing and age_missing:
+        return lead + "Could you tell me your name and how old you are?"
+    if name_missing:
+        return lead + "Could you tell me your name?"
+    return lead + "Could you tell me how old you are?"
+
+def switch_message(game_name: str) -> str:
+    return f"Switching to {game_name}! Get ready for a fun adventure!"
+
+def game_menu(available_agents: Dict[str, Dict]) -> str:
+    """The game names as a spoken list ("A, B or C")."""
+    names = [game_info["name"] for _, game_info in sorted(available_agents.items())]
+    if len(names) <= 1:
+        return "".join(names)
+    return f"{', '.join(names[:-1])} or {names[-1]}"
+
+def go_back_message(available_agents: Dict[str, Dict]) -> str:
+    return f"Okay! Let's pick another game. We can play {game_menu(available_agents)}. Which one would you like?"
+
+def canned_utterances(available_agents: Dict[str, Dict], chunking: bool = True,
+                      chunk_options: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    The fixed replies the workflow speaks without a model, as they reach TTS.
+    
+    With chunking each reply is split the way MyWorkflow.run splits it, so the
+    fixed parts of nearly fixed replies (like the returning user's greeting,
+    which starts with their name) are cacheable too.
+    
+    Args:
+        available_agents: The game agents (game_id -> info with a "name")
+        chunking: Whether the workflow runs with tts_chunking
+        chunk_options: The workflow's TextChunker options
+    
+    Returns:
+        The utterances, without duplicates
+    """
+    replies = [GREETING_NEW_USER, ERROR_MESSAGE, go_back_message(available_agents)]
+    for lead in (MISSING_INFO_LEAD, HANDOFF_MISSING_INFO_LEAD):
+        for name_missing, age_missing in ((True, True), (True, False), (False, True)):
+            replies.append(missing_info_message(lead, name_missing, age_missing))
+    replies.extend(switch_message(game_info["name"]) for game_info in available_agents.values())
+    if chunking:
+        replies = [segment for reply in replies for segment in TextChunker(**(chunk_options or {})).split(reply)]
+        # Every sentence of the returning user's greeting but the one with their name
+        replies.extend(segment for segment in TextChunker(**(chunk_options or {})).split(GREETING_RETURNING_USER)
+                       if "{name}" not in segment)
+    return list(dict.fromkeys(reply.strip() for reply in replies if reply.strip()))
 
 class MyWorkflow(VoiceWorkflowBase):
-    def __init__(self, on_start: Callable[[str], None], user_id: str = 'ID1'):
+    def __init__(self, on_start: Callable[[str], None], user_id: str = 'ID1',
+                 run_config: Optional[RunConfig] = None, user_data: Optional[Dict[str, Any]] = None,
+                 history_token_budget: int = 3000, summarize_history: bool = False,
+                 speculative_prewarm: bool = True, prewarm_connection: bool = False, model_client=None,
+                 tts_chunking: bool = True, chunk_options: Optional[Dict[str, Any]] = None,
+                 audio_cache=None, max_offered_games: Optional[int] = DEFAULT_OFFER_LIMIT):
         """
         Initialize the Spanish language tutor workflow.
         
+        From async code prefer `await MyWorkflow.create(...)`, which loads the
+        user without blocking the event loop.
+        
         Args:
             on_start: A callback function that is called when the workflow starts processing a transcription.
             user_id: The ID of the user to load from Firebase (default is 'ID1' for testing)
+            run_config: Optional run configuration for the agent runs (e.g. a custom model provider)
+            user_data: The user's Firebase data if already loaded; read synchronously when omitted
+            history_token_budget: Maximum estimated tokens of conversation history sent per turn
+            summarize_history: Fold turns evicted from the history into a short summary item
+            speculative_prewarm: Prepare the agent a turn hands off to while the response is still streaming
+            prewarm_connection: Also pre-open the model connection for that agent (needs run_config)
+            model_client: The AsyncOpenAI client run_config's OpenAIProvider was built with; the
+                connection is pre-opened in its pool
+            tts_chunking: Yield clause- and sentence-sized segments instead of raw text deltas
+                (pair with text_chunker.segment_tts_settings() in the pipeline config)
+            chunk_options: TextChunker options (min_chars, max_chars, min_clause_chars)
+            audio_cache: audio_cache.AudioCache to register the fixed replies with, so the
+                pipeline's CachedTTSModel keeps their audio
+            max_offered_games: Most games offered to the child (the best suited to their age
+                and proficiency); None offers every game
         """
-        self._input_history: list[TResponseInputItem] = []
+        self._history = ConversationHistory(history_token_budget, summarize=summarize_history)
+        self.last_prompt_tokens = 0
+        self._run_config = run_config
+        self.speculative_prewarm = speculative_prewarm
+        self.tts_chunking = tts_chunking
+        self.chunk_options = dict(chunk_options or {})
+        self.prewarm_connection = prewarm_connection
+        self.model_client = model_client
+        self.audio_cache = audio_cache
+        self.max_offered_games = max_offered_games
+        self._speculation: Optional[Dict[str, Any]] = None
+        # Set while a model call is in flight, so speculative work overlaps the wait for the model
+        # instead of competing with the SDK's own handoff processing
+        self._model_waiting = asyncio.Event()
+        self.handoff_prewarms: List[HandoffPrewarm] = []
+        self.last_refresh_reused = False
         self._on_start = on_start
-        self._context = LanguageTutorContext()
+        self._context = LanguageTutorContext(user_id)
         
         # Create user context dictionary
         self.current_user = DEFAULT_USER_TEMPLATE.copy()
@@ -356,7 +672,8 @@ class MyWorkflow(VoiceWorkflowBase):
         
         # Load user data from Firebase first
         try:
-            user_data = get_user_from_firestore(user_id)
+            if user_data is None:
+                user_data = get_user_from_firestore(user_id)
             
             # Update current user context with any data we have
             if user_data:
@@ -370,7 +687,7 @@ class MyWorkflow(VoiceWorkflowBase):
         # Define function tools that need access to the instance
         # These need to be defined here to access self.current_user
         @function_tool
-        def save_user_info(name: str, age: int) -> str:
+        async def save_user_info(name: str, age: int) -> str:
             """
             Save the user's basic information to Firebase.
             
@@ -380,28 +697,11 @@ class MyWorkflow(VoiceWorkflowBase):
             """
             log_debug(f"Saving user info: name={name}, age={age}")
             
-            # Update current user context
-            self.current_user['name'] = name
-            self.current_user['age'] = age
-            
-            # Update the context as well
-            self._context.child_name = name
-            self._context.child_age = age
-            
-            # Save to Firebase
+            # Update the user context and queue the write to Firebase; the write-behind
+            # queue commits it in the background
             try:
-                success = add_user_to_firestore(
-                    user_id=self.current_user['id'],
-                    name=name,
-                    age=age,
-                    language=self.current_user['language'] or "Spanish",  # Default to Spanish
-                    proficiency=self.current_user['proficiency'] or "Beginner"  # Default to Beginner
-                )
-                
-                if success:
-                    return f"Successfully saved {name}'s information!"
-                else:
-                    return "There was an issue saving your information. I'll continue without saving."
+                self._store_user_info(name=name, age=age)
+                return f"Successfully saved {name}'s information!"
             except Exception as e:
                 log_debug(f"Error saving user info: {e}")
                 return "I'll remember your information for now, but I couldn't save it permanently."
@@ -418,45 +718,330 @@ class MyWorkflow(VoiceWorkflowBase):
             # Return from current user context if available, otherwise None
             return self.current_user['name']
         
-        # Store these function tools for later use
-        self._save_user_info = save_user_info
-        self._get_child_age = get_child_age
-        self._get_child_name = get_child_name
+        # Every agent this session builds gets these tools
+        self._tools = SessionTools(save_user_info=save_user_info, get_child_name=get_child_name,
+                                   get_child_age=get_child_age)
         
         # Initialize all agents with the current user context
         log_debug("Initializing agents...")
         self._user_info_agent, self._choice_layer_agent, self._available_agents = initialize_agents(
-            self.current_user)
+            self.current_user, self._tools, self.max_offered_games, self._user_snapshot)
         
         # Check if initialization was successful
         if self._user_info_agent is None or self._choice_layer_agent is None:
             log_debug("Failed to initialize agents due to missing prompts.")
             raise ValueError("Required prompts not found in Firebase. Cannot initialize workflow.")
         
+        # Game switches, "go back" and name/age answers are routed locally when unambiguous
+        self._router = build_intent_router(self._available_agents)
+        self.last_route: Optional[RouteDecision] = None
+        
+        # Handoff tool names, to spot a handoff in the stream before the run finishes
+        self._handoff_tools = handoff_tool_names(self._all_agents())
+        self._register_canned_utterances()
+        
+        # Remember what the agents were built from so later refreshes can be incremental
+        self._agents_user_snapshot = dict(self.current_user)
+        self._agents_prompt_version = get_prompt_cache().version
+        self.last_rebuild_count = 0
+        
         # Determine which agent to start with based on available user info
         if self.current_user['name'] is None or self.current_user['age'] is None:
             log_debug("Missing user info, starting with UserInfoCollector")
             self._current_agent = self._user_info_agent
-            greeting = "¡Hola! I'm Amigo, your Spanish language friend! Before we start, could you tell me your name and how old you are?"
+            greeting = GREETING_NEW_USER
         else:
             log_debug(f"User info complete, starting with ChoiceLayer")
             self._current_agent = self._choice_layer_agent
             name = self.current_user['name']
-            greeting = f"¡Hola {name}! I'm Amigo, your Spanish language friend! I'm here to help you learn some fun Spanish words. What would you like to play today?"
+            greeting = GREETING_RETURNING_USER.format(name=name)
         
-        # Initialize with a welcome message in the history
-        self._input_history.append({
+        # Initialize with a welcome message in the history; on_start speaks it
+        self.greeting = greeting
+        self._history.append({
             "role": "assistant",
             "content": greeting
         })
     
-    def _trim_conversation_history(self, max_items=10):
-        """Trim conversation history to prevent it from growing too large"""
-        if len(self._input_history) > max_items * 2:
-            # Keep first assistant message and last max_items*2-1 messages
-            self._input_history = [self._input_history[0]] + self._input_history[-(max_items*2-1):]
-            log_debug(f"Trimmed conversation history to {len(self._input_history)} items")
-
+    async def close(self) -> None:
+        """Flush writes queued by this session's tools; call when the session ends."""
+        written = await get_write_queue().flush_async()
+        if written:
+            log_debug(f"Flushed {written} queued writes at session end")
+    
+    @classmethod
+    async def create(cls, on_start: Callable[[str], None], user_id: str = 'ID1',
+                     run_config: Optional[RunConfig] = None, **options) -> "MyWorkflow":
+        """
+        Create a workflow from async code without blocking the event loop on Firestore.
+        
+        Args:
+            on_start: A callback function that is called when the workflow starts processing a transcription.
+            user_id: The ID of the user to load from Firebase
+            run_config: Optional run configuration for the agent runs
+            **options: Any other MyWorkflow arguments
+        
+        Returns:
+            The initialized workflow
+        """
+        user_data = await get_user_async(user_id)
+        return cls(on_start, user_id=user_id, run_config=run_config, user_data=user_data, **options)
+    
+    def _prepare_refresh(self) -> Dict[str, Any]:
+        """
+        Compute the agents _refresh_agents would install, without touching the current ones.
+        
+        Safe to run in a worker thread while a response is streaming; the result
+        records what it was computed from so it can be checked before installing.
+        
+        Returns:
+            The prepared agents and the state they were built from
+        """
+        started = time.perf_counter()
+        prompt_version = get_prompt_cache().version
+        user_snapshot = dict(self.current_user)
+        base = (self._user_info_agent, self._choice_layer_agent, self._available_agents)
+        full = prompt_version != self._agents_prompt_version
+        if full:
+            log_debug("Prompts changed since the agents were built, reinitializing all agents")
+        elif (sorted(entry.game_id for entry in offered_games(user_snapshot, self.max_offered_games))
+              != sorted(self._available_agents)):
+            # A new age or proficiency changes which games suit the child
+            log_debug("Offered games changed with the user's details, reinitializing all agents")
+            full = True
+        if full:
+            user_info_agent, choice_layer_agent, available_agents = initialize_agents(
+                user_snapshot, self._tools, self.max_offered_games, self._user_snapshot)
+            rebuilt = 2 + len(available_agents)
+        else:
+            user_info_agent, choice_layer_agent, available_agents, rebuilt = rebuild_changed_agents(
+                *base, self._agents_user_snapshot, user_snapshot, rewire=False)
+        
+        return {
+            "prompt_version": prompt_version,
+            "user": user_snapshot,
+            "base": base,
+            "full": full,
+            "agents": (user_info_agent, choice_layer_agent, available_agents),
+            "rebuilt": rebuilt,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
+    
+    def _is_current(self, prepared: Dict[str, Any]) -> bool:
+        """Whether prepared agents were built from exactly the current agents, user and prompts."""
+        user_info_agent, choice_layer_agent, available_agents = prepared["base"]
+        return (prepared["user"] == self.current_user
+                and prepared["prompt_version"] == get_prompt_cache().version
+                and user_info_agent is self._user_info_agent
+                and choice_layer_agent is self._choice_layer_agent
+                and available_agents is self._available_agents)
+    
+    def _refresh_agents(self, prepared: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Bring the agents up to date with the current user context.
+        
+        Only agents whose instructions depend on changed user fields are rebuilt,
+        unless the prompts themselves changed, in which case everything is rebuilt.
+        
+        Args:
+            prepared: Result of a speculative _prepare_refresh; installed as-is if it
+                is still current, otherwise the agents are prepared again
+        
+        Returns:
+            The number of agents that were rebuilt
+        """
+        self.last_refresh_reused = prepared is not None and self._is_current(prepared)
+        if not self.last_refresh_reused:
+            prepared = self._prepare_refresh()
+        
+        user_info_agent, choice_layer_agent, available_agents = prepared["agents"]
+        if prepared["full"]:
+            if user_info_agent is None or choice_layer_agent is None:
+                log_debug("Reinitialization failed, keeping the existing agents")
+                return 0
+            self._router = build_intent_router(available_agents)
+        else:
+            old_user_info_agent, old_choice_layer_agent, old_available_agents = prepared["base"]
+            pairs = [(old_user_info_agent, user_info_agent), (old_choice_layer_agent, choice_layer_agent)]
+            for game_id in available_agents:
+                pairs += replacement_pairs(old_available_agents[game_id]["agent"], available_agents[game_id]["agent"])
+            replaced = {id(old): new for old, new in pairs if old is not new}
+            if replaced:
+                rewire_handoffs(user_info_agent, choice_layer_agent, available_agents, replaced)
+        
+        self._user_info_agent, self._choice_layer_agent, self._available_agents = (
+            user_info_agent, choice_layer_agent, available_agents)
+        self._handoff_tools = handoff_tool_names(self._all_agents())
+        if prepared["full"]:
+            # The games may have changed, and with them the switch messages and the menu
+            self._register_canned_utterances()
+        self._agents_user_snapshot = prepared["user"]
+        self._agents_prompt_version = prepared["prompt_version"]
+        rebuilt = prepared["rebuilt"]
+        self.last_rebuild_count = rebuilt
+        log_debug(f"Rebuilt {rebuilt} of {2 + len(self._available_agents)} agents"
+                  + (" (prepared while streaming)" if self.last_refresh_reused else ""))
+        return rebuilt
+    
+    def canned_utterances(self) -> List[str]:
+        """The fixed replies of this session, as they reach TTS."""
+        return canned_utterances(self._available_agents, self.tts_chunking, self.chunk_options)
+    
+    def _register_canned_utterances(self) -> None:
+        if self.audio_cache is not None:
+            self.audio_cache.register(self.canned_utterances())
+    
+    def _all_agents(self) -> List[Agent]:
+        # Game agents are LazyAgents, which have the name, model and handoffs of the agent
+        return [self._user_info_agent, self._choice_layer_agent] + [
+            game_info["agent"] for game_info in self._available_agents.values()]
+    
+    def _user_snapshot(self) -> Dict[str, Any]:
+        return dict(self.current_user)
+    
+    def _speculate(self, agent_name: Optional[str], source: str) -> None:
+        """
+        Start preparing for a predicted handoff in the background.
+        
+        Args:
+            agent_name: The agent the turn is expected to hand off to
+            source: What the prediction came from ("stream" or "router")
+        """
+        if not self.speculative_prewarm or agent_name is None or agent_name == self._current_agent.name:
+            return
+        if self._speculation is not None:
+            if self._speculation["prewarm"].predicted == agent_name:
+                return
+            # The stream knows better than the router
+            self._speculation["task"].cancel()
+        
+        log_debug(f"Predicted handoff to {agent_name} ({source}), preparing it")
+        prewarm = HandoffPrewarm(predicted=agent_name, source=source)
+        self._speculation = {"prewarm": prewarm, "task": asyncio.ensure_future(self._prepare_handoff(prewarm))}
+    
+    async def _prepare_handoff(self, prewarm: HandoffPrewarm) -> Optional[Dict[str, Any]]:
+        await self._model_waiting.wait()
+        prepared = None
+        # The end of the turn only refreshes the agents on the way to the ChoiceLayer
+        if prewarm.predicted == self._choice_layer_agent.name:
+            prepared = await asyncio.to_thread(self._prepare_refresh)
+            prewarm.prepared_ms = prepared["elapsed_ms"]
+        game = next((game_info["agent"] for game_info in self._available_agents.values()
+                     if game_info["agent"].name == prewarm.predicted), None)
+        if game is not None and not game.built:
+            # Build the game agent now rather than when the SDK runs the handoff
+            await asyncio.to_thread(game.get)
+            prewarm.prepared_ms = game.build_ms
+        if self.prewarm_connection:
+            target = next((agent for agent in self._all_agents() if agent.name == prewarm.predicted), None)
+            if target is not None:
+                prewarm.connection_ms = await prewarm_model_connection(self._run_config, target.model,
+                                                                       self.model_client)
+        return prepared
+    
+    def _discard_speculation(self) -> None:
+        if self._speculation is not None:
+            self._speculation["task"].cancel()
+            self._speculation = None
+    
+    async def _collect_speculation(self):
+        """
+        Take the current speculation, waiting for it if it is still preparing.
+        
+        Returns:
+            Tuple of (HandoffPrewarm or None, prepared refresh or None)
+        """
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return None, None
+        # Whatever hasn't started yet runs now
+        self._model_waiting.set()
+        try:
+            prepared = await speculation["task"]
+        except Exception as e:
+            log_debug(f"Error preparing the predicted agent: {e}")
+            prepared = None
+        return speculation["prewarm"], prepared
+    
+    def handoff_stats(self) -> Dict[str, float]:
+        """How often handoffs were predicted and how much preparation time that took off the critical path."""
+        return summarize_prewarms(self.handoff_prewarms)
+    
+    def _store_user_info(self, name: Optional[str] = None, age: Optional[int] = None) -> None:
+        """Update the user in memory and queue the write to Firebase."""
+        fields = {}
+        if name is not None:
+            self.current_user['name'] = name
+            self._context.child_name = name
+            fields['name'] = name
+        if age is not None:
+            self.current_user['age'] = age
+            self._context.child_age = age
+            fields['age'] = age
+        
+        queue_user_update(
+            self.current_user['id'],
+            **fields,
+            language=self.current_user['language'] or "Spanish",  # Default to Spanish
+            proficiency=self.current_user['proficiency'] or "Beginner"  # Default to Beginner
+        )
+    
+    def _handle_locally(self, decision: RouteDecision) -> Optional[str]:
+        """
+        Act on a confident routing decision without running an agent.
+        
+        Args:
+            decision: The intent router's decision for this transcription
+        
+        Returns:
+            The reply to speak, or None if the decision can't be handled locally
+        """
+        if decision.intent == INTENT_SWITCH_GAME and decision.game_id in self._available_agents:
+            game_info = self._available_agents[decision.game_id]
+            log_debug(f"Detected direct request for {decision.game_id}")
+            self._current_agent = game_info["agent"].get()
+            self._context.current_game = decision.game_id
+            return switch_message(game_info['name'])
+        
+        if decision.intent == INTENT_GO_BACK:
+            log_debug("Detected request to leave the game")
+            self._current_agent = self._choice_layer_agent
+            self._context.current_game = None
+            return go_back_message(self._available_agents)
+        
+        if decision.intent == INTENT_USER_INFO:
+            try:
+                self._store_user_info(**decision.fields)
+            except Exception as e:
+                log_debug(f"Error saving user info: {e}")
+            name, age = self.current_user['name'], self.current_user['age']
+            if age is None:
+                return f"Nice to meet you, {name}! How old are you?"
+            if name is None:
+                return f"{age} years old, wow! And what's your name?"
+            
+            # Same as the UserInfoCollector handing off to the ChoiceLayer
+            log_debug("User info complete, moving to the ChoiceLayer")
+            self._refresh_agents()
+            self._current_agent = self._choice_layer_agent
+            self._context.current_game = None
+            return f"Nice to meet you, {name}! What would you like to play today? We can play {game_menu(self._available_agents)}!"
+        
+        return None
+    
+    async def on_start(self) -> AsyncIterator[str]:
+        """
+        Speak the greeting before the child says anything (multi-turn pipelines only).
+        
+        Yields:
+            The greeting; with tts_chunking, one clause or sentence at a time
+        """
+        if not self.tts_chunking:
+            yield self.greeting
+            return
+        for segment in TextChunker(**self.chunk_options).split(self.greeting):
+            yield segment
+    
     async def run(self, transcription: str) -> AsyncIterator[str]:
         """
         Process a transcription from the child and generate a response.
@@ -465,28 +1050,63 @@ class MyWorkflow(VoiceWorkflowBase):
             transcription: The child's spoken input as text.
             
         Yields:
-            Chunks of the assistant's response as they are generated.
+            Chunks of the assistant's response as they are generated; with tts_chunking,
+            each chunk is a complete clause or sentence, yielded as soon as it is complete.
         """
+        if not self.tts_chunking:
+            async for chunk in self._respond(transcription):
+                yield chunk
+            return
+        
+        # Canned replies go through the chunker too, so TTS starts on their first sentence
+        chunker = TextChunker(**self.chunk_options)
+        async for text in self._respond(transcription):
+            for segment in chunker.feed(text):
+                yield segment
+        for segment in chunker.flush():
+            yield segment
+    
+    async def _respond(self, transcription: str) -> AsyncIterator[str]:
+        """Generate the response to a transcription as raw text chunks."""
         # Call the on_start callback
         self._on_start(transcription)
         
+        # A turn cut short (e.g. by an interruption) may have left a speculation behind
+        self._discard_speculation()
+        
         # Log the transcription for debugging
         log_debug(f"Received transcription: {transcription}")
         
-        # Add the transcription to the input history
-        self._input_history.append({
+        # Add the transcription to the input history (oldest turns are evicted beyond the token budget)
+        self._history.append({
             "role": "user",
             "content": transcription,
         })
         
-        # Trim history if it's getting too long
-        self._trim_conversation_history()
+        # Set when the turn is answered without running an agent
+        handled_locally = False
         
-        # Initialize game_switch_detected to False by default
-        game_switch_detected = False
+        # Route the transcription locally first; a confident decision skips the model call
+        missing_fields = [field for field in ("name", "age") if self.current_user[field] is None]
+        decision = self._router.route(transcription, self._context.current_game, missing_fields)
+        self.last_route = decision
+        local_reply = None
+        if decision.confident:
+            log_debug(f"Routed locally: {decision.intent} ({decision.confidence:.2f})")
+            local_reply = self._handle_locally(decision)
         
-        # First check if we need to enforce user info collection
-        if self.current_user['name'] is None or self.current_user['age'] is None:
+        if local_reply is not None:
+            yield local_reply
+            
+            self._history.append({
+                "role": "assistant",
+                "content": local_reply
+            })
+            
+            handled_locally = True
+        
+        # Otherwise check if we need to enforce user info collection
+        elif missing_fields:
             log_debug("Missing user info detected. Ensuring UserInfoCollector is active.")
             
             # Ensure we're using the UserInfoCollector agent
@@ -494,69 +1114,62 @@ class MyWorkflow(VoiceWorkflowBase):
                 self._current_agent = self._user_info_agent
                 
                 # Append a message explaining why we need this information
-                missing_info_message = "Before we can play a game, I need to know a bit more about you. "
-                if self.current_user['name'] is None and self.current_user['age'] is None:
-                    missing_info_message += "Could you tell me your name and how old you are?"
-                elif self.current_user['name'] is None:
-                    missing_info_message += "Could you tell me your name?"
-                else:
-                    missing_info_message += "Could you tell me how old you are?"
+                missing_message = missing_info_message(MISSING_INFO_LEAD, self.current_user['name'] is None,
+                                                       self.current_user['age'] is None)
                 
-                yield missing_info_message
+                yield missing_message
                 
-                self._input_history.append({
+                self._history.append({
                     "role": "assistant",
-                    "content": missing_info_message
+                    "content": missing_message
                 })
                 
-                # Set flag to skip game switching
-                game_switch_detected = True
-        else:
-            # Handle simple game switching keywords for easier testing
-            lowercase_input = transcription.lower()
-            
-            # Check for direct game selection commands (for testing/debugging)
-            # Dynamically check all available games
-            
-            for game_id, game_info in self._available_agents.items():
-                game_name = game_info["name"].lower()
-                
-                # Check for common patterns to switch to this game
-                if (f"play {game_id.lower()}" in lowercase_input or 
-                    f"play {game_name}" in lowercase_input or
-                    game_name in lowercase_input):
-                    
-                    log_debug(f"Detected direct request for {game_id}")
-                    self._current_agent = game_info["agent"]
-                    self._context.current_game = game_id
-                    
-                    switch_message = f"Switching to {game_info['name']}! Get ready for a fun adventure!"
-                    yield switch_message
-                    
-                    self._input_history.append({
-                        "role": "assistant", 
-                        "content": switch_message
-                    })
-                    
-                    game_switch_detected = True
-                    break
+                # Skip the agent run
+                handled_locally = True
         
-        # Only proceed with normal processing if no game switch was detected
-        if not game_switch_detected:
+        # Only run the agent if the turn wasn't handled locally
+        if not handled_locally:
             try:
                 # Run the current agent with the input history
                 log_debug(f"Running agent: {self._current_agent.name}")
-                result = Runner.run_streamed(self._current_agent, self._input_history)
+                self.last_prompt_tokens = self._history.total_tokens
+                log_debug(f"Prompt history: {len(self._history)} items, ~{self.last_prompt_tokens} tokens")
+                run_input = self._history.as_input()
+                result = Runner.run_streamed(self._current_agent, run_input,
+                                            context=self._context, run_config=self._run_config)
                 
-                # Stream the response chunks back
-                async for chunk in VoiceWorkflowHelper.stream_text_from(result):
-                    yield chunk
+                # A game the router wasn't sure about is the likely handoff target
+                if decision.intent == INTENT_SWITCH_GAME and decision.game_id in self._available_agents:
+                    self._speculate(self._available_agents[decision.game_id]["agent"].name, "router")
+                
+                # Stream the response chunks back, watching for handoff tool calls on the way
+                self._model_waiting.clear()
+                async for event in result.stream_events():
+                    if event.type == "agent_updated_stream_event":
+                        # An agent is starting its model call
+                        self._model_waiting.set()
+                    elif event.type == "raw_response_event":
+                        if event.data.type == "response.output_text.delta":
+                            yield event.data.delta
+                        elif event.data.type == "response.output_item.added" and \
+                                getattr(event.data.item, "type", None) == "function_call":
+                            self._speculate(self._handoff_tools.get(event.data.item.name), "stream")
+                    elif event.type == "run_item_stream_event" and event.name == "handoff_requested":
+                        # The SDK now runs the handoff; wait for the next agent's model call
+                        self._model_waiting.clear()
+                        self._speculate(self._handoff_tools.get(getattr(event.item.raw_item, "name", None)), "stream")
                     
-                # Update the conversation history with the result
-                self._input_history = result.to_input_list()
+                # Append only what this run added instead of replacing the whole history; the SDK's
+                # conversion drops approval items and normalizes outputs, so it stays valid input
+                self._history.extend(result.to_input_list()[len(run_input):])
+                
+                # Pick up whatever was prepared for the predicted handoff
+                prewarm, prepared = await self._collect_speculation()
                 
                 # Check if there was a handoff to a different agent
                 if result.last_agent != self._current_agent:
+                    handoff_started = time.perf_counter()
+                    self.last_refresh_reused = False
                     log_debug(f"Agent handoff: {self._current_agent.name} -> {result.last_agent.name}")
                     
                     # Check if we need to force a handoff to UserInfoCollector due to missing information
@@ -566,21 +1179,17 @@ class MyWorkflow(VoiceWorkflowBase):
                         self._current_agent = self._user_info_agent
                         
                         # Append a message explaining the handoff to the user
-                        missing_info_message = "I need to know a bit more about you before we continue. "
-                        if self.current_user['name'] is None and self.current_user['age'] is None:
-                            missing_info_message += "Could you tell me your name and how old you are?"
-                        elif self.current_user['name'] is None:
-                            missing_info_message += "Could you tell me your name?"
-                        else:
-                            missing_info_message += "Could you tell me how old you are?"
+                        missing_message = missing_info_message(HANDOFF_MISSING_INFO_LEAD,
+                                                               self.current_user['name'] is None,
+                                                               self.current_user['age'] is None)
                         
-                        self._input_history.append({
+                        self._history.append({
                             "role": "assistant",
-                            "content": missing_info_message
+                            "content": missing_message
                         })
                         
                         # Yield the message so the user sees it
-                        yield missing_info_message
+                        yield missing_message
                     else:
                         # Update the current agent with the handoff target
                         self._current_agent = result.last_agent
@@ -588,23 +1197,21 @@ class MyWorkflow(VoiceWorkflowBase):
                     # If we've switched from UserInfoCollector to ChoiceLayer,
                     # potentially reinitialize agents with updated user info
                     if self._current_agent == self._choice_layer_agent and self.current_user['name'] is not None:
-                        log_debug("Reinitializing agents with updated user info")
+                        log_debug("Refreshing agents with updated user info")
                         old_choice_layer = self._choice_layer_agent
                         
-                        # Reinitialize agents
-                        self._user_info_agent, self._choice_layer_agent, self._available_agents = initialize_agents(
-                            self.current_user)
+                        # Rebuild only the agents affected by the changed user fields
+                        # (already done if the handoff was predicted and nothing changed since)
+                        self._refresh_agents(prepared)
                         
                         # Update current_agent reference if it was pointing to the choice layer
-                        if self._current_agent == old_choice_layer:
+                        # (result.last_agent is read-only and isn't used after this point)
+                        if self._current_agent is old_choice_layer:
                             self._current_agent = self._choice_layer_agent
-                            # Also update result.last_agent if needed
-                            if hasattr(result, 'last_agent') and result.last_agent == old_choice_layer:
-                                result.last_agent = self._choice_layer_agent
                     
                     # Update the current game in the context
                     for game_id, game_info in self._available_agents.items():
-                        if game_info["agent"] == self._current_agent:
+                        if game_info["agent"].peek() == self._current_agent:
                             self._context.current_game = game_id
                             log_debug(f"Updated current game to {game_id}")
                             break
@@ -613,15 +1220,25 @@ class MyWorkflow(VoiceWorkflowBase):
                     if self._current_agent == self._choice_layer_agent:
                         self._context.current_game = None
                         log_debug("Returned to choice layer")
+                    
+                    # Record how much of the handoff work the speculation took off this path
+                    prewarm = prewarm or HandoffPrewarm()
+                    prewarm.target = self._current_agent.name
+                    prewarm.reused = prepared is not None and self.last_refresh_reused
+                    prewarm.finish_ms = (time.perf_counter() - handoff_started) * 1000
+                    self.handoff_prewarms.append(prewarm)
+                    log_debug(f"Handoff finished in {prewarm.finish_ms:.2f}ms, "
+                              f"prediction {'hit' if prewarm.hit else 'missed'}, saved {prewarm.saved_ms:.2f}ms")
                 
             except Exception as e:
+                # Don't carry a half-finished speculation into the next turn
+                self._discard_speculation()
                 log_debug(f"Error in agent execution: {e}")
-                error_message = "I'm sorry, I had a problem understanding. Could you try again?"
-                yield error_message
+                yield ERROR_MESSAGE
                 
-                self._input_history.append({
+                self._history.append({
                     "role": "assistant",
-                    "content": error_message
+                    "content": ERROR_MESSAGE
                 })
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+"""
+Deterministic assembly of agent instructions.
+
+Providers cache the longest previously seen prompt prefix, so instructions are
+laid out with everything shared between children first and everything about
+this child last:
+
+    handoff instructions | prompt body | sorted AVAILABLE_AGENTS | CHILD PROFILE
+
+${user.field} templates in the body are replaced with stable <user.field>
+references and the values go into the trailing CHILD PROFILE section, so two
+children playing the same game get byte-identical instructions up to the
+profile. A hash of that static prefix is recorded per agent name, which makes
+it easy to check that the prefix doesn't change between sessions or rebuilds.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from agents.extensions.handoff_prompt import prompt_with_handoff_instructions
+
+from prompt_templates import compile_template
+
+PROFILE_HEADER = "CHILD PROFILE (values for the <user.field> references above):"
+
+
+@dataclass(frozen=True)
+class AssembledPrompt:
+    """
+    Attributes:
+        text: The full instructions
+        prefix_hash: Hash of the part shared by every child (everything before the profile)
+        prefix_chars: Length of that shared part
+    """
+    text: str
+    prefix_hash: str
+    prefix_chars: int
+
+
+_lock = threading.Lock()
+# Agent name -> prefix hash of its latest instructions, and every hash seen per agent
+_prefix_hashes: Dict[str, str] = {}
+_prefix_history: Dict[str, set] = {}
+
+
+def static_body(text: str) -> str:
+    """The prompt with its ${user.field} templates replaced by stable <user.field> references."""
+    template = compile_template(text)
+    if not template.fields:
+        return text
+    parts = list(template.segments)
+    for i in range(1, len(parts), 2):
+        parts[i] = f"<user.{parts[i]}>"
+    return "".join(parts)
+
+
+def format_available_agents(available_agents: Dict[str, Dict[str, Any]]) -> str:
+    """The AVAILABLE_AGENTS section, sorted by game ID so Firestore order doesn't leak into the prompt."""
+    return "AVAILABLE_AGENTS: " + ", ".join(
+        f"{game_id}: {available_agents[game_id]['name']} - {available_agents[game_id]['description']}"
+        for game_id in sorted(available_agents))
+
+
+def assemble_instructions(prompt: str, user_data: Dict[str, Any], sections: Iterable[str] = (),
+                          agent_name: Optional[str] = None) -> AssembledPrompt:
+    """
+    Build an agent's instructions with static content first and per-user content last.
+
+    Args:
+        prompt: Raw prompt text, possibly containing ${user.field} templates
+        user_data: Dictionary with user data for the profile section
+        sections: Extra static sections appended after the prompt body
+        agent_name: Record the prefix hash under this agent name
+
+    Returns:
+        The assembled instructions
+    """
+    static = prompt_with_handoff_instructions("\n\n".join([static_body(prompt), *sections]))
+    fields = compile_template(prompt).fields if prompt else ()
+    text = static
+    if fields:
+        profile = "\n".join(f"- user.{field}: {_format_value(user_data.get(field), field)}" for field in fields)
+        text = f"{static}\n\n{PROFILE_HEADER}\n{profile}"
+
+    prefix_hash = hashlib.sha256(static.encode("utf-8")).hexdigest()[:16]
+    if agent_name is not None:
+        with _lock:
+            _prefix_hashes[agent_name] = prefix_hash
+            _prefix_history.setdefault(agent_name, set()).add(prefix_hash)
+    return AssembledPrompt(text, prefix_hash, len(static))
+
+
+def prefix_hashes() -> Dict[str, str]:
+    """Latest static prefix hash per agent name."""
+    with _lock:
+        return dict(_prefix_hashes)
+
+
+def prefix_variants() -> Dict[str, int]:
+    """Number of distinct static prefixes seen per agent name; 1 means the prefix never changed."""
+    with _lock:
+        return {name: len(hashes) for name, hashes in _prefix_history.items()}
+
+
+def _format_value(value: Any, field: str) -> str:
+    return str(value) if value is not None else f"[unknown {field}]"
@@ -0,0 +1,227 @@
+"""
+Process-wide cache of the Firestore Prompts collection.
+
+The cache is loaded once and then kept fresh by a collection snapshot listener.
+When the client cannot provide a listener, or the listener stops (its stream
+failed or a snapshot could not be applied), it falls back to polling, and reads
+older than the TTL trigger a reload. Every change to the cached content bumps
+`version` so that callers can cheaply tell whether anything derived from the
+prompts needs to be rebuilt.
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def _log_debug(message: str) -> None:
+    print(f"[DEBUG] {message}")
+
+
+class PromptCache:
+    """
+    Thread-safe cache of prompt documents.
+
+    Args:
+        db: Firestore client (real or fake) used to read the collection
+        collection: Name of the collection holding the prompts
+        ttl_s: Maximum age of the cached data when no listener is active
+        poll_interval_s: Refresh interval of the polling fallback (None disables polling)
+        use_listener: Whether to try registering an on_snapshot listener
+        listener_timeout_s: How long to wait for the listener's initial snapshot
+    """
+
+    def __init__(self, db, collection: str = "Prompts", ttl_s: float = 300.0,
+                 poll_interval_s: Optional[float] = 60.0, use_listener: bool = True,
+                 listener_timeout_s: float = 10.0):
+        self._db = db
+        self._collection = collection
+        self.ttl_s = ttl_s
+        self.poll_interval_s = poll_interval_s
+        self.use_listener = use_listener
+        self.listener_timeout_s = listener_timeout_s
+
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._first_snapshot = threading.Event()
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._prompts: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._fingerprint: Optional[str] = None
+        self.version = 0
+
+        self._watch = None
+        self._watch_failed = False
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners: list = []
+
+    @property
+    def listening(self) -> bool:
+        """True while a snapshot listener keeps the cache fresh."""
+        return self._watch is not None and self._watch_alive()
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """Content hash of the cached prompts, or None if nothing is loaded yet."""
+        return self._fingerprint
+
+    def get_prompts(self) -> Dict[str, str]:
+        """
+        Return prompt names mapped to their content.
+
+        The returned dict is a copy, so callers are free to modify it.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return dict(self._prompts)
+
+    def get_documents(self) -> Dict[str, Dict[str, Any]]:
+        """Return the full prompt documents (content plus any metadata fields)."""
+        self._ensure_fresh()
+        with self._lock:
+            return {doc_id: dict(data) for doc_id, data in self._documents.items()}
+
+    def snapshot(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        """Return the version and the documents of that version, read together."""
+        self._ensure_fresh()
+        with self._lock:
+            return self.version, {doc_id: dict(data) for doc_id, data in self._documents.items()}
+
+    def add_listener(self, callback: Callable[[int], None]) -> None:
+        """Register a callback invoked with the new version whenever the prompts change."""
+        self._listeners.append(callback)
+
+    def refresh(self) -> bool:
+        """
+        Reload the whole collection from Firestore.
+
+        Returns:
+            True if the content changed
+        """
+        if self._db is None:
+            return False
+
+        documents = {}
+        for doc in self._db.collection(self._collection).stream():
+            documents[doc.id] = doc.to_dict() or {}
+        return self._replace(documents)
+
+    def invalidate(self) -> None:
+        """Drop the load timestamp so the next read reloads (unless a listener is active)."""
+        with self._lock:
+            self._loaded_at = None
+
+    def close(self) -> None:
+        """Stop the listener or poller."""
+        self._stop.set()
+        self._close_listener()
+
+    def _ensure_fresh(self) -> None:
+        if self._loaded_at is None:
+            with self._reload_lock:
+                if self._loaded_at is None:
+                    self._start()
+        elif self._watch is not None and not self._watch_alive():
+            with self._reload_lock:
+                if self._watch is not None and not self._watch_alive():
+                    _log_debug("Snapshot listener stopped, falling back to polling")
+                    self._close_listener()
+                    self._reload_safely()
+                    self._start_poller()
+        elif self._watch is None and time.monotonic() - self._loaded_at > self.ttl_s:
+            with self._reload_lock:
+                if time.monotonic() - self._loaded_at > self.ttl_s:
+                    _log_debug("Prompt cache expired, reloading")
+                    self._reload_safely()
+
+    def _start(self) -> None:
+        # Prefer a snapshot listener: it delivers the initial load and every later change
+        if self.use_listener and self._db is not None and self._watch is None:
+            try:
+                self._watch = self._db.collection(self._collection).on_snapshot(self._on_snapshot)
+                if not self._first_snapshot.wait(self.listener_timeout_s):
+                    raise TimeoutError("no initial snapshot received")
+                if not self._watch_alive():
+                    raise RuntimeError("initial snapshot failed")
+                _log_debug(f"Listening for changes on {self._collection}")
+            except Exception as e:
+                _log_debug(f"Snapshot listener unavailable ({e}), falling back to polling")
+                self._close_listener()
+
+        if self._watch is None:
+            self._reload_safely()
+            self._start_poller()
+
+    def _watch_alive(self) -> bool:
+        # A Watch whose stream failed for good stops delivering snapshots without telling its callback
+        return not self._watch_failed and getattr(self._watch, "is_active", True)
+
+    def _close_listener(self) -> None:
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                _log_debug(f"Error unsubscribing prompt listener: {e}")
+            self._watch = None
+        self._watch_failed = False
+
+    def _reload_safely(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            _log_debug(f"Error loading prompts: {e}")
+            # Keep serving whatever we have; retry on the next read
+            with self._lock:
+                self._loaded_at = time.monotonic() if self._documents else None
+
+    def _start_poller(self) -> None:
+        if self.poll_interval_s is None or self._poller is not None or self._db is None:
+            return
+
+        def poll():
+            while not self._stop.wait(self.poll_interval_s):
+                with self._reload_lock:
+                    self._reload_safely()
+
+        self._poller = threading.Thread(target=poll, name="prompt-cache-poller", daemon=True)
+        self._poller.start()
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Called from the Firestore watch thread with the full collection
+        try:
+            self._replace({doc.id: doc.to_dict() or {} for doc in docs})
+        except Exception as e:
+            # The next read replaces the listener with polling
+            _log_debug(f"Error applying prompt snapshot: {e}")
+            self._watch_failed = True
+        finally:
+            self._first_snapshot.set()
+
+    def _replace(self, documents: Dict[str, Dict[str, Any]]) -> bool:
+        prompts = {doc_id: data.get("content", "") for doc_id, data in documents.items()}
+        digest = hashlib.sha256()
+        for doc_id in sorted(documents):
+            digest.update(doc_id.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(repr(sorted(documents[doc_id].items())).encode("utf-8"))
+            digest.update(b"\0")
+        fingerprint = digest.hexdigest()
+
+        with self._lock:
+            self._loaded_at = time.monotonic()
+            if fingerprint == self._fingerprint:
+                return False
+            self._documents = documents
+            self._prompts = prompts
+            self._fingerprint = fingerprint
+            self.version += 1
+            version = self.version
+
+        _log_debug(f"Prompt cache updated to version {version} ({len(prompts)} prompts)")
+        for callback in list(self._listeners):
+            try:
+                callback(version)
+            except Exception as e:
+                _log_debug(f"Error in prompt cache listener: {e}")
+        return True
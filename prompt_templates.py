@@ -0,0 +1,99 @@
+"""
+Precompiled ${user.field} templates for prompts.
+
+Each prompt is parsed once into literal and field segments and rendering is a
+join over those segments.
+"""
+import functools
+import re
+from typing import Any, Dict, List, Tuple
+
+# ${user.field} placeholders, e.g. ${user.name}
+USER_TEMPLATE_PATTERN = re.compile(r'\${user\.([a-zA-Z]+)}')
+
+
+class CompiledTemplate:
+    """
+    A prompt parsed into segments.
+
+    Attributes:
+        segments: Literal strings and field names; odd positions are field names
+        fields: Names of the user fields referenced, in order of first use
+    """
+
+    __slots__ = ("segments", "fields")
+
+    def __init__(self, text: str):
+        # re.split with one group alternates literal, field, literal, ...
+        self.segments: List[str] = USER_TEMPLATE_PATTERN.split(text)
+        self.fields: Tuple[str, ...] = tuple(dict.fromkeys(self.segments[1::2]))
+
+    def render(self, user_data: Dict[str, Any]) -> str:
+        """Replace the field segments with values from user_data."""
+        if not self.fields:
+            return self.segments[0]
+
+        parts = list(self.segments)
+        for i in range(1, len(parts), 2):
+            field = parts[i]
+            value = user_data.get(field)
+            parts[i] = str(value) if value is not None else f"[unknown {field}]"
+        return "".join(parts)
+
+
+# Compiled templates keyed by the prompt text (str hashes are cached, so lookups are cheap)
+@functools.lru_cache(maxsize=1024)
+def compile_template(text: str) -> CompiledTemplate:
+    """
+    Parse a prompt into a CompiledTemplate, reusing an earlier parse of the same text.
+
+    Args:
+        text: The prompt text
+
+    Returns:
+        The compiled template
+    """
+    return CompiledTemplate(text)
+
+
+def template_fields(text: str) -> Tuple[str, ...]:
+    """
+    List the user fields referenced by ${user.field} templates in a prompt.
+
+    Args:
+        text: The prompt text
+
+    Returns:
+        Tuple of field names in order of first use, e.g. ("name", "age")
+    """
+    if not text:
+        return ()
+    return compile_template(text).fields
+
+
+def render_template(text: str, user_data: Dict[str, Any]) -> str:
+    """
+    Replace ${user.field} templates in text with values from user_data.
+
+    Missing or None values render as "[unknown field]".
+
+    Args:
+        text: The text containing templates
+        user_data: Dictionary with user data
+
+    Returns:
+        Text with templates replaced by user values
+    """
+    if not text:
+        return text
+    return compile_template(text).render(user_data)
+
+
+def cache_info() -> Dict[str, int]:
+    """Return the number of compiled templates cached."""
+    return {"templates": compile_template.cache_info().currsize}
+
+
+def clear_caches() -> None:
+    """Drop all compiled templates."""
+    compile_template.cache_clear()
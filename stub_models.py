@@ -0,0 +1,354 @@
+"""
+Offline stand-ins for the OpenAI models used by the voice pipeline.
+
+StubModelProvider streams canned replies token by token with configurable
+delays (and can hand off to another agent first), ScriptedSTTModel turns
+scripted utterances into transcriptions, and StubTTSModel returns silent PCM.
+Together with FakeFirestore they let the whole VoicePipeline + MyWorkflow turn
+loop run without network access.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from agents import ModelProvider, ModelResponse, Usage
+from agents.models.interface import Model
+from agents.voice import (
+    StreamedAudioInput,
+    StreamedTranscriptionSession,
+    STTModel,
+    STTModelSettings,
+    TTSModel,
+    TTSModelSettings,
+    VoiceModelProvider,
+)
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+_ids = itertools.count(1)
+
+# Prompt caching as providers do it: prompts of at least 1024 tokens are cached in
+# 128-token blocks, and a request reuses the longest block-aligned prefix seen before
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+@dataclass
+class StubReply:
+    """
+    What the stub model answers on the next turn.
+
+    Attributes:
+        text: Reply streamed by the agent that ends up answering
+        handoff_to: Name of an agent to hand off to before replying, if any
+        tool_calls: (tool name, arguments) calls made before the handoff and the reply
+    """
+    text: str = "¡Muy bien! Can you say hola?"
+    handoff_to: Optional[str] = None
+    tool_calls: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+
+
+@dataclass
+class StubCall:
+    """Timing of one model call."""
+    started: float
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    handoff: Optional[str] = None
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+
+class StubModel(Model):
+    def __init__(self, provider: "StubModelProvider"):
+        self._provider = provider
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema,
+                           handoffs, tracing, **kwargs) -> ModelResponse:
+        response = None
+        async for event in self.stream_response(system_instructions, input, model_settings, tools,
+                                                output_schema, handoffs, tracing, **kwargs):
+            if isinstance(event, ResponseCompletedEvent):
+                response = event.response
+        return ModelResponse(output=response.output, usage=Usage(), response_id=response.id)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema,
+                              handoffs, tracing, **kwargs) -> AsyncIterator[Any]:
+        provider = self._provider
+        call = StubCall(started=time.perf_counter())
+        provider.calls.append(call)
+        # Same order as the real request: tools, then instructions, then the conversation
+        prompt = (repr([tool.name for tool in tools]) + repr([handoff.tool_name for handoff in handoffs])
+                  + (system_instructions or "") + repr(input))
+        call.input_tokens = estimate_tokens(prompt)
+        call.cached_tokens = provider.prompt_cache_lookup(prompt)
+
+        reply = provider.current_reply()
+        tool_calls = provider.take_tool_calls()
+        handoff = None if tool_calls else self._pending_handoff(reply, input, handoffs, provider.tool_call_ids)
+        await asyncio.sleep(provider.first_token_delay_s)
+
+        if tool_calls:
+            call.first_token = time.perf_counter()
+            output = []
+            for name, arguments in tool_calls:
+                call_id = f"call_{next(_ids)}"
+                provider.tool_call_ids.add(call_id)
+                output.append(ResponseFunctionToolCall(
+                    type="function_call", id=f"fc_{next(_ids)}", call_id=call_id,
+                    name=name, arguments=json.dumps(arguments), status="completed",
+                ))
+            text = ""
+        elif handoff is not None:
+            call.handoff = handoff.agent_name
+            call.first_token = time.perf_counter()
+            output = [ResponseFunctionToolCall(
+                type="function_call", id=f"fc_{next(_ids)}", call_id=f"call_{next(_ids)}",
+                name=handoff.tool_name, arguments="{}", status="completed",
+            )]
+            text = ""
+        else:
+            item_id = f"msg_{next(_ids)}"
+            for sequence, token in enumerate(_tokens(reply.text)):
+                if sequence:
+                    await asyncio.sleep(provider.token_delay_s)
+                else:
+                    call.first_token = time.perf_counter()
+                yield ResponseTextDeltaEvent(
+                    type="response.output_text.delta", item_id=item_id, output_index=0,
+                    content_index=0, delta=token, logprobs=[], sequence_number=sequence,
+                )
+            output = [ResponseOutputMessage(
+                type="message", id=item_id, role="assistant", status="completed",
+                content=[ResponseOutputText(type="output_text", text=reply.text, annotations=[])],
+            )]
+            text = reply.text
+
+        call.finished = time.perf_counter()
+        # model_construct: the required detail fields differ between openai versions
+        usage = ResponseUsage.model_construct(
+            input_tokens=call.input_tokens,
+            input_tokens_details=InputTokensDetails.model_construct(cached_tokens=call.cached_tokens),
+            output_tokens=estimate_tokens(text),
+            output_tokens_details=OutputTokensDetails.model_construct(reasoning_tokens=0),
+            total_tokens=call.input_tokens + estimate_tokens(text),
+        )
+        yield ResponseCompletedEvent.model_construct(
+            type="response.completed",
+            sequence_number=0,
+            response=Response.model_construct(
+                id=f"resp_{next(_ids)}", object="response", created_at=time.time(), model="stub",
+                output=output, usage=usage, tools=[], tool_choice="auto", parallel_tool_calls=True,
+                status="completed",
+            ),
+        )
+
+    @staticmethod
+    def _pending_handoff(reply: StubReply, input, handoffs, tool_call_ids=()):
+        # Hand off only on the first call of the turn (or right after the reply's own tool
+        # calls); after the transfer the target agent answers
+        if reply.handoff_to is None or not isinstance(input, list) or not input:
+            return None
+        last = input[-1]
+        last_type = last.get("type") if isinstance(last, dict) else getattr(last, "type", None)
+        last_call_id = last.get("call_id") if isinstance(last, dict) else getattr(last, "call_id", None)
+        if last_type == "function_call_output" and last_call_id not in tool_call_ids:
+            return None
+        for handoff in handoffs:
+            if handoff.agent_name == reply.handoff_to:
+                return handoff
+        return None
+
+
+class StubModelProvider(ModelProvider):
+    """
+    Model provider whose models stream canned replies.
+
+    Args:
+        first_token_delay_s: Delay before the first streamed token of every call
+        token_delay_s: Delay between streamed tokens
+    """
+
+    def __init__(self, first_token_delay_s: float = 0.05, token_delay_s: float = 0.005):
+        self.first_token_delay_s = first_token_delay_s
+        self.token_delay_s = token_delay_s
+        self.replies: deque = deque()
+        self.calls: List[StubCall] = []
+        self._prompt_cache: set = set()
+        self._current = StubReply()
+        self._tool_calls: list = []
+        self.tool_call_ids: set = set()
+        self._model = StubModel(self)
+
+    def queue_reply(self, reply: StubReply) -> None:
+        """Set the reply for the next turn."""
+        self.replies.append(reply)
+
+    def start_turn(self) -> None:
+        """Advance to the next queued reply (the default reply if none is queued)."""
+        self._current = self.replies.popleft() if self.replies else StubReply()
+        self._tool_calls = list(self._current.tool_calls)
+        self.tool_call_ids = set()
+
+    def current_reply(self) -> StubReply:
+        return self._current
+
+    def take_tool_calls(self) -> list:
+        """The reply's tool calls, once per turn (the first model call makes them)."""
+        tool_calls, self._tool_calls = self._tool_calls, []
+        return tool_calls
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return self._model
+
+    def prompt_cache_lookup(self, prompt: str) -> int:
+        """Simulate provider prompt caching; returns the cached token count and caches the prompt."""
+        block_chars = CACHE_BLOCK_TOKENS * CHARS_PER_TOKEN
+        if len(prompt) < CACHE_MIN_TOKENS * CHARS_PER_TOKEN:
+            return 0
+        cached_blocks, missed = 0, False
+        digest = hashlib.sha1()
+        for start in range(0, len(prompt) - block_chars + 1, block_chars):
+            digest.update(prompt[start:start + block_chars].encode("utf-8"))
+            key = digest.hexdigest()
+            if not missed and key in self._prompt_cache:
+                cached_blocks += 1
+            else:
+                missed = True
+                self._prompt_cache.add(key)
+        cached = cached_blocks * CACHE_BLOCK_TOKENS
+        return cached if cached >= CACHE_MIN_TOKENS else 0
+
+
+class _ScriptedSession(StreamedTranscriptionSession):
+    def __init__(self, audio_input: StreamedAudioInput, transcripts: asyncio.Queue):
+        self._audio_input = audio_input
+        self._transcripts = transcripts
+        self.samples_received = 0
+        self._reader = asyncio.create_task(self._consume_audio())
+
+    async def _consume_audio(self) -> None:
+        while True:
+            frame = await self._audio_input.queue.get()
+            if frame is None:
+                return
+            self.samples_received += len(frame)
+
+    async def transcribe_turns(self) -> AsyncIterator[str]:
+        while True:
+            transcript = await self._transcripts.get()
+            if transcript is None:
+                return
+            yield transcript
+
+    async def close(self) -> None:
+        self._reader.cancel()
+
+
+class ScriptedSTTModel(STTModel):
+    """Speech-to-text model that emits scripted transcriptions when told an utterance ended."""
+
+    def __init__(self):
+        self._transcripts: asyncio.Queue = asyncio.Queue()
+        self.session: Optional[_ScriptedSession] = None
+
+    @property
+    def model_name(self) -> str:
+        return "scripted-stt"
+
+    def end_utterance(self, transcript: str) -> None:
+        """Deliver the transcription of the audio pushed so far."""
+        self._transcripts.put_nowait(transcript)
+
+    def end_session(self) -> None:
+        self._transcripts.put_nowait(None)
+
+    async def transcribe(self, input, settings: STTModelSettings, trace_include_sensitive_data: bool,
+                         trace_include_sensitive_audio_data: bool) -> str:
+        return await self._transcripts.get()
+
+    async def create_session(self, input: StreamedAudioInput, settings: STTModelSettings,
+                             trace_include_sensitive_data: bool,
+                             trace_include_sensitive_audio_data: bool) -> StreamedTranscriptionSession:
+        self.session = _ScriptedSession(input, self._transcripts)
+        return self.session
+
+
+class StubTTSModel(TTSModel):
+    """
+    Text-to-speech model that returns silence sized like real speech.
+
+    Args:
+        first_byte_delay_s: Delay before the first audio chunk
+        chunk_delay_s: Delay between chunks
+        samples_per_char: Output length per input character at 24 kHz
+        chunk_samples: Samples per yielded chunk
+    """
+
+    def __init__(self, first_byte_delay_s: float = 0.03, chunk_delay_s: float = 0.0,
+                 samples_per_char: int = 1200, chunk_samples: int = 2400):
+        self.first_byte_delay_s = first_byte_delay_s
+        self.chunk_delay_s = chunk_delay_s
+        self.samples_per_char = samples_per_char
+        self.chunk_samples = chunk_samples
+        self.texts: List[str] = []
+
+    @property
+    def model_name(self) -> str:
+        return "stub-tts"
+
+    async def run(self, text: str, settings: TTSModelSettings) -> AsyncIterator[bytes]:
+        self.texts.append(text)
+        await asyncio.sleep(self.first_byte_delay_s)
+        remaining = len(text) * self.samples_per_char
+        chunk = bytes(self.chunk_samples * 2)
+        while remaining > 0:
+            count = min(remaining, self.chunk_samples)
+            yield chunk[:count * 2]
+            remaining -= count
+            if self.chunk_delay_s:
+                await asyncio.sleep(self.chunk_delay_s)
+
+
+class StubVoiceModelProvider(VoiceModelProvider):
+    def __init__(self, stt: Optional[STTModel] = None, tts: Optional[TTSModel] = None):
+        self.stt = stt or ScriptedSTTModel()
+        self.tts = tts or StubTTSModel()
+
+    def get_stt_model(self, model_name: Optional[str]) -> STTModel:
+        return self.stt
+
+    def get_tts_model(self, model_name: Optional[str]) -> TTSModel:
+        return self.tts
+
+
+def _tokens(text: str) -> List[str]:
+    # Word-sized deltas, keeping the whitespace so the deltas join back to the text
+    tokens, current = [], ""
+    for char in text:
+        current += char
+        if char == " ":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
@@ -0,0 +1,71 @@
+"""
+Regenerate the voice gate test clips (24 kHz, 16-bit mono).
+
+The clips are synthesized, not recorded, so they are reproducible and their
+speech boundaries are known exactly:
+
+- speech.wav: 0.5 s of room noise, 1.5 s of speech-like voicing, 1 s of room noise
+- fan.wav: 5 s of steady low-frequency fan noise with mains hum, from the first frame
+- hiss.wav: 2 s of white hiss
+
+    python tests/fixtures/vad/make_fixtures.py
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from bench_vad import SAMPLE_RATE, write_wav  # noqa: E402
+
+SPEECH_START_S = 0.5
+SPEECH_END_S = 2.0
+
+
+def to_int16(audio):
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def speech(rng):
+    total = int(3.0 * SAMPLE_RATE)
+    audio = rng.normal(0.0, 10 ** (-55 / 20), total)
+    start, end = int(SPEECH_START_S * SAMPLE_RATE), int(SPEECH_END_S * SAMPLE_RATE)
+    t = np.arange(end - start) / SAMPLE_RATE
+    # A gliding pitch with a few harmonics, shaped into syllables
+    f0 = 220 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    fade = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.03)
+    audio[start:end] += 0.12 * voiced * syllables * fade
+    return to_int16(audio)
+
+
+def fan(rng, seconds=5.0, level_db=-35.0):
+    total = int(seconds * SAMPLE_RATE)
+    white = rng.normal(0.0, 1.0, total)
+    # One-pole low-pass at about 300 Hz
+    alpha = np.exp(-2 * np.pi * 300 / SAMPLE_RATE)
+    rumble = np.empty(total)
+    state = 0.0
+    for index, sample in enumerate(white):
+        state = alpha * state + (1 - alpha) * sample
+        rumble[index] = state
+    t = np.arange(total) / SAMPLE_RATE
+    audio = rumble / np.std(rumble) + 0.4 * np.sin(2 * np.pi * 120 * t) + 0.2 * np.sin(2 * np.pi * 240 * t)
+    return to_int16(audio / np.std(audio) * 10 ** (level_db / 20))
+
+
+def hiss(rng, seconds=2.0, level_db=-40.0):
+    return to_int16(rng.normal(0.0, 10 ** (level_db / 20), int(seconds * SAMPLE_RATE)))
+
+
+def main():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    rng = np.random.default_rng(11)
+    for name, samples in (("speech", speech(rng)), ("fan", fan(rng)), ("hiss", hiss(rng))):
+        write_wav(os.path.join(directory, f"{name}.wav"), samples)
+
+
+if __name__ == "__main__":
+    main()
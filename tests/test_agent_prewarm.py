@@ -0,0 +1,53 @@
+"""prewarm_model_connection opens the connection on the client it is given."""
+import asyncio
+
+from agents import RunConfig
+from agents.models.openai_provider import OpenAIProvider
+from openai import AsyncOpenAI
+
+from agent_prewarm import prewarm_model_connection
+
+
+class RecordingModels:
+    def __init__(self):
+        self.retrieved = []
+
+    async def retrieve(self, model_name):
+        self.retrieved.append(model_name)
+
+
+def test_prewarms_the_client_the_provider_was_built_with():
+    client = AsyncOpenAI(api_key="test")
+    client.models = RecordingModels()
+    run_config = RunConfig(model_provider=OpenAIProvider(openai_client=client))
+
+    elapsed_ms = asyncio.run(prewarm_model_connection(run_config, "gpt-4o-mini", client))
+
+    assert client.models.retrieved == ["gpt-4o-mini"]
+    assert elapsed_ms > 0
+
+
+def test_models_with_their_own_prewarm_use_it():
+    class Model:
+        prewarmed = False
+
+        async def prewarm(self):
+            Model.prewarmed = True
+
+    class Provider:
+        def get_model(self, model_name):
+            return Model()
+
+    client = AsyncOpenAI(api_key="test")
+    client.models = RecordingModels()
+
+    asyncio.run(prewarm_model_connection(RunConfig(model_provider=Provider()), "gpt-4o-mini", client))
+
+    assert Model.prewarmed and client.models.retrieved == []
+
+
+def test_nothing_to_prewarm_without_a_client_or_run_config():
+    run_config = RunConfig(model_provider=OpenAIProvider(openai_client=AsyncOpenAI(api_key="test")))
+
+    assert asyncio.run(prewarm_model_connection(run_config, "gpt-4o-mini")) == 0.0
+    assert asyncio.run(prewarm_model_connection(None, "gpt-4o-mini", AsyncOpenAI(api_key="test"))) == 0.0
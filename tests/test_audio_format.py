@@ -0,0 +1,90 @@
+"""Accuracy of the audio format converter; bench_audio_format.py measures its CPU cost."""
+import numpy as np
+import pytest
+
+from audio_format import PIPELINE_FORMAT, AudioConverter, AudioFormat
+from bench_audio_format import as_format, convert_blocks, tones
+
+MIN_SNR_DB = 60.0
+
+DEVICE_FORMATS = [
+    AudioFormat(48000, 1, "int16"),
+    AudioFormat(48000, 2, "int16"),
+    AudioFormat(44100, 2, "int16"),
+    AudioFormat(44100, 1, "float32"),
+]
+
+
+def snr_db(reference, actual, skip):
+    """SNR of actual against reference, leaving out `skip` samples of filter warm-up and the last 20 ms."""
+    signal, error = reference[skip:-480], actual[skip:-480] - reference[skip:-480]
+    return 10 * np.log10(np.mean(signal ** 2) / np.mean(error ** 2))
+
+
+def pipeline_reference(length, delay):
+    # The signal is analytic, so the reference can be delayed by a fractional number of samples exactly
+    return tones(PIPELINE_FORMAT.sample_rate, length / PIPELINE_FORMAT.sample_rate, delay=delay)[:, 0]
+
+
+@pytest.mark.parametrize("device", DEVICE_FORMATS, ids=str)
+def test_capture_to_pipeline(device):
+    capture = AudioConverter(device, PIPELINE_FORMAT)
+    out, _ = convert_blocks(capture, as_format(tones(device.sample_rate, 1.0, device.channels), device))
+
+    assert out.dtype == np.int16 and out.shape[1] == 1
+    assert abs(len(out) - PIPELINE_FORMAT.sample_rate) <= 1
+    delay = capture.resampler.delay
+    actual = out[:, 0].astype(np.float64) / 32768
+    assert snr_db(pipeline_reference(len(out), delay), actual, int(delay) + 480) >= MIN_SNR_DB
+
+
+@pytest.mark.parametrize("device", DEVICE_FORMATS, ids=str)
+def test_round_trip_through_device(device):
+    to_device = AudioConverter(PIPELINE_FORMAT, device)
+    from_device = AudioConverter(device, PIPELINE_FORMAT)
+    converted, _ = convert_blocks(to_device, as_format(tones(PIPELINE_FORMAT.sample_rate, 1.0), PIPELINE_FORMAT))
+    back, _ = convert_blocks(from_device, converted)
+
+    assert converted.shape[1] == device.channels
+    assert converted.dtype == np.dtype(device.dtype)
+    # Delays add up in pipeline samples
+    delay = to_device.resampler.delay * from_device.resampler.up / from_device.resampler.down
+    delay += from_device.resampler.delay
+    actual = back[:, 0].astype(np.float64) / 32768
+    assert snr_db(pipeline_reference(len(back), delay), actual, int(delay) + 480) >= MIN_SNR_DB
+
+
+def test_stereo_downmix_averages_channels():
+    left = np.array([1000, -2000, 32767, -32768, 7], dtype=np.int16)
+    right = np.array([3000, 2000, 32767, -32768, 8], dtype=np.int16)
+    stereo = np.stack([left, right], axis=1)
+
+    mono = AudioConverter(AudioFormat(24000, 2, "int16"), PIPELINE_FORMAT).convert(stereo.reshape(-1))
+
+    assert mono.shape == (5, 1)
+    expected = (left.astype(np.float64) + right) / 2 * 32767 / 32768
+    assert np.max(np.abs(mono[:, 0] - expected)) <= 1
+
+
+def test_opposite_channels_cancel_in_the_downmix():
+    signal = tones(48000, 0.5)[:, 0]
+    stereo = as_format(np.stack([signal, -signal], axis=1), AudioFormat(48000, 2, "float32"))
+
+    mono, _ = convert_blocks(AudioConverter(AudioFormat(48000, 2, "float32"), PIPELINE_FORMAT), stereo)
+
+    assert np.max(np.abs(mono)) == 0
+
+
+@pytest.mark.parametrize("rate", [24000, 48000])
+def test_int16_output_clips_instead_of_wrapping(rate):
+    loud = np.full((rate // 10, 1), 1.5, dtype=np.float32)
+    loud[len(loud) // 2:] = -1.5
+
+    out, _ = convert_blocks(AudioConverter(AudioFormat(rate, 1, "float32"), PIPELINE_FORMAT), loud)
+
+    assert out.dtype == np.int16
+    assert out.max() == 32767 and out.min() == -32768
+    # Away from the step, the whole half is pinned at full scale with no wrapped samples
+    quarter = len(out) // 4
+    assert np.all(out[quarter // 2:quarter, 0] == 32767)
+    assert np.all(out[-quarter:-quarter // 2, 0] == -32768)
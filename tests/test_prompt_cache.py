@@ -0,0 +1,85 @@
+"""PromptCache freshness against the in-memory fake Firestore, with a live and a failed listener."""
+import pytest
+
+from fake_firestore import FakeFirestore
+from prompt_cache import PromptCache
+
+
+@pytest.fixture
+def client():
+    client = FakeFirestore()
+    client._write("Prompts", "CHOICE_LAYER_PROMPT", {"content": "Pick a game."})
+    return client
+
+
+@pytest.fixture
+def cache(client):
+    # No poller thread: each test drives the fallback through reads
+    cache = PromptCache(client, poll_interval_s=None)
+    yield cache
+    cache.close()
+
+
+def test_listener_delivers_changes(client, cache):
+    assert cache.get_prompts() == {"CHOICE_LAYER_PROMPT": "Pick a game."}
+    assert cache.listening
+    round_trips = client.round_trips
+
+    client._write("Prompts", "CHOICE_LAYER_PROMPT", {"content": "Pick a new game."})
+
+    assert cache.get_prompts() == {"CHOICE_LAYER_PROMPT": "Pick a new game."}
+    assert client.round_trips == round_trips
+
+
+def test_stopped_listener_falls_back_to_reloading(client, cache):
+    cache.get_prompts()
+    version = cache.version
+    # The stream fails for good: no more snapshots, and the callback is never told
+    cache._watch.close()
+    client._write("Prompts", "CHOICE_LAYER_PROMPT", {"content": "Pick a new game."})
+
+    assert cache.get_prompts() == {"CHOICE_LAYER_PROMPT": "Pick a new game."}
+    assert not cache.listening
+    assert cache.version == version + 1
+
+    # From now on reads older than the TTL reload
+    cache.ttl_s = 0.0
+    client._write("Prompts", "ZOO_GAME_PROMPT", {"content": "Zoo."})
+    assert "ZOO_GAME_PROMPT" in cache.get_prompts()
+
+
+def test_snapshot_error_falls_back_to_reloading(client, cache, monkeypatch):
+    cache.get_prompts()
+    replace = cache._replace
+    failures = []
+
+    def fail_once(documents):
+        if not failures:
+            failures.append(documents)
+            raise ValueError("bad document")
+        return replace(documents)
+
+    monkeypatch.setattr(cache, "_replace", fail_once)
+    client._write("Prompts", "CHOICE_LAYER_PROMPT", {"content": "Pick a new game."})
+    assert failures
+
+    assert cache.get_prompts() == {"CHOICE_LAYER_PROMPT": "Pick a new game."}
+    assert not cache.listening
+
+
+def test_failed_initial_snapshot_loads_by_reading(client, monkeypatch):
+    cache = PromptCache(client, poll_interval_s=None)
+    replace = cache._replace
+    calls = []
+
+    def fail_first(documents):
+        calls.append(documents)
+        if len(calls) == 1:
+            raise ValueError("bad document")
+        return replace(documents)
+
+    monkeypatch.setattr(cache, "_replace", fail_first)
+
+    assert cache.get_prompts() == {"CHOICE_LAYER_PROMPT": "Pick a game."}
+    assert not cache.listening
+    cache.close()
@@ -0,0 +1,145 @@
+"""PromptUpload's batched sync of thousands of prompts against the in-memory fake Firestore."""
+import contextlib
+import io
+
+import pytest
+
+import PromptUpload
+from PromptUpload import MAX_BATCH_WRITES, BatchWriteError
+from User_Firebase import set_firestore_client
+from fake_firestore import FakeFirestore, FakeWriteBatch
+
+PROMPTS = 1200
+
+
+class RecordingBatch(FakeWriteBatch):
+    def __init__(self, client):
+        super().__init__(client)
+        self.ids = []
+
+    def set(self, reference, data, merge=False):
+        self.ids.append(reference.id)
+        super().set(reference, data, merge=merge)
+
+    def delete(self, reference):
+        self.ids.append(reference.id)
+        super().delete(reference)
+
+    def commit(self):
+        if self._client.fail_batches_with & set(self.ids):
+            raise RuntimeError("batch rejected")
+        self._client.committed.append(self.ids)
+        super().commit()
+
+
+class RecordingFirestore(FakeFirestore):
+    """Records the document IDs of each committed batch and fails batches holding any of fail_batches_with."""
+
+    def __init__(self):
+        super().__init__()
+        self.committed = []
+        self.fail_batches_with = set()
+
+    def batch(self):
+        return RecordingBatch(self)
+
+
+def game_prompts(count, start=0):
+    return {f"GAME{index:05d}_GAME_PROMPT": f"This game is called \"Game {index}\"." for index in range(start, count)}
+
+
+@pytest.fixture
+def client():
+    client = RecordingFirestore()
+    for prompt_id, content in game_prompts(PROMPTS).items():
+        client._write("Prompts", prompt_id, {"content": content})
+    set_firestore_client(client)
+    yield client
+    set_firestore_client(None)
+
+
+def remote(client):
+    return {prompt_id: fields["content"] for prompt_id, fields in client._snapshot("Prompts")}
+
+
+def sync(prompts, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return PromptUpload.sync_prompts(prompts, **kwargs)
+
+
+def local_edit():
+    """The seeded prompts with 600 edited, 200 dropped and 300 added: 900 writes, 200 remote-only."""
+    local = game_prompts(PROMPTS - 200)
+    for index, prompt_id in enumerate(local):
+        if index % 5 < 3:
+            local[prompt_id] += "\nRemember to smile!"
+    local.update(game_prompts(PROMPTS + 300, start=PROMPTS))
+    return local
+
+
+def test_upload_splits_into_batches_of_at_most_500(client):
+    prompts = game_prompts(PROMPTS + 100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        PromptUpload.upload_prompts(prompts)
+
+    assert sorted(len(batch) for batch in client.committed) == [300, MAX_BATCH_WRITES, MAX_BATCH_WRITES]
+    assert remote(client) == prompts
+
+
+def test_sync_writes_only_what_differs(client):
+    local = local_edit()
+    diff = sync(local)
+
+    assert (len(diff.added), len(diff.changed), len(diff.removed)) == (300, 600, 200)
+    assert sorted(len(batch) for batch in client.committed) == [400, MAX_BATCH_WRITES]
+    written = {prompt_id for batch in client.committed for prompt_id in batch}
+    assert written == set(diff.added) | set(diff.changed)
+    # Without --prune remote-only prompts are kept
+    assert remote(client) == dict(game_prompts(PROMPTS), **local)
+
+    client.committed.clear()
+    again = sync(local)
+    assert not again.added and not again.changed and not client.committed
+
+
+def test_dry_run_writes_nothing(client):
+    before = remote(client)
+    round_trips = client.round_trips
+
+    diff = sync(local_edit(), dry_run=True, prune=True)
+
+    assert (len(diff.added), len(diff.changed), len(diff.removed)) == (300, 600, 200)
+    assert client.committed == []
+    assert client.round_trips == round_trips + 1  # the one read of the collection
+    assert remote(client) == before
+
+
+def test_prune_deletes_only_remote_only_prompts(client):
+    local = local_edit()
+    remote_only = set(game_prompts(PROMPTS)) - set(local)
+
+    diff = sync(local, prune=True)
+
+    assert set(diff.removed) == remote_only
+    assert remote(client) == local
+    deleted = {prompt_id for batch in client.committed for prompt_id in batch} - set(local)
+    assert deleted == remote_only
+
+
+def test_batch_write_error_lists_the_failed_batch(client):
+    local = local_edit()
+    # Writes are split into batches in order: fail the second one, writes 500-899
+    documents = {prompt_id: PromptUpload.as_document(content) for prompt_id, content in local.items()}
+    writes = PromptUpload.diff_prompts(documents, PromptUpload.stream_prompts()).writes(client.collection("Prompts"))
+    second_batch = [reference.id for reference, _ in writes[MAX_BATCH_WRITES:]]
+    client.fail_batches_with = {second_batch[0]}
+
+    with pytest.raises(BatchWriteError) as error:
+        sync(local)
+
+    assert error.value.failed_ids == second_batch
+    assert error.value.written_ids == [reference.id for reference, _ in writes[:MAX_BATCH_WRITES]]
+    assert len(error.value.errors) == 1
+    synced = remote(client)
+    assert all(synced[prompt_id] == local[prompt_id] for prompt_id in error.value.written_ids)
+    assert all(synced.get(prompt_id) != local[prompt_id] for prompt_id in error.value.failed_ids)
@@ -0,0 +1,84 @@
+"""get_user_async against the in-memory fake Firestore."""
+import asyncio
+import time
+
+import pytest
+
+import User_Firebase
+from User_Firebase import get_firestore_client, get_user_async, set_firestore_client
+from fake_firestore import FakeFirestore
+
+SOFIA = {"name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"}
+
+
+@pytest.fixture
+def client():
+    client = FakeFirestore(latency_s=0.05)
+    client._write("Users", "ID1", SOFIA)
+    set_firestore_client(client)
+    yield client
+    set_firestore_client(None)
+
+
+def test_concurrent_reads_share_one_fetch(client):
+    async def sessions():
+        return await asyncio.gather(*(get_user_async("ID1") for _ in range(20)))
+
+    users = asyncio.run(sessions())
+
+    assert client.round_trips == 1
+    assert all(user == SOFIA for user in users)
+    # Every caller gets its own copy
+    users[0]["age"] = 7
+    assert users[1]["age"] == 6
+
+
+def test_reads_after_the_first_one_fetch_again(client):
+    async def two_sessions():
+        first = await get_user_async("ID1")
+        second = await get_user_async("ID1")
+        return first, second
+
+    assert asyncio.run(two_sessions()) == (SOFIA, SOFIA)
+    assert client.round_trips == 2
+
+
+def test_read_timeout_raises_and_falls_back(client):
+    client.latency_s = 0.5
+
+    async def slow_read():
+        with pytest.raises(asyncio.TimeoutError):
+            await User_Firebase._run_blocking(User_Firebase._read_user, "ID1", timeout_s=0.05)
+        started = time.perf_counter()
+        user = await get_user_async("ID1", timeout_s=0.05)
+        return user, time.perf_counter() - started
+
+    user, elapsed = asyncio.run(slow_read())
+
+    # get_user_async gives up on the timed out read instead of waiting for it
+    assert user == {"name": None, "age": None, "language": None, "proficiency": None}
+    assert elapsed < 0.4
+
+
+def test_missing_user_gets_empty_values(client):
+    user = asyncio.run(get_user_async("nobody"))
+
+    assert user == {"name": None, "age": None, "language": None, "proficiency": None}
+
+
+def test_sessions_share_the_client_and_thread_pool(client):
+    client._write("Users", "ID2", dict(SOFIA, name="Mateo"))
+
+    async def sessions():
+        first = await asyncio.gather(get_user_async("ID1"), get_user_async("ID2"))
+        executor = User_Firebase._get_executor()
+        second = await asyncio.gather(get_user_async("ID1"), get_user_async("ID2"))
+        return first + second, executor
+
+    users, executor = asyncio.run(sessions())
+
+    assert [user["name"] for user in users] == ["Sofia", "Mateo", "Sofia", "Mateo"]
+    # Every read went to the one process-wide client, on the one shared pool
+    assert get_firestore_client() is client
+    assert client.round_trips == 4
+    assert User_Firebase._get_executor() is executor
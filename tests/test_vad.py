@@ -0,0 +1,98 @@
+"""Runs the voice gate over the WAV clips in fixtures/vad (see make_fixtures.py there)."""
+import asyncio
+import os
+
+import numpy as np
+from agents.voice import StreamedAudioInput
+
+from audio_playback import JitterBuffer
+from bench_vad import FRAME_MS, FRAME_SAMPLES, SAMPLE_RATE, read_wav, run_gate
+from vad import EnergyVAD, GatedAudioInput, VoiceGate
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "vad")
+
+# Speech boundaries in speech.wav
+SPEECH_START_FRAME = int(0.5 * SAMPLE_RATE) // FRAME_SAMPLES
+SPEECH_END_FRAME = int(2.0 * SAMPLE_RATE) // FRAME_SAMPLES - 1
+
+
+def gate_fixture(name):
+    return run_gate(read_wav(os.path.join(FIXTURES, f"{name}.wav")))
+
+
+def test_speech_start_and_end_detected():
+    gate, sent, end_events, _ = gate_fixture("speech")
+    stats = gate.stats()
+
+    assert stats["utterances"] == 1
+    # The word onset and every speech frame go upstream
+    assert set(range(SPEECH_START_FRAME, SPEECH_END_FRAME + 1)) <= sent
+    # Nothing long before the pre-roll, nothing after the hangover
+    assert min(sent) >= SPEECH_START_FRAME - 200 // FRAME_MS - 2
+    assert max(sent) <= SPEECH_END_FRAME + 600 // FRAME_MS + 2
+    assert len(end_events) == 1
+    assert 0 < (end_events[0] - SPEECH_END_FRAME) * FRAME_MS <= 600
+    assert 0.15 <= stats["suppressed_fraction"] <= 0.4
+
+
+def test_fan_noise_becomes_the_noise_floor():
+    gate, sent, _, _ = gate_fixture("fan")
+    window = EnergyVAD().floor_window_frames
+
+    # A fan that is on from the first frame passes until the floor window has seen it all,
+    # then the gate closes for good
+    assert max(sent) <= window + 800 // FRAME_MS
+    assert gate.stats()["suppressed_fraction"] >= 0.25
+
+
+def test_hiss_is_suppressed():
+    gate, sent, end_events, _ = gate_fixture("hiss")
+
+    assert not sent and not end_events
+    assert gate.stats()["suppressed_fraction"] == 1.0
+
+
+async def gated_frames(samples, end_of_speech_silence_ms):
+    upstream = StreamedAudioInput()
+    gated = GatedAudioInput(upstream, VoiceGate(frame_ms=FRAME_MS), end_of_speech_silence_ms=end_of_speech_silence_ms)
+    for index in range(len(samples) // FRAME_SAMPLES):
+        await gated.add_audio(samples[index * FRAME_SAMPLES:(index + 1) * FRAME_SAMPLES])
+    frames = []
+    while not upstream.queue.empty():
+        frames.append(upstream.queue.get_nowait())
+    return frames
+
+
+def test_end_of_speech_padding_is_opt_in():
+    samples = read_wav(os.path.join(FIXTURES, "speech.wav"))
+
+    for silence_ms, padding in ((0.0, 0), (500.0, 500 // FRAME_MS)):
+        frames = asyncio.run(gated_frames(samples, silence_ms))
+        assert sum(1 for frame in frames if not np.any(frame)) == padding
+
+
+def test_speech_start_flushes_playback():
+    samples = read_wav(os.path.join(FIXTURES, "speech.wav"))
+    playback = JitterBuffer(SAMPLE_RATE)
+    starts = []
+
+    def on_speech_start():
+        starts.append(gate.frames_in - 1)
+        playback.flush()
+
+    gate = VoiceGate(frame_ms=FRAME_MS, on_speech_start=on_speech_start)
+
+    async def barge_in():
+        # A response is playing when the child starts talking over it
+        await playback.write(np.ones(SAMPLE_RATE, dtype=np.int16))
+        for index in range(len(samples) // FRAME_SAMPLES):
+            gate.process(samples[index * FRAME_SAMPLES:(index + 1) * FRAME_SAMPLES])
+            if index < SPEECH_START_FRAME:
+                assert playback.buffered_ms == 1000
+        # The rest of the interrupted response is dropped too
+        await playback.write(np.ones(SAMPLE_RATE, dtype=np.int16))
+
+    asyncio.run(barge_in())
+    assert len(starts) == 1
+    assert 0 <= starts[0] - SPEECH_START_FRAME < gate.start_frames + 1
+    assert playback.buffered_ms == 0 and playback.flushes == 1
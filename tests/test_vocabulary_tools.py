@@ -0,0 +1,57 @@
+"""The vocabulary tools against a session vocabulary read from the in-memory fake Firestore."""
+import asyncio
+import json
+
+import pytest
+from agents.tool_context import ToolContext
+
+from User_Firebase import get_write_queue, set_firestore_client
+from fake_firestore import FakeFirestore
+from my_workflow import LanguageTutorContext, has_seen_word, track_vocabulary, words_due_for_review
+
+STORED = {
+    "gato": {"word": "gato", "translation": "cat", "count": 2, "next_review": 0.0},
+    "perro": {"word": "perro", "translation": "dog", "count": 1, "next_review": 0.0},
+}
+
+
+@pytest.fixture
+def client():
+    client = FakeFirestore()
+    for word_id, fields in STORED.items():
+        client._write("Users/ID1/Vocabulary", word_id, fields)
+    set_firestore_client(client)
+    yield client
+    # Tracked words are queued process-wide; write them to this client before it goes
+    get_write_queue().flush()
+    set_firestore_client(None)
+
+
+def invoke(tool, session, arguments):
+    tool_context = ToolContext(session, tool_name=tool.name, tool_call_id="call", tool_arguments=json.dumps(arguments))
+    return asyncio.run(tool.on_invoke_tool(tool_context, json.dumps(arguments)))
+
+
+@pytest.mark.parametrize("first_tool, arguments", [
+    (has_seen_word, {"word": "gato"}),
+    (words_due_for_review, {"limit": 5}),
+    (track_vocabulary, {"word": "gato", "translation": "cat", "context": ""}),
+])
+def test_learned_words_include_stored_words_whichever_tool_reads_them(client, first_tool, arguments):
+    session = LanguageTutorContext(user_id="ID1")
+
+    invoke(first_tool, session, arguments)
+    assert session.learned_words == {"gato": "cat", "perro": "dog"}
+
+    invoke(track_vocabulary, session, {"word": "casa", "translation": "house", "context": ""})
+    assert session.learned_words == {"gato": "cat", "perro": "dog", "casa": "house"}
+
+
+def test_stored_words_are_read_once(client):
+    session = LanguageTutorContext(user_id="ID1")
+
+    assert "has seen 'gato' (cat) 2 times" in invoke(has_seen_word, session, {"word": "gato"})
+    tracked = invoke(track_vocabulary, session, {"word": "gato", "translation": "cat", "context": ""})
+    assert "practiced 3 times" in tracked
+    invoke(words_due_for_review, session, {"limit": 5})
+    assert client.round_trips == 1
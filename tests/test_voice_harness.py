@@ -0,0 +1,69 @@
+"""Replays the default script through the pipeline on stub models and checks the turn timings."""
+import asyncio
+import contextlib
+import io
+
+import my_workflow
+from User_Firebase import set_firestore_client
+from voice_harness import default_script, make_fake_firestore, run_harness
+
+ROUNDS = 2
+
+# The stub model and TTS delays add up to well under 100 ms a turn; this only catches gross regressions
+MAX_TURN_MS = 2000
+
+
+def test_default_script_turns():
+    script = default_script()
+    report = asyncio.run(run_harness(script, rounds=ROUNDS))
+
+    assert len(report.turns) == len(script) * ROUNDS
+    # Every session is greeted before its first turn
+    assert len(report.greetings) == ROUNDS
+    for round_start in range(0, len(report.turns), len(script)):
+        turns = report.turns[round_start:round_start + len(script)]
+        for turn, scripted in zip(turns, script):
+            assert turn.total is not None, turn.transcript
+            assert turn.time_to_first_audio is not None, turn.transcript
+            if scripted.handoff_to:
+                # The model handed off and the next agent answered in the same turn
+                assert turn.model_calls >= 2, turn.transcript
+                assert turn.handoff_overhead is not None, turn.transcript
+                assert turn.text == scripted.reply
+        # "Can we play car now?" is routed locally and never reaches the model
+        local = next(turn for turn in turns if turn.transcript == "Can we play car now?")
+        assert local.model_calls == 0
+        assert "Spanish Road Trip" in local.text
+
+
+def test_default_script_latency_percentiles():
+    report = asyncio.run(run_harness(default_script(), rounds=ROUNDS))
+    metrics = report.percentiles()
+
+    for name in ("time_to_first_text", "time_to_first_audio", "total"):
+        values = metrics[name]
+        assert values["count"] > 0, name
+        assert 0 < values["p50"] <= values["p90"] <= values["p99"], name
+    assert metrics["time_to_first_text"]["p50"] <= metrics["total"]["p50"]
+    assert metrics["time_to_first_audio"]["p99"] <= metrics["total"]["p99"]
+    assert metrics["total"]["p99"] < MAX_TURN_MS
+    for turn in report.turns:
+        if turn.time_to_first_text is not None:
+            assert turn.time_to_first_text <= turn.total
+        assert turn.time_to_first_audio <= turn.total
+
+
+def test_greeting_is_spoken_from_cacheable_segments():
+    client = make_fake_firestore()
+    set_firestore_client(client)
+    with contextlib.redirect_stdout(io.StringIO()):
+        my_workflow.configure_prompt_cache(client)
+        workflow = my_workflow.MyWorkflow(on_start=lambda _: None, user_id="NEW0")
+
+    async def greet():
+        return [segment async for segment in workflow.on_start()]
+
+    segments = asyncio.run(greet())
+    assert "".join(segments) == my_workflow.GREETING_NEW_USER
+    # The audio cache holds every segment, so the greeting plays without waiting on TTS
+    assert {segment.strip() for segment in segments} <= set(workflow.canned_utterances())
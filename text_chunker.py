@@ -0,0 +1,142 @@
+"""
+Clause- and sentence-sized text segments for streaming text-to-speech.
+
+The workflow's text arrives as word-sized deltas (or as one canned string).
+TextChunker turns it into segments that can be spoken on their own, emitting
+each one as soon as it is complete, so TTS starts on the first sentence or
+long clause instead of waiting for the paragraph:
+
+- sentences end at . ! ? and … (with any closing quotes or brackets), but not
+  after abbreviations like "Sr." or "Mrs." or inside numbers like 3.5
+- a Spanish ¿ or ¡ opens a new segment even without a full stop before it
+- clauses end at , ; : and dashes once the segment is long enough
+- nothing is shorter than min_chars (short pieces merge with the next one) and
+  nothing is longer than max_chars (split at the last space)
+
+The pipeline's own splitter would buffer the segments again, so pipelines fed
+by a chunking workflow use segment_tts_settings(), which sends every yielded
+segment to TTS as-is.
+"""
+from typing import List, Optional, Tuple
+
+from agents.voice import TTSModelSettings
+
+SENTENCE_END = ".!?…"
+CLAUSE_END = ",;:—–"
+# Characters that may follow a sentence end and still belong to the sentence
+CLOSERS = SENTENCE_END + "\"')]}»”’"
+OPENERS = "¿¡"
+
+# Words that end in a period without ending the sentence (lowercase, without the period)
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "e.g", "i.e",
+    "sr", "sra", "srta", "dra", "ud", "uds", "p.ej", "ej", "núm", "pág",
+}
+
+
+class TextChunker:
+    """
+    Incremental splitter of streamed text into speakable segments.
+
+    Args:
+        min_chars: Shortest segment emitted at a sentence end
+        max_chars: Longest segment; longer text is split at the last space
+        min_clause_chars: Shortest segment emitted at a clause break (None disables clause breaks)
+    """
+
+    def __init__(self, min_chars: int = 12, max_chars: int = 200, min_clause_chars: Optional[int] = 40):
+        self.min_chars = min_chars
+        self.max_chars = max(max_chars, min_chars)
+        self.min_clause_chars = min_clause_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the segments it completed."""
+        self._buffer += text
+        return self._drain(final=False)
+
+    def flush(self) -> List[str]:
+        """End of the response; returns whatever is left as the last segment(s)."""
+        return self._drain(final=True)
+
+    def split(self, text: str) -> List[str]:
+        """Split a complete text, e.g. a canned reply."""
+        return self.feed(text) + self.flush()
+
+    def _drain(self, final: bool) -> List[str]:
+        segments = []
+        while self._buffer:
+            end = self._boundary(self._buffer, final)
+            if end is None:
+                break
+            segment, self._buffer = self._buffer[:end], self._buffer[end:]
+            if segment.strip():
+                segments.append(segment)
+            elif segments:
+                segments[-1] += segment
+        return segments
+
+    def _boundary(self, text: str, final: bool) -> Optional[int]:
+        """End index (including trailing whitespace) of the first complete segment, if any."""
+        length = len(text)
+        i = 0
+        while i < length:
+            char = text[i]
+            if char in SENTENCE_END or char in CLAUSE_END:
+                end = i + 1
+                if char in SENTENCE_END:
+                    while end < length and text[end] in CLOSERS:
+                        end += 1
+                if end == length:
+                    # Can't tell "3." from "3.5" or "Hi!" from "Hi!!" until the next character
+                    break
+                if text[end].isspace() and self._is_break(text, i, end):
+                    return _skip_space(text, end)
+                i = end
+                continue
+            if char in OPENERS and i and text[i - 1].isspace() and len(text[:i].strip()) >= self.min_chars:
+                return i
+            i += 1
+
+        if length >= self.max_chars:
+            cut = text.rfind(" ", 0, self.max_chars)
+            return _skip_space(text, cut) if cut > 0 else self.max_chars
+        if final:
+            return length
+        return None
+
+    def _is_break(self, text: str, i: int, end: int) -> bool:
+        size = len(text[:end].strip())
+        if text[i] in CLAUSE_END:
+            return self.min_clause_chars is not None and size >= self.min_clause_chars
+        if size < self.min_chars:
+            return False
+        if text[i] == ".":
+            word = text[:i].rsplit(None, 1)[-1].lower() if text[:i].strip() else ""
+            if word.lstrip(OPENERS + "(\"'") in ABBREVIATIONS:
+                return False
+        return True
+
+
+def chunk_text(text: str, **options) -> List[str]:
+    """Split a complete text into segments (see TextChunker for the options)."""
+    return TextChunker(**options).split(text)
+
+
+def passthrough_splitter(text_buffer: str) -> Tuple[str, str]:
+    """TTS text splitter that speaks whatever it is given right away."""
+    if text_buffer.strip():
+        return text_buffer, ""
+    return "", text_buffer
+
+
+def segment_tts_settings(**settings) -> TTSModelSettings:
+    """TTSModelSettings for a pipeline whose workflow already yields complete segments."""
+    return TTSModelSettings(text_splitter=passthrough_splitter, **settings)
+
+
+def _skip_space(text: str, index: int) -> int:
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return index
+
@@ -0,0 +1,294 @@
+"""
+Client-side voice activity detection.
+
+Once recording is on, the mic sends every 20 ms frame upstream, silence
+included. VoiceGate sits between capture and StreamedAudioInput and forwards
+only speech:
+
+- a pluggable VADModel scores each int16 frame; EnergyVAD uses the frame's
+  energy against an adaptive noise floor plus its zero-crossing rate, so
+  steady background noise (a fan) and hiss don't count as speech
+- speech starts after `start_frames` speech frames in a row; the `pre_roll_ms`
+  before it is sent too, so soft word onsets aren't clipped
+- after speech, `hangover_ms` of trailing audio is still sent (the speech to
+  text service's own turn detection needs to hear the pause), then frames are
+  dropped until the next speech start
+- each utterance's start is reported through the on_speech_start callback
+  (e.g. to stop playback when the child barges in), and end of speech once
+  `end_of_speech_ms` of non-speech has passed, through on_end_of_speech
+
+GatedAudioInput wraps a StreamedAudioInput so any capture loop can use the gate.
+The SDK has no call that commits the speech to text input buffer in the middle
+of a stream, so to close the utterance upstream at end of speech it sends
+`end_of_speech_silence_ms` of silence at once. Server VAD turn detection
+counts silence in audio time, so when its silence_duration_ms is no longer
+than that it commits the turn as soon as the padding arrives, instead of
+waiting for that much real silence (which the gate would drop after the
+hangover anyway).
+"""
+import collections
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class VADModel:
+    """Scores frames; subclass and override speech_probability to plug in a model."""
+
+    def speech_probability(self, frame: np.ndarray) -> float:
+        """Probability (0-1) that an int16 frame contains speech."""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Forget any state carried between frames."""
+
+
+class EnergyVAD(VADModel):
+    """
+    Energy and zero-crossing-rate detector with an adaptive noise floor.
+
+    Args:
+        threshold_db: How far above the noise floor a frame's energy must be
+        min_speech_db: Frames quieter than this (dBFS) are never speech
+        max_zcr: Frames whose zero-crossing rate is above this are treated as noise
+            unless they are loud; voiced speech crosses zero far less often than hiss
+        noise_adapt: How fast the noise floor follows non-speech frames (0-1)
+        initial_noise_db: Noise floor before any frames have been seen
+        floor_window_frames: The floor is raised to the quietest frame of this many recent
+            frames, so noise that starts loud and never stops (a fan) becomes the floor
+            instead of counting as speech; speech has pauses quieter than that
+    """
+
+    def __init__(self, threshold_db: float = 12.0, min_speech_db: float = -50.0, max_zcr: float = 0.35,
+                 noise_adapt: float = 0.05, initial_noise_db: float = -60.0, floor_window_frames: int = 150):
+        self.threshold_db = threshold_db
+        self.min_speech_db = min_speech_db
+        self.max_zcr = max_zcr
+        self.noise_adapt = noise_adapt
+        self.initial_noise_db = initial_noise_db
+        self.noise_db = initial_noise_db
+        self.floor_window_frames = max(1, floor_window_frames)
+        self._recent_db = collections.deque(maxlen=self.floor_window_frames)
+
+    def reset(self) -> None:
+        self.noise_db = self.initial_noise_db
+        self._recent_db.clear()
+
+    def speech_probability(self, frame: np.ndarray) -> float:
+        energy_db, zcr = frame_features(frame)
+        self._recent_db.append(energy_db)
+        if len(self._recent_db) == self._recent_db.maxlen:
+            # Minimum statistics: nothing in the window was quieter than this, so it is noise
+            self.noise_db = max(self.noise_db, min(self._recent_db))
+        above = energy_db - self.noise_db
+        if energy_db < self.min_speech_db or above < self.threshold_db:
+            probability = 0.0
+        elif zcr > self.max_zcr and above < 2 * self.threshold_db:
+            probability = 0.0
+        else:
+            # Saturates at twice the threshold above the noise floor
+            probability = min(1.0, 0.5 + 0.5 * (above - self.threshold_db) / self.threshold_db)
+        if probability < 0.5:
+            # Track the floor only on non-speech frames, quickly downwards and slowly upwards
+            rate = 0.5 if energy_db < self.noise_db else self.noise_adapt
+            self.noise_db += rate * (energy_db - self.noise_db)
+        return probability
+
+
+def frame_features(frame: np.ndarray):
+    """
+    Energy and zero-crossing rate of an int16 (or float32) frame.
+
+    Returns:
+        Tuple of (RMS energy in dBFS, zero crossings per sample)
+    """
+    samples = frame.reshape(-1).astype(np.float32)
+    if frame.dtype == np.int16:
+        samples *= 1.0 / 32768.0
+    if not len(samples):
+        return -120.0, 0.0
+    energy = float(np.dot(samples, samples)) / len(samples)
+    energy_db = 10.0 * np.log10(energy + 1e-12)
+    signs = np.signbit(samples)
+    zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / len(samples)
+    return energy_db, zcr
+
+
+class VoiceGate:
+    """
+    Speech gate over fixed-size frames.
+
+    Args:
+        model: The frame scorer (defaults to EnergyVAD())
+        frame_ms: Duration of the frames passed to process()
+        pre_roll_ms: Audio before the speech start that is sent along with it
+        hangover_ms: Trailing audio still sent after speech stops
+        end_of_speech_ms: Non-speech after which end of speech is reported
+        start_frames: Consecutive speech frames needed to start sending
+        on_end_of_speech: Called (with no arguments) when end of speech is detected
+        on_speech_start: Called (with no arguments) when an utterance starts, including
+            speech that resumes within the hangover after end of speech was reported
+    """
+
+    def __init__(self, model: Optional[VADModel] = None, frame_ms: float = 20.0, pre_roll_ms: float = 200.0,
+                 hangover_ms: float = 600.0, end_of_speech_ms: float = 500.0, start_frames: int = 2,
+                 on_end_of_speech: Optional[Callable[[], None]] = None,
+                 on_speech_start: Optional[Callable[[], None]] = None):
+        self.model = model or EnergyVAD()
+        self.frame_ms = frame_ms
+        self.start_frames = max(1, start_frames)
+        self.hangover_frames = int(hangover_ms / frame_ms)
+        self.end_of_speech_frames = max(1, int(end_of_speech_ms / frame_ms))
+        self.on_end_of_speech = on_end_of_speech
+        self.on_speech_start = on_speech_start
+        # Holds the pre-roll plus the frames that are confirming a speech start. Frames are
+        # copied into preallocated slots, since capture reuses its frame buffers.
+        self._pending = collections.deque(maxlen=int(pre_roll_ms / frame_ms) + self.start_frames)
+        self._slots: Optional[np.ndarray] = None
+        self._next_slot = 0
+
+        self.speaking = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._utterance_open = False
+
+        self.frames_in = 0
+        self.frames_sent = 0
+        self.utterances = 0
+        self.end_of_speech_events = 0
+
+    def process(self, frame: np.ndarray) -> List[np.ndarray]:
+        """
+        Gate one frame.
+
+        Returns:
+            The frames to send upstream now (the pre-roll on a speech start, usually
+            just this frame while speaking, nothing during silence)
+        """
+        self.frames_in += 1
+        is_speech = self.model.speech_probability(frame) >= 0.5
+
+        if is_speech:
+            self._speech_run += 1
+            self._silence_run = 0
+        else:
+            self._speech_run = 0
+            self._silence_run += 1
+
+        if self.speaking:
+            if self._silence_run == self.end_of_speech_frames and self._utterance_open:
+                self._utterance_open = False
+                self.end_of_speech_events += 1
+                if self.on_end_of_speech is not None:
+                    self.on_end_of_speech()
+            if self._silence_run > self.hangover_frames:
+                self.speaking = False
+                self._pending.clear()
+                self._hold(frame)
+                return []
+            if is_speech and not self._utterance_open:
+                # Speech again after end of speech was reported, within the hangover
+                self._start_utterance()
+            self.frames_sent += 1
+            return [frame]
+
+        self._hold(frame)
+        if self._speech_run < self.start_frames:
+            return []
+        self.speaking = True
+        if not self._utterance_open:
+            self._start_utterance()
+        # Copies: the slots are reused for the next pre-roll while these may still be queued
+        frames = [held.copy() for held in self._pending]
+        self._pending.clear()
+        self.frames_sent += len(frames)
+        return frames
+
+    def _start_utterance(self) -> None:
+        self.utterances += 1
+        self._utterance_open = True
+        if self.on_speech_start is not None:
+            self.on_speech_start()
+
+    def _hold(self, frame: np.ndarray) -> None:
+        if self._slots is None or self._slots.shape[1:] != frame.shape or self._slots.dtype != frame.dtype:
+            self._slots = np.zeros((self._pending.maxlen + 1,) + frame.shape, dtype=frame.dtype)
+            self._pending.clear()
+        slot = self._slots[self._next_slot]
+        slot[...] = frame
+        self._next_slot = (self._next_slot + 1) % len(self._slots)
+        self._pending.append(slot)
+
+    def reset(self) -> None:
+        """Start over, e.g. when recording is switched off and on again."""
+        self.model.reset()
+        self._pending.clear()
+        self.speaking = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._utterance_open = False
+
+    @property
+    def suppressed_fraction(self) -> float:
+        """Share of frames that were not sent upstream."""
+        return 1.0 - self.frames_sent / self.frames_in if self.frames_in else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "frames_in": self.frames_in,
+            "frames_sent": self.frames_sent,
+            "suppressed_fraction": self.suppressed_fraction,
+            "utterances": self.utterances,
+            "end_of_speech_events": self.end_of_speech_events,
+        }
+
+
+class GatedAudioInput:
+    """
+    StreamedAudioInput wrapper that only passes on frames the VoiceGate lets through.
+
+    Args:
+        audio_input: The StreamedAudioInput to feed
+        gate: The voice gate (defaults to VoiceGate())
+        end_of_speech_silence_ms: Silence sent upstream at once when the gate detects
+            end of speech (0 sends none); match the STT turn detection's silence_duration_ms
+    """
+
+    def __init__(self, audio_input, gate: Optional[VoiceGate] = None, end_of_speech_silence_ms: float = 0.0):
+        self.audio_input = audio_input
+        self.gate = gate or VoiceGate()
+        self.end_of_speech_silence_ms = end_of_speech_silence_ms
+        # Shared, never written: only read by the STT sender
+        self._silence: Optional[np.ndarray] = None
+
+    @property
+    def queue(self):
+        # CallbackCapture checks the consumer backlog through this
+        return self.audio_input.queue
+
+    @property
+    def pool(self):
+        # Capture acquires frames from the wrapped input's frame pool, if it has one
+        return getattr(self.audio_input, "pool", None)
+
+    async def add_audio(self, audio) -> None:
+        if audio is None:
+            # End of stream always goes through
+            await self.audio_input.add_audio(None)
+            return
+        ended = self.gate.end_of_speech_events
+        frames = self.gate.process(audio)
+        if self.gate.end_of_speech_events != ended and self.end_of_speech_silence_ms > 0:
+            frames = frames + self._silence_frames(audio)
+        if self.pool is not None and not any(frame is audio for frame in frames):
+            # Dropped (or sent as a pre-roll copy): nobody downstream will release it
+            self.pool.release(audio)
+        for frame in frames:
+            await self.audio_input.add_audio(frame)
+
+    def _silence_frames(self, like: np.ndarray) -> List[np.ndarray]:
+        if self._silence is None or self._silence.shape != like.shape or self._silence.dtype != like.dtype:
+            self._silence = np.zeros_like(like)
+            self._silence.flags.writeable = False
+        count = int(np.ceil(self.end_of_speech_silence_ms / self.gate.frame_ms))
+        return [self._silence] * count
@@ -0,0 +1,147 @@
+"""
+Per-child vocabulary index.
+
+Every word a game teaches is recorded in an in-memory index keyed by the
+normalized Spanish word, with a count, first/last seen timestamps and a
+spaced-repetition review time. Lookups ("has this child seen this word?") are
+dict lookups and "words due for review" comes from a heap, so agents can query
+the index inside a turn without a Firestore round trip.
+
+The child's existing vocabulary is read from Users/{id}/Vocabulary once per
+session, on first use, and every change is queued on the write-behind queue,
+which persists the collection in batches.
+"""
+import asyncio
+import heapq
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Review intervals double with each encounter, starting from this
+REVIEW_BASE_S = 600.0
+
+
+def normalize_word(word: str) -> str:
+    """Index key (and Firestore document ID) for a word."""
+    return " ".join(word.strip().lower().split()).replace("/", "_")
+
+
+@dataclass
+class VocabularyEntry:
+    word: str
+    translation: str
+    context: str = ""
+    count: int = 0
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    next_review: float = 0.0
+
+
+class VocabularyIndex:
+    """
+    One child's vocabulary for the duration of a session.
+
+    Args:
+        user_id: The child's user ID
+        loader: Async callable returning the stored Vocabulary documents by ID
+        writer: Called with (user_id, doc_id, fields) for every change
+        review_base_s: Review interval after the first encounter
+    """
+
+    def __init__(self, user_id: str, loader: Callable, writer: Callable,
+                 review_base_s: float = REVIEW_BASE_S):
+        self.user_id = user_id
+        self._loader = loader
+        self._writer = writer
+        self.review_base_s = review_base_s
+
+        self._entries: Dict[str, VocabularyEntry] = {}
+        # (next_review, key); entries rescheduled since being pushed are skipped when popped
+        self._due: List[Tuple[float, str]] = []
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def ensure_loaded(self) -> None:
+        """Read the stored vocabulary the first time it is needed; later calls return immediately."""
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._loaded:
+                return
+            stored = await self._loader(self.user_id)
+            for key, data in stored.items():
+                # A word tracked before the load finished keeps its newer state
+                if key not in self._entries:
+                    entry = VocabularyEntry(**{name: data[name] for name in VocabularyEntry.__dataclass_fields__
+                                               if name in data})
+                    self._entries[key] = entry
+                    heapq.heappush(self._due, (entry.next_review, key))
+            self._loaded = True
+
+    async def track(self, word: str, translation: str, context: str = "",
+                    now: Optional[float] = None) -> VocabularyEntry:
+        """
+        Record that a word was taught and schedule its next review.
+
+        Returns:
+            The updated entry
+        """
+        await self.ensure_loaded()
+        now = time.time() if now is None else now
+        key = normalize_word(word)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = VocabularyEntry(word=word.strip(), translation=translation, context=context, first_seen=now)
+            self._entries[key] = entry
+        else:
+            entry.translation = translation or entry.translation
+            entry.context = context or entry.context
+        entry.count += 1
+        entry.last_seen = now
+        entry.next_review = now + self.review_base_s * 2 ** (entry.count - 1)
+        heapq.heappush(self._due, (entry.next_review, key))
+
+        self._writer(self.user_id, key, asdict(entry))
+        return entry
+
+    def has_seen(self, word: str) -> bool:
+        return normalize_word(word) in self._entries
+
+    def get(self, word: str) -> Optional[VocabularyEntry]:
+        return self._entries.get(normalize_word(word))
+
+    def due_for_review(self, limit: int = 5, now: Optional[float] = None) -> List[VocabularyEntry]:
+        """
+        Words whose review time has passed, most overdue first.
+
+        Costs O(k log n) for k returned words.
+        """
+        now = time.time() if now is None else now
+        due, keep = [], []
+        while self._due and len(due) < limit and self._due[0][0] <= now:
+            next_review, key = heapq.heappop(self._due)
+            entry = self._entries.get(key)
+            if entry is None or entry.next_review != next_review:
+                continue  # Stale heap item from before the word was rescheduled
+            due.append(entry)
+            keep.append((next_review, key))
+        # Reviewing is up to the agent, so the words stay due until tracked again
+        for item in keep:
+            heapq.heappush(self._due, item)
+        return due
+
+    def words(self) -> Dict[str, str]:
+        """Spanish words mapped to their translations."""
+        return {entry.word: entry.translation for entry in self._entries.values()}
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {key: asdict(entry) for key, entry in self._entries.items()}
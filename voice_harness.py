@@ -0,0 +1,409 @@
+"""
+Headless benchmark harness for the VoicePipeline + MyWorkflow turn loop.
+
+Replays a scripted conversation (transcriptions, optionally with WAV audio per
+turn) through StreamedAudioInput using FakeFirestore, a stub model provider and
+stub speech models, and reports per-turn latency percentiles:
+
+- time to first text chunk from the workflow
+- time to first audio byte out of the pipeline
+- total turn time
+- handoff overhead (time between model calls within a turn)
+- handoff finish (the workflow's own handoff handling after the last chunk) and
+  how much of it speculative pre-warming saved
+- time to first audio of turns answered locally, which --audio-cache serves
+  from pre-synthesized clips
+
+Nothing touches the network, so it runs under plain pytest
+(tests/test_voice_harness.py, `python -m pytest`):
+
+    report = asyncio.run(run_harness(default_script(), rounds=3))
+
+or run directly:
+
+    python voice_harness.py --rounds 5 --first-token-ms 80
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+import wave
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from agents import RunConfig, set_tracing_disabled
+from agents.voice import StreamedAudioInput, VoicePipeline, VoicePipelineConfig, VoiceWorkflowBase
+
+import my_workflow
+from audio_cache import AudioCache, CachedVoiceModelProvider
+from User_Firebase import set_firestore_client
+from fake_firestore import FakeFirestore, load_prompts_into
+from stub_models import ScriptedSTTModel, StubModelProvider, StubReply, StubTTSModel, StubVoiceModelProvider
+from text_chunker import segment_tts_settings
+
+SAMPLE_RATE = 24000
+FRAME_SAMPLES = int(SAMPLE_RATE * 0.02)
+
+USER_INFO_PROMPT = (
+    "You are Amigo, a friendly Spanish tutor. Ask the child for their name and age, "
+    "then call save_user_info and hand off to the ChoiceLayer."
+)
+
+
+@dataclass
+class ScriptedTurn:
+    """
+    One turn of a scripted conversation.
+
+    Attributes:
+        transcript: What the child "said"
+        reply: What the stub model answers
+        handoff_to: Agent name the model hands off to before answering
+        tool_calls: [tool name, arguments] calls the model makes before handing off and answering
+        wav: Optional WAV file streamed through StreamedAudioInput before the transcript
+        audio_ms: Length of silence streamed when no WAV file is given
+    """
+    transcript: str
+    reply: str = "¡Muy bien! Can you say hola?"
+    handoff_to: Optional[str] = None
+    tool_calls: List[list] = field(default_factory=list)
+    wav: Optional[str] = None
+    audio_ms: int = 600
+
+
+@dataclass
+class TurnTiming:
+    transcript: str
+    text: str = ""
+    time_to_first_text: Optional[float] = None
+    time_to_first_audio: Optional[float] = None
+    total: Optional[float] = None
+    handoff_overhead: Optional[float] = None
+    handoff_finish: Optional[float] = None
+    prewarm_saved: Optional[float] = None
+    model_calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+
+@dataclass
+class HarnessReport:
+    turns: List[TurnTiming] = field(default_factory=list)
+    # Per session: seconds from the start of the pipeline to the greeting's first audio
+    greetings: List[float] = field(default_factory=list)
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """Latency percentiles in milliseconds per metric."""
+        metrics = {}
+        for name in ("time_to_first_text", "time_to_first_audio", "total", "handoff_overhead",
+                     "handoff_finish", "prewarm_saved"):
+            values = sorted(getattr(turn, name) for turn in self.turns if getattr(turn, name) is not None)
+            metrics[name] = {f"p{p}": _percentile(values, p / 100) * 1000 for p in (50, 90, 99)}
+            metrics[name]["count"] = len(values)
+        # Turns answered without a model call speak only fixed replies, which the audio cache serves
+        values = sorted(turn.time_to_first_audio for turn in self.turns
+                        if not turn.model_calls and turn.time_to_first_audio is not None)
+        metrics["local_first_audio"] = {f"p{p}": _percentile(values, p / 100) * 1000 for p in (50, 90, 99)}
+        metrics["local_first_audio"]["count"] = len(values)
+        values = sorted(self.greetings)
+        metrics["greeting_first_audio"] = {f"p{p}": _percentile(values, p / 100) * 1000 for p in (50, 90, 99)}
+        metrics["greeting_first_audio"]["count"] = len(values)
+        return metrics
+
+    def format(self) -> str:
+        lines = [f"{'metric':<22}{'p50':>10}{'p90':>10}{'p99':>10}{'n':>6}"]
+        for name, values in self.percentiles().items():
+            lines.append(f"{name:<22}{values['p50']:>8.1f}ms{values['p90']:>8.1f}ms"
+                         f"{values['p99']:>8.1f}ms{values['count']:>6}")
+        model_turns = [turn for turn in self.turns if turn.model_calls]
+        for name in ("input_tokens", "cached_tokens"):
+            tokens = sorted(getattr(turn, name) for turn in model_turns)
+            if tokens:
+                lines.append(f"{name:<22}{_percentile(tokens, 0.5):>10}{_percentile(tokens, 0.9):>10}"
+                             f"{_percentile(tokens, 0.99):>10}{len(tokens):>6}")
+        if model_turns:
+            lines.append(f"{'cache_hit_rate':<22}{self.cache_hit_rate() * 100:>9.1f}%")
+        return "\n".join(lines)
+
+    def cache_hit_rate(self) -> float:
+        """Share of input tokens served from the (simulated) provider prompt cache."""
+        total = sum(turn.input_tokens for turn in self.turns)
+        return sum(turn.cached_tokens for turn in self.turns) / total if total else 0.0
+
+
+def default_script() -> List[ScriptedTurn]:
+    """A short session: small talk, a model-driven handoff, a local game switch and play."""
+    return [
+        ScriptedTurn("Hola Amigo!", "¡Hola! Do you want to play a game? We can go on a road trip or visit the zoo!"),
+        ScriptedTurn("Let's go see the animals", "Welcome to the zoo! Look, an elephant! Can you say elefante?",
+                     handoff_to="ZOO"),
+        ScriptedTurn("elefante", "¡Perfecto! You said elefante! What color is the elephant?"),
+        ScriptedTurn("Can we play car now?"),
+        ScriptedTurn("rojo", "¡Sí! Rojo is red, like a shiny apple, a fire truck and a ladybug on a leaf; "
+                             "now look out of the window of our magical car, because I can see something blue "
+                             "flying in the sky, and I wonder if you know what it is called in Spanish?"),
+    ]
+
+
+def new_user_script() -> List[ScriptedTurn]:
+    """A first session: the model collects the name and age, saves them and hands off to the ChoiceLayer."""
+    return [
+        ScriptedTurn("Hola!", "¡Hola! I'm Amigo! What's your name?"),
+        ScriptedTurn("Leo", "Nice to meet you, Leo! How old are you?"),
+        ScriptedTurn("I just turned six last week", "Six, wow! What would you like to play, Leo?",
+                     handoff_to="ChoiceLayer", tool_calls=[["save_user_info", {"name": "Leo", "age": 6}]]),
+        ScriptedTurn("Let's go see the animals", "Welcome to the zoo! Look, an elephant! Can you say elefante?",
+                     handoff_to="ZOO"),
+    ]
+
+
+def make_fake_firestore(prompts_file: str = "prompts_backup.json", latency_s: float = 0.0,
+                        templated: bool = False) -> FakeFirestore:
+    """
+    FakeFirestore seeded with the prompt backup and a user that already has a name and age.
+
+    Args:
+        prompts_file: Prompts backup to seed from
+        latency_s: Simulated round trip time
+        templated: Add ${user.name}/${user.age} templates to every prompt, so user changes rebuild the agents
+    """
+    client = FakeFirestore(latency_s=latency_s)
+    load_prompts_into(client, prompts_file, extra_prompts={"USER_INFO_PROMPT": USER_INFO_PROMPT})
+    if templated:
+        for prompt_id, data in client._snapshot("Prompts"):
+            client._write("Prompts", prompt_id,
+                          {"content": f"{data['content']}\n\nThe child is ${{user.name}}, age ${{user.age}}."})
+    client._write("Users", "ID1", {"name": "Sofia", "age": 6, "language": "Spanish", "proficiency": "Beginner"})
+    return client
+
+
+class _TimedWorkflow(VoiceWorkflowBase):
+    """Wraps a workflow and records when it yields its first text chunk."""
+
+    def __init__(self, inner: VoiceWorkflowBase):
+        self.inner = inner
+        self.first_text_at: Optional[float] = None
+        self.text = ""
+
+    async def on_start(self) -> AsyncIterator[str]:
+        async for chunk in self.inner.on_start():
+            yield chunk
+
+    async def run(self, transcription: str) -> AsyncIterator[str]:
+        self.first_text_at = None
+        self.text = ""
+        async for chunk in self.inner.run(transcription):
+            if self.first_text_at is None and chunk:
+                self.first_text_at = time.perf_counter()
+            self.text += chunk
+            yield chunk
+
+
+def _read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        channels = wav.getnchannels()
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples
+
+
+async def _push_audio(audio_input: StreamedAudioInput, turn: ScriptedTurn, realtime: bool) -> None:
+    samples = _read_wav(turn.wav) if turn.wav else np.zeros(SAMPLE_RATE * turn.audio_ms // 1000, dtype=np.int16)
+    for start in range(0, len(samples), FRAME_SAMPLES):
+        await audio_input.add_audio(samples[start:start + FRAME_SAMPLES])
+        if realtime:
+            await asyncio.sleep(FRAME_SAMPLES / SAMPLE_RATE)
+
+
+async def run_harness(script: List[ScriptedTurn], rounds: int = 1,
+                      model_provider: Optional[StubModelProvider] = None,
+                      tts: Optional[StubTTSModel] = None,
+                      firestore_client: Optional[FakeFirestore] = None,
+                      realtime_audio: bool = False,
+                      workflow_options: Optional[dict] = None,
+                      repeat: int = 1,
+                      new_user: bool = False,
+                      audio_cache: Optional[AudioCache] = None,
+                      quiet: bool = True) -> HarnessReport:
+    """
+    Replay a scripted conversation through VoicePipeline and MyWorkflow.
+
+    Args:
+        script: The turns to play; a fresh session is started per round
+        rounds: How many times to replay the script
+        model_provider: Stub model provider (defaults to StubModelProvider())
+        tts: Stub TTS model (defaults to StubTTSModel())
+        firestore_client: Fake Firestore (defaults to make_fake_firestore())
+        realtime_audio: Pace audio frames in real time instead of pushing them at once
+        workflow_options: Extra keyword arguments for MyWorkflow
+        repeat: Play the script this many times back to back within each session
+        new_user: Start every round as a user Firestore has never seen (no name or age)
+        audio_cache: Serve and store the workflow's fixed replies through this cache
+        quiet: Swallow the workflow's debug output
+
+    Returns:
+        Timings of every turn
+    """
+    set_tracing_disabled(True)
+    model_provider = model_provider or StubModelProvider()
+    tts = tts or StubTTSModel()
+    client = firestore_client or make_fake_firestore()
+    set_firestore_client(client)
+    output = io.StringIO() if quiet else None
+
+    report = HarnessReport()
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        my_workflow.configure_prompt_cache(client)
+        for round_number in range(rounds):
+            user_id = f"NEW{round_number}" if new_user else "ID1"
+            await _run_session(script * repeat, report, model_provider, tts, realtime_audio, workflow_options or {},
+                               user_id, audio_cache)
+    return report
+
+
+async def _run_session(script, report, model_provider, tts, realtime_audio, workflow_options, user_id,
+                       audio_cache) -> None:
+    stt = ScriptedSTTModel()
+    workflow = _TimedWorkflow(await my_workflow.MyWorkflow.create(
+        on_start=lambda _: None,
+        user_id=user_id,
+        run_config=RunConfig(model_provider=model_provider, tracing_disabled=True),
+        audio_cache=audio_cache,
+        **workflow_options,
+    ))
+    voice_provider = StubVoiceModelProvider(stt, tts)
+    if audio_cache is not None:
+        voice_provider = CachedVoiceModelProvider(voice_provider, audio_cache)
+    config = VoicePipelineConfig(model_provider=voice_provider, tracing_disabled=True)
+    if workflow.inner.tts_chunking:
+        # The workflow yields complete segments; speak each one right away
+        config.tts_settings = segment_tts_settings()
+    pipeline = VoicePipeline(workflow=workflow, config=config)
+    audio_input = StreamedAudioInput()
+    started = time.perf_counter()
+    result = await pipeline.run(audio_input)
+    events = result.stream()
+
+    # The workflow greets the child before the first turn
+    greeting_audio = None
+    async for event in events:
+        if event.type == "voice_stream_event_audio" and greeting_audio is None:
+            greeting_audio = time.perf_counter() - started
+        elif event.type == "voice_stream_event_lifecycle" and event.event == "turn_ended":
+            break
+        elif event.type == "voice_stream_event_error":
+            raise event.error
+    if greeting_audio is not None:
+        report.greetings.append(greeting_audio)
+
+    for turn in script:
+        await _push_audio(audio_input, turn, realtime_audio)
+        model_provider.queue_reply(StubReply(turn.reply, turn.handoff_to, [tuple(call) for call in turn.tool_calls]))
+        model_provider.start_turn()
+        first_call = len(model_provider.calls)
+        handoffs_before = len(workflow.inner.handoff_prewarms)
+
+        timing = TurnTiming(turn.transcript)
+        started = time.perf_counter()
+        stt.end_utterance(turn.transcript)
+
+        async for event in events:
+            if event.type == "voice_stream_event_audio" and timing.time_to_first_audio is None:
+                timing.time_to_first_audio = time.perf_counter() - started
+            elif event.type == "voice_stream_event_lifecycle" and event.event == "turn_ended":
+                timing.total = time.perf_counter() - started
+                break
+            elif event.type == "voice_stream_event_error":
+                raise event.error
+
+        timing.text = workflow.text
+        if workflow.first_text_at is not None:
+            timing.time_to_first_text = workflow.first_text_at - started
+        calls = model_provider.calls[first_call:]
+        timing.model_calls = len(calls)
+        timing.input_tokens = sum(call.input_tokens for call in calls)
+        timing.cached_tokens = sum(call.cached_tokens for call in calls)
+        if any(call.handoff for call in calls):
+            timing.handoff_overhead = sum(nxt.started - prev.finished for prev, nxt in zip(calls, calls[1:]))
+        if len(workflow.inner.handoff_prewarms) > handoffs_before:
+            prewarm = workflow.inner.handoff_prewarms[-1]
+            timing.handoff_finish = prewarm.finish_ms / 1000
+            timing.prewarm_saved = prewarm.saved_ms / 1000
+        report.turns.append(timing)
+
+    stt.end_session()
+    async for _ in events:
+        pass
+    await workflow.inner.close()
+
+
+def load_script(path: str) -> List[ScriptedTurn]:
+    """Load a script from a JSON list of ScriptedTurn fields."""
+    with open(path) as f:
+        return [ScriptedTurn(**turn) for turn in json.load(f)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless VoicePipeline + MyWorkflow latency benchmark")
+    parser.add_argument("--script", help="JSON file with scripted turns (defaults to a built-in session)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--tts-first-byte-ms", type=float, default=30.0)
+    parser.add_argument("--firestore-latency-ms", type=float, default=0.0)
+    parser.add_argument("--realtime-audio", action="store_true")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the script within each session")
+    parser.add_argument("--history-budget", type=int, default=3000, help="Conversation history token budget")
+    parser.add_argument("--summarize-history", action="store_true")
+    parser.add_argument("--new-user", action="store_true",
+                        help="Play the first-session script (name/age collection, then a handoff)")
+    parser.add_argument("--templated-prompts", action="store_true",
+                        help="Add user templates to the prompts so the handoff after save_user_info rebuilds agents")
+    parser.add_argument("--no-prewarm", action="store_true", help="Disable speculative handoff preparation")
+    parser.add_argument("--no-chunking", action="store_true",
+                        help="Yield raw text deltas and leave segmentation to the pipeline's sentence splitter")
+    parser.add_argument("--audio-cache", action="store_true",
+                        help="Serve the fixed replies from an in-memory audio cache (filled by the first round)")
+    args = parser.parse_args()
+
+    if args.script:
+        script = load_script(args.script)
+    else:
+        script = new_user_script() if args.new_user else default_script()
+    audio_cache = AudioCache(None) if args.audio_cache else None
+    report = asyncio.run(run_harness(
+        script,
+        rounds=args.rounds,
+        model_provider=StubModelProvider(args.first_token_ms / 1000, args.token_ms / 1000),
+        tts=StubTTSModel(first_byte_delay_s=args.tts_first_byte_ms / 1000),
+        firestore_client=make_fake_firestore(latency_s=args.firestore_latency_ms / 1000,
+                                             templated=args.templated_prompts),
+        realtime_audio=args.realtime_audio,
+        workflow_options={"history_token_budget": args.history_budget,
+                          "summarize_history": args.summarize_history,
+                          "speculative_prewarm": not args.no_prewarm,
+                          "tts_chunking": not args.no_chunking},
+        repeat=args.repeat,
+        new_user=args.new_user,
+        audio_cache=audio_cache,
+    ))
+    print(report.format())
+    if audio_cache is not None:
+        stats = audio_cache.stats()
+        print(f"audio cache: {stats['hits']} hits, {stats['misses']} misses, {stats['stores']} clips stored")
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+if __name__ == "__main__":
+    main()
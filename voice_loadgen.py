@@ -0,0 +1,224 @@
+"""
+Load generator for voice_server.py.
+
+Opens N concurrent sessions per concurrency level, each playing a few turns
+(20 ms PCM frames followed by the utterance transcript), and reports turn
+latency percentiles and how many sessions one core of the server sustains at
+that level (from the server's CPU time, read over a stats connection).
+
+Without --host it starts `voice_server.py --stub --quiet` on a free port, so
+the whole run is offline:
+
+    python voice_loadgen.py --concurrency 1,4,16,64 --turns 4
+    python voice_loadgen.py --host 10.0.0.5 --port 8765 --concurrency 8,32
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from voice_protocol import (
+    KIND_AUDIO, KIND_END, KIND_EVENT, KIND_HELLO, KIND_STATS, KIND_TEXT,
+    SAMPLE_RATE, encode_frame, encode_json, read_frame,
+)
+
+FRAME_MS = 20
+TRANSCRIPTS = [
+    "Hola Amigo!",
+    "Let's go see the animals",
+    "elefante",
+    "rojo",
+    "How do you say dog?",
+]
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    turn_latencies: List[float] = field(default_factory=list)
+    first_audio_latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    wall_s: float = 0.0
+    server_cpu_s: Optional[float] = None
+
+    @property
+    def cores_used(self) -> Optional[float]:
+        if self.server_cpu_s is None or not self.wall_s:
+            return None
+        return self.server_cpu_s / self.wall_s
+
+    @property
+    def sessions_per_core(self) -> Optional[float]:
+        cores = self.cores_used
+        return self.concurrency / cores if cores else None
+
+    def format(self) -> str:
+        turn = sorted(self.turn_latencies)
+        audio = sorted(self.first_audio_latencies)
+        cores = self.cores_used
+        per_core = self.sessions_per_core
+        return (f"{self.concurrency:>11}{len(turn):>7}"
+                f"{_percentile(audio, 0.5) * 1000:>10.1f}{_percentile(audio, 0.99) * 1000:>10.1f}"
+                f"{_percentile(turn, 0.5) * 1000:>10.1f}{_percentile(turn, 0.99) * 1000:>10.1f}"
+                f"{(f'{cores * 100:.0f}%' if cores is not None else '-'):>8}"
+                f"{(f'{per_core:.1f}' if per_core is not None else '-'):>10}{self.errors:>7}")
+
+
+HEADER_LINE = (f"{'concurrency':>11}{'turns':>7}{'ttfa p50':>10}{'ttfa p99':>10}"
+               f"{'turn p50':>10}{'turn p99':>10}{'cpu':>8}{'sess/core':>10}{'errors':>7}")
+
+
+async def query_stats(host: str, port: int) -> dict:
+    """Read the server's counters over a short-lived control connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(encode_frame(KIND_STATS))
+        await writer.drain()
+        _, payload = await read_frame(reader)
+        return json.loads(payload)
+    finally:
+        writer.close()
+
+
+async def run_session(host: str, port: int, user_id: str, turns: int, audio_ms: int,
+                      realtime: bool, result: LevelResult) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    frame = encode_frame(KIND_AUDIO, bytes(SAMPLE_RATE * FRAME_MS // 1000 * 2))
+    try:
+        writer.write(encode_json(KIND_HELLO, {"user_id": user_id}))
+        await _wait_for_event(reader, "ready")
+        # The greeting is spoken first, as a turn of its own
+        await _wait_for_event(reader, "turn_ended")
+
+        for turn in range(turns):
+            for _ in range(max(1, audio_ms // FRAME_MS)):
+                writer.write(frame)
+                await writer.drain()
+                if realtime:
+                    await asyncio.sleep(FRAME_MS / 1000)
+            writer.write(encode_frame(KIND_TEXT, TRANSCRIPTS[turn % len(TRANSCRIPTS)].encode()))
+            await writer.drain()
+            started = time.perf_counter()
+
+            first_audio = None
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == KIND_AUDIO and first_audio is None:
+                    first_audio = time.perf_counter() - started
+                elif kind == KIND_EVENT:
+                    event = json.loads(payload)
+                    if event["event"] == "turn_ended":
+                        break
+                    if event["event"] == "error":
+                        raise RuntimeError(event.get("message"))
+            result.turn_latencies.append(time.perf_counter() - started)
+            if first_audio is not None:
+                result.first_audio_latencies.append(first_audio)
+
+        writer.write(encode_frame(KIND_END))
+        await writer.drain()
+        await _wait_for_event(reader, "session_ended")
+    except (RuntimeError, ConnectionError, asyncio.IncompleteReadError):
+        result.errors += 1
+    finally:
+        writer.close()
+
+
+async def _wait_for_event(reader: asyncio.StreamReader, name: str) -> None:
+    while True:
+        kind, payload = await read_frame(reader)
+        if kind != KIND_EVENT:
+            continue
+        event = json.loads(payload)
+        if event["event"] == name:
+            return
+        if event["event"] == "error":
+            raise RuntimeError(event.get("message"))
+
+
+async def run_level(host: str, port: int, concurrency: int, turns: int, audio_ms: int,
+                    realtime: bool) -> LevelResult:
+    result = LevelResult(concurrency)
+    before = await query_stats(host, port)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(host, port, "ID1", turns, audio_ms, realtime, result)
+        for _ in range(concurrency)
+    ))
+    result.wall_s = time.perf_counter() - started
+    after = await query_stats(host, port)
+    result.server_cpu_s = after["cpu_s"] - before["cpu_s"]
+    return result
+
+
+def _spawn_server(first_token_ms: float) -> tuple:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "voice_server.py", "--stub", "--quiet", "--port", str(port),
+         "--stats-interval", "0", "--first-token-ms", str(first_token_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("voice_server.py exited during startup")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("voice_server.py did not start listening in time")
+
+
+async def run_loadgen(host: str, port: int, levels: List[int], turns: int, audio_ms: int,
+                      realtime: bool) -> List[LevelResult]:
+    print(HEADER_LINE)
+    results = []
+    for concurrency in levels:
+        result = await run_level(host, port, concurrency, turns, audio_ms, realtime)
+        print(result.format())
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent session load generator for voice_server.py")
+    parser.add_argument("--host", help="Server to test (defaults to a local --stub server)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated session counts")
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--audio-ms", type=int, default=600, help="Audio sent per turn before the transcript")
+    parser.add_argument("--realtime", action="store_true", help="Pace audio frames in real time")
+    parser.add_argument("--first-token-ms", type=float, default=50.0, help="Stub model delay for a spawned server")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    process = None
+    host, port = args.host, args.port
+    if host is None:
+        process, port = _spawn_server(args.first_token_ms)
+        host = "127.0.0.1"
+    try:
+        asyncio.run(run_loadgen(host, port, levels, args.turns, args.audio_ms, args.realtime))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+if __name__ == "__main__":
+    main()
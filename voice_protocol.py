@@ -0,0 +1,47 @@
+"""
+Wire protocol shared by voice_server.py and voice_loadgen.py.
+
+Every frame is a 1-byte kind, a 4-byte big-endian payload length and the
+payload; see voice_server.py for the meaning of each kind.
+"""
+import asyncio
+import json
+import struct
+from typing import Tuple
+
+SAMPLE_RATE = 24000
+
+HEADER = struct.Struct(">cI")
+MAX_PAYLOAD = 1 << 20
+
+KIND_HELLO = b"H"
+KIND_AUDIO = b"A"
+KIND_TEXT = b"T"
+KIND_END = b"E"
+KIND_STATS = b"Q"
+KIND_EVENT = b"L"
+
+
+def encode_frame(kind: bytes, payload: bytes = b"") -> bytes:
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+def encode_json(kind: bytes, message: dict) -> bytes:
+    return encode_frame(kind, json.dumps(message).encode())
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bytes, bytes]:
+    """
+    Read one frame.
+
+    Returns:
+        Tuple of (kind, payload)
+
+    Raises:
+        asyncio.IncompleteReadError: If the peer closed the connection
+        ValueError: If the frame is larger than MAX_PAYLOAD
+    """
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"Frame of {length} bytes exceeds the {MAX_PAYLOAD} byte limit")
+    return kind, await reader.readexactly(length)
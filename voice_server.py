@@ -0,0 +1,376 @@
+"""
+Multi-session voice server.
+
+Serves many children from one process: every TCP connection gets its own
+MyWorkflow, VoicePipeline and StreamedAudioInput on a shared event loop, while
+the Firestore client, the prompt cache, the compiled templates and the model
+providers are created once and shared by all sessions.
+
+Wire protocol (both directions): a 1-byte frame kind, a 4-byte big-endian
+payload length, then the payload.
+
+    H  client -> server  hello, JSON {"user_id": "ID1"}
+    A  both directions   16-bit mono PCM at 24 kHz
+    T  client -> server  end of utterance with its transcript (--stub only)
+    E  client -> server  end of session
+    Q  both directions   server stats request / JSON response
+    L  server -> client  JSON event: ready, transcript, turn_started,
+                         turn_ended, session_ended, error
+
+After ready the session speaks its greeting as a turn of its own (audio
+between turn_started and turn_ended) before it answers the first utterance.
+
+Backpressure: each session's StreamedAudioInput queue is bounded, so when the
+pipeline falls behind the server stops reading that socket and TCP pushes back
+on the client; outbound audio waits for the socket to drain before the next
+event is taken from the pipeline.
+
+    python voice_server.py --port 8765
+    python voice_server.py --port 8765 --stub --quiet   # offline, for voice_loadgen.py
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from agents import RunConfig, set_tracing_disabled
+from agents.voice import StreamedAudioInput, VoicePipeline, VoicePipelineConfig
+
+import my_workflow
+from audio_cache import DEFAULT_CACHE_DIR, AudioCache, CachedVoiceModelProvider
+from User_Firebase import get_write_queue
+from text_chunker import segment_tts_settings
+from voice_protocol import (
+    HEADER, KIND_AUDIO, KIND_END, KIND_EVENT, KIND_HELLO, KIND_STATS, KIND_TEXT, read_frame,
+)
+
+
+def log_server(message: str) -> None:
+    """Server status lines go to stderr so they survive --quiet."""
+    print(f"[SERVER] {message}", file=sys.stderr)
+
+
+class VoiceSession:
+    """One connected child: a MyWorkflow and a VoicePipeline bound to a socket."""
+
+    def __init__(self, server: "VoiceServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.user_id: Optional[str] = None
+        self.turns = 0
+        self._stt = None
+        self._model_provider = None
+
+    def send(self, kind: bytes, payload=b"") -> None:
+        """Queue a frame; payload may be any bytes-like object, written without joining it to the header."""
+        if not self.writer.is_closing():
+            payload = memoryview(payload).cast("B")
+            self.writer.write(HEADER.pack(kind, len(payload)))
+            self.writer.write(payload)
+
+    def send_event(self, event: str, **fields) -> None:
+        self.send(KIND_EVENT, json.dumps(dict(fields, event=event)).encode())
+
+    async def run(self) -> None:
+        kind, payload = await read_frame(self.reader)
+        if kind == KIND_STATS:
+            # Control connection: answer and hang up
+            self.send(KIND_STATS, json.dumps(self.server.stats()).encode())
+            await self.writer.drain()
+            return
+        if kind != KIND_HELLO:
+            self.send_event("error", message="Expected a hello frame")
+            return
+        self.user_id = json.loads(payload or b"{}").get("user_id", "ID1")
+
+        pipeline, workflow = await self._create_pipeline()
+        audio_input = StreamedAudioInput()
+        # Bounded so a slow pipeline stops us reading the socket instead of buffering without limit
+        audio_input.queue = asyncio.Queue(maxsize=self.server.inbound_frames)
+        result = await pipeline.run(audio_input)
+        self.send_event("ready")
+
+        forwarder = asyncio.create_task(self._forward_events(result))
+        ended = False
+        try:
+            ended = await self._read_frames(audio_input, forwarder)
+        finally:
+            if ended and not forwarder.done():
+                # Let the pipeline finish the current turn and say goodbye
+                self._end_input(audio_input)
+                with contextlib.suppress(asyncio.TimeoutError, asyncio.CancelledError):
+                    await asyncio.wait_for(asyncio.shield(forwarder), self.server.close_timeout_s)
+            if not forwarder.done():
+                forwarder.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await forwarder
+            # Don't leave this child's saved info sitting in the write-behind queue
+            await workflow.close()
+
+    async def _create_pipeline(self) -> Tuple[VoicePipeline, "my_workflow.MyWorkflow"]:
+        server = self.server
+        voice_provider, run_config = server.voice_provider, server.run_config
+        if server.stub:
+            # Stub models keep per-turn state, so each session gets its own
+            from stub_models import ScriptedSTTModel, StubModelProvider, StubTTSModel, StubVoiceModelProvider
+            self._model_provider = StubModelProvider(**server.stub_model_options)
+            self._stt = ScriptedSTTModel()
+            voice_provider = StubVoiceModelProvider(self._stt, StubTTSModel(**server.stub_tts_options))
+            run_config = RunConfig(model_provider=self._model_provider, tracing_disabled=True)
+        if server.audio_cache is not None:
+            # Fixed replies are spoken from pre-synthesized audio, shared by all sessions
+            voice_provider = CachedVoiceModelProvider(voice_provider, server.audio_cache)
+
+        # create() loads the user without blocking the other sessions on Firestore
+        workflow = await my_workflow.MyWorkflow.create(
+            on_start=lambda transcription: self.send_event("transcript", text=transcription),
+            user_id=self.user_id,
+            run_config=run_config,
+            audio_cache=server.audio_cache,
+            prewarm_connection=server.prewarm_connection,
+            model_client=server.model_client,
+        )
+        pipeline = VoicePipeline(
+            workflow=workflow,
+            # The workflow yields complete clauses and sentences; speak each one right away
+            config=VoicePipelineConfig(model_provider=voice_provider, tracing_disabled=server.stub,
+                                       tts_settings=segment_tts_settings()),
+        )
+        return pipeline, workflow
+
+    async def _read_frames(self, audio_input: StreamedAudioInput, forwarder: asyncio.Task) -> bool:
+        """Feed client frames into the pipeline; returns True on a clean end of session."""
+        while not forwarder.done():
+            try:
+                kind, payload = await read_frame(self.reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return False
+
+            if kind == KIND_AUDIO:
+                if len(payload) % 2:
+                    payload = payload[:-1]
+                await audio_input.add_audio(np.frombuffer(payload, dtype=np.int16))
+            elif kind == KIND_TEXT:
+                if self._stt is None:
+                    self.send_event("error", message="Text turns are only supported with --stub")
+                    continue
+                self._model_provider.start_turn()
+                self._stt.end_utterance(payload.decode())
+            elif kind == KIND_END:
+                return True
+            elif kind == KIND_STATS:
+                self.send(KIND_STATS, json.dumps(self.server.stats()).encode())
+            else:
+                self.send_event("error", message=f"Unknown frame kind {kind!r}")
+        return False
+
+    def _end_input(self, audio_input: StreamedAudioInput) -> None:
+        if self._stt is not None:
+            self._stt.end_session()
+        with contextlib.suppress(asyncio.QueueFull):
+            audio_input.queue.put_nowait(None)
+
+    async def _forward_events(self, result) -> None:
+        async for event in result.stream():
+            if event.type == "voice_stream_event_audio":
+                if event.data is not None:
+                    # The pipeline's int16 array goes to the socket as-is, without a tobytes() copy
+                    self.send(KIND_AUDIO, np.ascontiguousarray(event.data, dtype=np.int16))
+                    self.server.bytes_out += event.data.size * 2
+            elif event.type == "voice_stream_event_lifecycle":
+                if event.event == "turn_ended":
+                    self.turns += 1
+                    self.server.turns += 1
+                self.send_event(event.event)
+            elif event.type == "voice_stream_event_error":
+                self.send_event("error", message=str(event.error))
+            # Wait for the client to take the audio before pulling more from the pipeline
+            await self.writer.drain()
+
+
+class VoiceServer:
+    """
+    TCP server hosting one voice session per connection.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        stub: Use FakeFirestore and the stub models from stub_models.py instead of
+            Firebase and OpenAI, so load tests run offline
+        max_sessions: Connections beyond this are refused
+        inbound_frames: Audio frames buffered per session before the socket stops being read
+        write_buffer_bytes: Outbound bytes buffered per session before the pipeline is paused
+        close_timeout_s: How long a session may take to finish after the client ends it
+        stub_model_options: Keyword arguments for StubModelProvider (--stub only)
+        stub_tts_options: Keyword arguments for StubTTSModel (--stub only)
+        audio_cache_dir: Where the audio of the workflow's fixed replies is kept (None disables
+            the audio cache; with stub models it is kept in memory only)
+        prewarm_connection: Pre-open the model connection of the agent a turn is predicted to
+            hand off to, in the pool of the OpenAI client shared by all sessions
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, stub: bool = False,
+                 max_sessions: int = 500, inbound_frames: int = 50,
+                 write_buffer_bytes: int = 256 * 1024, close_timeout_s: float = 5.0,
+                 stub_model_options: Optional[dict] = None, stub_tts_options: Optional[dict] = None,
+                 audio_cache_dir: Optional[str] = DEFAULT_CACHE_DIR, prewarm_connection: bool = False):
+        self.host = host
+        self.port = port
+        self.stub = stub
+        self.max_sessions = max_sessions
+        self.inbound_frames = inbound_frames
+        self.write_buffer_bytes = write_buffer_bytes
+        self.close_timeout_s = close_timeout_s
+        self.stub_model_options = stub_model_options or {}
+        self.stub_tts_options = stub_tts_options or {}
+        self.audio_cache_dir = audio_cache_dir
+        self.prewarm_connection = prewarm_connection
+
+        self.voice_provider = None
+        self.run_config: Optional[RunConfig] = None
+        self.model_client = None
+        self.audio_cache: Optional[AudioCache] = None
+        self.sessions: Dict[int, VoiceSession] = {}
+        self.total_sessions = 0
+        self.refused_sessions = 0
+        self.turns = 0
+        self.bytes_out = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._started_at = time.perf_counter()
+
+    def _create_shared_state(self) -> None:
+        """Create everything sessions share: Firestore client, prompt cache and model providers."""
+        if self.stub:
+            from User_Firebase import set_firestore_client
+            from voice_harness import make_fake_firestore
+            set_tracing_disabled(True)
+            client = make_fake_firestore()
+            set_firestore_client(client)
+            my_workflow.configure_prompt_cache(client)
+        else:
+            from agents.models.openai_provider import OpenAIProvider
+            from agents.voice import OpenAIVoiceModelProvider
+            from openai import AsyncOpenAI
+            self.voice_provider = OpenAIVoiceModelProvider()
+            # Kept so connections can be pre-opened in the pool the provider's models use
+            self.model_client = AsyncOpenAI()
+            self.run_config = RunConfig(model_provider=OpenAIProvider(openai_client=self.model_client))
+        if self.audio_cache_dir is not None:
+            self.audio_cache = AudioCache(None if self.stub else self.audio_cache_dir)
+        # Load the prompts once up front rather than on the first connection
+        prompts = my_workflow.get_prompt_cache().get_prompts()
+        log_server(f"Loaded {len(prompts)} prompts")
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._create_shared_state)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started_at = time.perf_counter()
+        log_server(f"Listening on {self.host}:{self.port} ({'stub' if self.stub else 'openai'} models)")
+
+    async def serve_forever(self, stats_interval_s: float = 0.0) -> None:
+        if self._server is None:
+            await self.start()
+        reporter = asyncio.create_task(self._report_stats(stats_interval_s)) if stats_interval_s > 0 else None
+        try:
+            await self._server.serve_forever()
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def stats(self) -> Dict[str, float]:
+        times = os.times()
+        return {
+            "active_sessions": len(self.sessions),
+            "total_sessions": self.total_sessions,
+            "refused_sessions": self.refused_sessions,
+            "turns": self.turns,
+            "bytes_out": self.bytes_out,
+            "cpu_s": times.user + times.system,
+            "wall_s": time.perf_counter() - self._started_at,
+            "cpu_count": os.cpu_count() or 1,
+            "write_queue_depth": get_write_queue().depth,
+        }
+
+    async def _report_stats(self, interval_s: float) -> None:
+        previous = self.stats()
+        while True:
+            await asyncio.sleep(interval_s)
+            current = self.stats()
+            cpu = (current["cpu_s"] - previous["cpu_s"]) / (current["wall_s"] - previous["wall_s"])
+            log_server(f"sessions {current['active_sessions']} | turns {current['turns'] - previous['turns']}"
+                       f" | cpu {cpu * 100:.0f}% | write queue {current['write_queue_depth']}")
+            previous = current
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.transport.set_write_buffer_limits(high=self.write_buffer_bytes)
+        session = VoiceSession(self, reader, writer)
+        if len(self.sessions) >= self.max_sessions:
+            self.refused_sessions += 1
+            session.send_event("error", message="Server is at capacity")
+            writer.close()
+            return
+
+        self.sessions[id(session)] = session
+        self.total_sessions += 1
+        try:
+            await session.run()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            log_server(f"Session for {session.user_id} failed: {e}")
+            session.send_event("error", message=str(e))
+        finally:
+            del self.sessions[id(session)]
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-session TCP voice server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub", action="store_true", help="Offline mode with FakeFirestore and stub models")
+    parser.add_argument("--max-sessions", type=int, default=500)
+    parser.add_argument("--inbound-frames", type=int, default=50)
+    parser.add_argument("--first-token-ms", type=float, default=50.0, help="Stub model first token delay")
+    parser.add_argument("--tts-first-byte-ms", type=float, default=30.0, help="Stub TTS first byte delay")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between status lines (0 = off)")
+    parser.add_argument("--audio-cache-dir", default=DEFAULT_CACHE_DIR, help="Audio cache for fixed replies")
+    parser.add_argument("--no-audio-cache", action="store_true", help="Synthesize fixed replies every time")
+    parser.add_argument("--quiet", action="store_true", help="Silence the workflow's debug output")
+    parser.add_argument("--prewarm-connection", action="store_true",
+                        help="Pre-open the model connection for predicted handoffs")
+    args = parser.parse_args()
+
+    server = VoiceServer(
+        args.host, args.port, stub=args.stub, max_sessions=args.max_sessions,
+        inbound_frames=args.inbound_frames,
+        stub_model_options={"first_token_delay_s": args.first_token_ms / 1000},
+        stub_tts_options={"first_byte_delay_s": args.tts_first_byte_ms / 1000},
+        audio_cache_dir=None if args.no_audio_cache else args.audio_cache_dir,
+        prewarm_connection=args.prewarm_connection,
+    )
+    with contextlib.redirect_stdout(open(os.devnull, "w")) if args.quiet else contextlib.nullcontext():
+        try:
+            asyncio.run(server.serve_forever(args.stats_interval))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
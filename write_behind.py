@@ -0,0 +1,193 @@
+"""
+Write-behind buffer for Firestore document writes.
+
+Tools update in-memory state immediately and enqueue the document write here
+instead of waiting for a Firestore round trip in the middle of a turn. A
+background thread coalesces repeated writes to the same document (later
+fields win) and commits them as batched merge writes on an interval. Pending
+writes are flushed on close(), which is also registered with atexit so a
+normal interpreter shutdown never drops them.
+"""
+import asyncio
+import atexit
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+
+def _log_debug(message: str) -> None:
+    print(f"[DEBUG] {message}")
+
+
+class WriteBehindQueue:
+    """
+    Coalescing, batching queue of document writes.
+
+    Args:
+        client_getter: Returns the Firestore client (real or fake) at flush time
+        flush_interval_s: How often the background thread commits pending writes
+        max_batch_writes: Writes per batch commit
+        close_timeout_s: How long close() waits for an in-progress flush
+    """
+
+    def __init__(self, client_getter: Callable[[], Any], flush_interval_s: float = 1.0,
+                 max_batch_writes: int = MAX_BATCH_WRITES, close_timeout_s: float = 10.0):
+        self._client_getter = client_getter
+        self.flush_interval_s = flush_interval_s
+        self.max_batch_writes = min(max_batch_writes, MAX_BATCH_WRITES)
+        self.close_timeout_s = close_timeout_s
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._in_flight: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def depth(self) -> int:
+        """Number of documents waiting to be written."""
+        return len(self._pending)
+
+    def enqueue(self, collection: str, doc_id: str, data: Dict[str, Any]) -> None:
+        """
+        Queue a merge write of `data` into `collection/doc_id`.
+
+        Args:
+            collection: Collection path, e.g. "Users" or "Users/ID1/Vocabulary"
+            doc_id: Document ID within the collection
+            data: Fields to write; merged over any write already pending for the document
+        """
+        key = (collection, doc_id)
+        with self._lock:
+            self.enqueued += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = dict(data)
+            else:
+                pending.update(data)
+                self.coalesced += 1
+        if self._closed:
+            # Nothing will flush for us any more
+            self.flush()
+
+    def pending(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Fields queued for a document but not yet written, so reads can see their own writes."""
+        key = (collection, doc_id)
+        with self._lock:
+            in_flight, queued = self._in_flight.get(key), self._pending.get(key)
+        if in_flight is None and queued is None:
+            return None
+        data = dict(in_flight or {})
+        data.update(queued or {})
+        return data
+
+    def pending_in(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        """Queued or in-flight fields of every document in a collection, by document ID."""
+        documents: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for queue in (self._in_flight, self._pending):
+                for (path, doc_id), data in queue.items():
+                    if path == collection:
+                        documents.setdefault(doc_id, {}).update(data)
+        return documents
+
+    def flush(self) -> int:
+        """
+        Commit every pending write now.
+
+        Writes from a failed batch are put back (under any newer writes to the
+        same documents) and retried on the next flush.
+
+        Returns:
+            Number of documents written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                # Still visible to pending() until the commit has landed
+                self._in_flight = pending
+            if not pending:
+                return 0
+
+            started = time.perf_counter()
+            items = list(pending.items())
+            written = 0
+            for start in range(0, len(items), self.max_batch_writes):
+                chunk = items[start:start + self.max_batch_writes]
+                try:
+                    client = self._client_getter()
+                    batch = client.batch()
+                    for (collection, doc_id), data in chunk:
+                        batch.set(client.collection(collection).document(doc_id), data, merge=True)
+                    batch.commit()
+                    written += len(chunk)
+                    self.batches += 1
+                except Exception as e:
+                    _log_debug(f"Error flushing {len(chunk)} queued writes: {e}. Will retry.")
+                    self.failures += 1
+                    self._requeue(chunk)
+
+            with self._lock:
+                self._in_flight = {}
+            self.written += written
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return written
+
+    async def flush_async(self) -> int:
+        """Flush from async code without blocking the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    def close(self) -> None:
+        """Stop the background thread and make a final flush."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(self.close_timeout_s)
+        self.flush()
+        if self._pending:
+            _log_debug(f"{len(self._pending)} queued writes could not be flushed on shutdown")
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+    def _requeue(self, chunk) -> None:
+        with self._lock:
+            for key, data in chunk:
+                newer = self._pending.get(key)
+                merged = dict(data)
+                if newer is not None:
+                    merged.update(newer)
+                self._pending[key] = merged
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval_s)
+            if self._closed:
+                return
+            if self._pending:
+                self.flush()